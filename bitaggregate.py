@@ -0,0 +1,311 @@
+
+"""
+
+Bit Aggregate
+
+BitList with its aggregates kept up to date as the list changes, for
+lists that are read far more often than they change.
+
+  max_length     bit length of the widest element, O(1)
+  union          OR of every element
+  intersection   AND of every element
+  column_count   number of elements with bit i set
+
+Every change goes through per-bit column counts, one add per set bit
+of each element added and one subtract per set bit of each element
+removed, vectorized with NumPy ( a step per set bit without ).  The
+union is the columns with a count, the intersection the columns counted
+len(self) times, and max_length the bit length of the union, so
+nothing is rescanned when the widest element is removed.  The
+intersection only grows when an element goes, and is recounted from
+the columns on the next read after a removal.
+
+form, forms and make_bitmask come from BitList and now cost O(1) for
+max_length, so formatting n elements is O(n), not O(n^2).
+
+Runs on Python 3.9 and micropython.
+
+module:
+  bitaggregate
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bitlogic import (BitLogicError, BitInt, BitList, bit_indexes, from_indexes,
+                      make_bitmask, _bit_length)
+
+nl = print
+
+
+def _value( x ):
+    if isinstance(x, BitInt):
+        x = x.value
+    if x < 0:
+        raise BitLogicError('Negative values are not BitInt numbers.')
+    return x
+
+def _bits( x:int, w:int ):
+    """ NumPy uint8 0/1 per bit of x, w bits."""
+    b = x.to_bytes((w + 7) >> 3, 'little')
+    return np.unpackbits(np.frombuffer(b, dtype=np.uint8), count=w, bitorder='little')
+
+def _from_bools( flags ):
+    """ int from a NumPy bool array, element i to bit i."""
+    return int.from_bytes(np.packbits(flags, bitorder='little').tobytes(), 'little')
+
+
+class AggBitList(BitList):
+    """BitList keeping max_length, union, intersection and column
+       counts current on every change.  Elements are ints >= 0 ( or
+       BitInt, counted by value )."""
+
+    def __init__(self, iterable=() ):
+        super().__init__()
+        self._counts = np.zeros(0, dtype=np.int64) if np is not None else []
+        self._union = 0
+        self._inter = 0
+        self._inter_stale = False
+        self.extend(iterable)
+
+    """ Column counts """
+
+    def _grow(self, w:int ):
+        n = len(self._counts)
+        if w > n:
+            if np is not None:
+                self._counts = np.concatenate((self._counts, np.zeros(max(w, 2 * n) - n, dtype=np.int64)))
+            else:
+                self._counts.extend([0] * (w - n))
+
+    def _add(self, x:int, before:int ):
+        """ Count x in, before the number of elements ahead of it."""
+        if before == 0 and not self._inter_stale:
+            self._inter = x
+        elif not self._inter_stale:
+            self._inter &= x
+        if x == 0:
+            return
+        w = _bit_length(x)
+        self._grow(w)
+        if np is not None:
+            self._counts[:w] += _bits(x, w)
+        else:
+            counts = self._counts
+            for i in bit_indexes(x):
+                counts[i] += 1
+        self._union |= x
+
+    def _sub(self, x:int ):
+        """ Count x out, bits left with no count leave the union."""
+        self._inter_stale = True
+        if x == 0:
+            return
+        w = _bit_length(x)
+        if np is not None:
+            bits = _bits(x, w)
+            self._counts[:w] -= bits
+            gone = _from_bools((bits == 1) & (self._counts[:w] == 0))
+        else:
+            counts = self._counts
+            gone = []
+            for i in bit_indexes(x):
+                counts[i] -= 1
+                if counts[i] == 0:
+                    gone.append(i)
+            gone = from_indexes(gone)
+        self._union ^= gone
+
+    def _values(self, items ):
+        return [ _value(x) for x in items ]
+
+    """ Aggregates """
+
+    @property
+    def max_length(self):
+        """Bit length of largest int element in the list, 1 at least"""
+        return max(_bit_length(self._union), 1)
+
+    @property
+    def union(self):
+        """OR of every element"""
+        return self._union
+
+    @property
+    def intersection(self):
+        """AND of every element, 0 for an empty list"""
+        if self._inter_stale:
+            n = len(self)
+            if n == 0:
+                self._inter = 0
+            elif np is not None:
+                self._inter = _from_bools(self._counts == n)
+            else:
+                self._inter = from_indexes([ i for i, c in enumerate(self._counts) if c == n ])
+            self._inter_stale = False
+        return self._inter
+
+    def column_count(self, i:int ):
+        """Number of elements with bit i set"""
+        if i < 0:
+            raise BitLogicError('Negative bit index.')
+        return int(self._counts[i]) if i < len(self._counts) else 0
+
+    def column_counts(self):
+        """Column counts for bits 0 to max_length - 1, as a list"""
+        w = self.max_length
+        counts = self._counts[:w]
+        counts = counts.tolist() if np is not None else list(counts)
+        return counts + [0] * (w - len(counts))
+
+    def make_bitmask(self):
+        return make_bitmask(self.max_length)
+
+    """ list mutations, every one through _add and _sub """
+
+    def append(self, x ):
+        self._add(_value(x), len(self))
+        super().append(x)
+
+    def extend(self, iterable ):
+        items = list(iterable)
+        n = len(self)
+        for i, v in enumerate(self._values(items)):
+            self._add(v, n + i)
+        super().extend(items)
+
+    def __iadd__(self, iterable ):
+        self.extend(iterable)
+        return self
+
+    def insert(self, i:int, x ):
+        self._add(_value(x), len(self))
+        super().insert(i, x)
+
+    def pop(self, i=-1 ):
+        x = super().pop(i)
+        self._sub(_value(x))
+        return x
+
+    def remove(self, x ):
+        super().remove(x)
+        self._sub(_value(x))
+
+    def clear(self):
+        super().clear()
+        self._counts = np.zeros(0, dtype=np.int64) if np is not None else []
+        self._union = 0
+        self._inter = 0
+        self._inter_stale = False
+
+    def __setitem__(self, i, x ):
+        if isinstance(i, slice):
+            old = self[i]
+            new = list(x)
+            values = self._values(new)
+            super().__setitem__(i, new)
+            for v in old:
+                self._sub(_value(v))
+            self._inter_stale = True    # recounted on the next read
+            for v in values:
+                self._add(v, 1)
+        else:
+            v = _value(x)
+            old = self[i]
+            super().__setitem__(i, x)
+            self._sub(_value(old))
+            self._add(v, 1)
+
+    def __delitem__(self, i ):
+        old = self[i] if isinstance(i, slice) else [ self[i] ]
+        super().__delitem__(i)
+        for v in old:
+            self._sub(_value(v))
+
+    def __imul__(self, k:int ):
+        items = list(self)
+        self.clear()
+        self.extend(items * k)
+        return self
+
+    def copy(self):
+        return AggBitList(self)
+
+aggbitlist = AggBitList
+
+
+if __name__=='__main__':
+
+    import random
+    import time
+
+    from bitlogic import bform
+
+    nl()
+    print('======================================')
+    print("=== Test Script for 'BitAggregate' ===")
+    print('======================================')
+    nl()
+
+    a = int(0b11101100000111)
+    b = int(0b10000000000000)
+    c = int(0b10100000000100)
+    d = int(0b00001111000000)
+    o = int(0b00000000000001)
+    z = int(0b00000000000000)
+
+    blist = aggbitlist([a, b, c])
+    print('list         ', [ blist.form(x) for x in blist ])
+    print('max_length   ', blist.max_length)
+    print('union        ', blist.form(blist.union))
+    print('intersection ', blist.form(blist.intersection))
+    print('columns      ', blist.column_counts())
+    nl()
+
+    blist.extend([d, o, z])
+    print('extend d, o, z')
+    print('union        ', blist.form(blist.union))
+    print('intersection ', blist.form(blist.intersection))
+    nl()
+
+    del blist[0:3]
+    print('del [0:3], max_length ', blist.max_length, '  no rescan')
+    print('list         ', [ blist.form(x) for x in blist ])
+    print('union        ', blist.form(blist.union))
+    print('columns      ', blist.column_counts())
+    nl()
+
+    n = 20000
+    ints = [ random.getrandbits(random.randrange(1, 512)) for _ in range(n) ]
+    plain = BitList(ints)
+    agg = aggbitlist(ints)
+    start = time.time()
+    x = [ bform(v, plain.max_length) for v in plain[:2000] ]
+    t_plain = time.time() - start
+    start = time.time()
+    y = [ agg.form(v) for v in agg[:2000] ]
+    t_agg = time.time() - start
+    print('form 2000 of ', n, '  BitList seconds ', round(t_plain, 4), '  AggBitList seconds ', round(t_agg, 4),
+          '  same ', x == y)
+    nl()
+
+    print('The End.')
+    nl()
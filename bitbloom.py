@@ -0,0 +1,627 @@
+
+"""
+
+Bit Bloom
+
+Bloom filters over BitBuffer bits, membership of hashed ids with a
+chosen false positive rate, in fixed memory.
+
+  BloomFilter(capacity, error_rate)          m bits, k positions per key
+  BlockedBloomFilter(capacity, error_rate)   all k positions in one
+                                             512-bit block, a cache line
+  CountingBloomFilter(capacity, error_rate)  4-bit counters, remove()
+
+    bf = BloomFilter(1000000, 0.01)
+    bf.add_many(ids)
+    bf.contains_many(ids)       [ True, False, ... ]
+    for flags in bf.contains_chunks(stream):     a list per CHUNK keys,
+        ...                                      memory bounded
+    x in bf
+    bf.match(other)             intersection, as bitlogic match
+    bf.union(other)             union, match(a, b) ^ diff(a, b)
+    bf.to_bytes(), from_bytes(b)
+
+Sizing is the usual m = -n ln(p) / ln(2)^2 bits and k = m / n ln(2)
+positions.  The blocked variant reads one cache line per key rather
+than k, for a slightly higher false positive rate at the same m.
+Counters saturate at 15 and are then never decremented.
+
+Keys are ints ( ids, the fast path ), str or bytes.  An int in 0 to
+2**64 - 1 is mixed with splitmix64, str and bytes go through FNV-1a
+first, and the k positions come from double hashing, a + i * b, so
+the same key gives the same positions on every interpreter and from
+to_bytes to from_bytes.  With NumPy, add_many and contains_many hash
+and set ints a chunk at a time, vectorized, in bounded memory.
+
+Runs on Python 3.9 and micropython.
+
+module:
+  bitbloom
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+import math
+
+try:
+    import struct
+except ImportError: # upython
+    import ustruct as struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bitlogic import BitLogicError
+from bitbuffer import BitBuffer
+
+nl = print
+
+_M64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_MIX1 = 0xBF58476D1CE4E5B9
+_MIX2 = 0x94D049BB133111EB
+_FNV_OFFSET = 0xcbf29ce484222325
+_FNV_PRIME = 0x100000001b3
+
+BLOCK_BITS = 512
+CHUNK = 1 << 16             # keys per vectorized batch
+
+HEADER = '<4sBBHIQQ'        # magic, kind, k, reserved, seed, m bits, keys added
+MAGIC = b'BLMF'
+STANDARD = 1
+BLOCKED = 2
+COUNTING = 3
+
+
+""" Hashing, the same positions from Python and NumPy """
+
+def _mix( z:int ):
+    """ splitmix64 finalizer."""
+    z = (z + _GOLDEN) & _M64
+    z = ((z ^ (z >> 30)) * _MIX1) & _M64
+    z = ((z ^ (z >> 27)) * _MIX2) & _M64
+    return z ^ (z >> 31)
+
+def _fnv( b ):
+    h = _FNV_OFFSET
+    for c in b:
+        h = ((h ^ c) * _FNV_PRIME) & _M64
+    return h
+
+def _key( x ):
+    """ 64-bit key for an int, str or bytes."""
+    if isinstance(x, int):
+        if 0 <= x <= _M64:
+            return x
+        return _fnv(str(x).encode())
+    if isinstance(x, str):
+        return _fnv(x.encode())
+    if isinstance(x, (bytes, bytearray, memoryview)):
+        return _fnv(bytes(x))
+    raise BitLogicError('Filter keys are ints, str or bytes.')
+
+def _np_mix( z ):
+    z = z + np.uint64(_GOLDEN)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(_MIX1)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(_MIX2)
+    return z ^ (z >> np.uint64(31))
+
+def _np_keys( chunk ):
+    """ uint64 array for a chunk of keys, None when some are not ints
+        in range, those take the Python path."""
+    for x in chunk:
+        if type(x) is not int:
+            return None
+    try:
+        return np.array(chunk, dtype=np.uint64)
+    except (OverflowError, TypeError, ValueError):
+        return None
+
+def _chunks( keys ):
+    chunk = []
+    for x in keys:
+        chunk.append(x)
+        if len(chunk) == CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def optimal( capacity:int, error_rate:float ):
+    """ ( m bits, k positions ) for capacity keys at error_rate."""
+    if capacity < 1:
+        raise BitLogicError('Filter capacity must be at least 1.')
+    if not 0 < error_rate < 1:
+        raise BitLogicError('Filter error rate must be between 0 and 1.')
+    ln2 = math.log(2)
+    m = int(math.ceil(-capacity * math.log(error_rate) / (ln2 * ln2)))
+    k = max(1, int(round(m / capacity * ln2)))
+    return max(m, 8), k
+
+
+class BloomFilter(object):
+    """Bloom filter of capacity keys at error_rate, or of m bits and k
+       positions when given.  Bits are a BitBuffer."""
+
+    kind = STANDARD
+
+    def __init__(self, capacity=1000, error_rate=0.01, m=None, k=None, seed=0 ):
+        if m is None or k is None:
+            m_, k_ = optimal(capacity, error_rate)
+            m = m_ if m is None else m
+            k = k_ if k is None else k
+        if k < 1 or k > 255:
+            raise BitLogicError('Filter k must be 1 to 255.')
+        self.m = self._round(int(m))
+        self.k = int(k)
+        self.seed = int(seed) & 0xFFFFFFFF
+        self.count = 0
+        self._store()
+
+    def _round(self, m:int ):
+        return m
+
+    def _store(self):
+        self.bits = BitBuffer(self.m)
+
+    """ Positions """
+
+    def _positions(self, key:int ):
+        a = _mix(key ^ self.seed)
+        b = _mix(a) | 1
+        m = self.m
+        return [ ((a + i * b) & _M64) % m for i in range(self.k) ]
+
+    def _np_positions(self, keys ):
+        """ (n, k) uint64 positions."""
+        a = _np_mix(keys ^ np.uint64(self.seed))
+        b = _np_mix(a) | np.uint64(1)
+        i = np.arange(self.k, dtype=np.uint64)
+        return (a[:, None] + i[None, :] * b[:, None]) % np.uint64(self.m)
+
+    """ Keys """
+
+    def _set(self, positions ):
+        buf = self.bits._buf
+        for p in positions:
+            buf[p >> 3] |= 1 << (p & 7)
+
+    def _np_set(self, pos ):
+        pos = pos.ravel()
+        np.bitwise_or.at(self.bits._view, pos >> np.uint64(3),
+                         np.left_shift(np.uint8(1), (pos & np.uint64(7)).astype(np.uint8)))
+
+    def _test(self, positions ):
+        buf = self.bits._buf
+        for p in positions:
+            if not buf[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def _np_test(self, pos ):
+        bits = (self.bits._view[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+    def add(self, x ):
+        self._set(self._positions(_key(x)))
+        self.count += 1
+
+    def add_many(self, keys ):
+        """ Add every key of an iterable, returns how many."""
+        n = 0
+        for chunk in _chunks(keys):
+            arr = _np_keys(chunk) if np is not None else None
+            if arr is not None:
+                self._np_set(self._np_positions(arr))
+            else:
+                for x in chunk:
+                    self._set(self._positions(_key(x)))
+            n += len(chunk)
+        self.count += n
+        return n
+
+    def __contains__(self, x ):
+        return self._test(self._positions(_key(x)))
+
+    def contains_chunks(self, keys ):
+        """ Generator of bool lists, one per CHUNK keys in order, for
+            streams too long to hold a bool per key."""
+        for chunk in _chunks(keys):
+            arr = _np_keys(chunk) if np is not None else None
+            if arr is not None:
+                yield self._np_test(self._np_positions(arr)).tolist()
+            else:
+                yield [ self._test(self._positions(_key(x))) for x in chunk ]
+
+    def contains_many(self, keys ):
+        """ bool per key, in order, False is certain, True is at
+            error_rate.  One list for all keys, contains_chunks to
+            stream."""
+        out = []
+        for flags in self.contains_chunks(keys):
+            out.extend(flags)
+        return out
+
+    """ Estimates """
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def fill(self):
+        """ Share of bits set."""
+        return self.bits.num_bits_set / self.m
+
+    def error_rate(self):
+        """ False positive rate at the current fill."""
+        return self.fill() ** self.k
+
+    def approx_count(self):
+        """ Distinct keys added, from the fill."""
+        f = self.fill()
+        if f >= 1:
+            return float('inf')
+        return -self.m / self.k * math.log(1 - f)
+
+    """ Set operations, filters of the same m, k, seed and kind """
+
+    def _same(self, other ):
+        if (type(other) is not type(self) or other.m != self.m or other.k != self.k
+                or other.seed != self.seed):
+            raise BitLogicError('Filters differ in kind, m, k or seed.')
+
+    def copy(self):
+        f = self._empty()
+        f.bits = self.bits.copy()
+        f.count = self.count
+        return f
+
+    def _empty(self):
+        f = type(self).__new__(type(self))
+        f.m = self.m
+        f.k = self.k
+        f.seed = self.seed
+        f.count = 0
+        f._store()
+        return f
+
+    def match(self, other ):
+        """ Intersection, bits set in both, bitlogic match.  Keys of both
+            test True, and some of either alone, more than a filter
+            built from the intersection would."""
+        self._same(other)
+        f = self.copy()
+        f.bits &= other.bits
+        f.count = min(self.count, other.count)
+        return f
+
+    def union(self, other ):
+        """ Union, match(a, b) ^ diff(a, b), the same as a filter built
+            from the keys of both."""
+        self._same(other)
+        f = self.copy()
+        f.bits |= other.bits
+        f.count = self.count + other.count
+        return f
+
+    __and__ = match
+    __or__ = union
+
+    """ Serialization """
+
+    def _body(self):
+        return bytes(self.bits._buf)
+
+    def _load(self, body ):
+        if len(body) != self.bits.nbytes:
+            raise BitLogicError('Filter body is ' + str(len(body)) + ' bytes, not ' +
+                                str(self.bits.nbytes))
+        self.bits._buf[:] = body
+
+    def to_bytes(self):
+        return struct.pack(HEADER, MAGIC, self.kind, self.k, 0, self.seed, self.m,
+                           self.count) + self._body()
+
+    def __repr__(self):
+        return (type(self).__name__ + '(m=' + str(self.m) + ', k=' + str(self.k) +
+                ', count=' + str(self.count) + ')')
+
+bloomfilter = BloomFilter
+
+
+class BlockedBloomFilter(BloomFilter):
+    """Bloom filter with all k positions of a key in one block of
+       BLOCK_BITS, m rounded up to whole blocks."""
+
+    kind = BLOCKED
+
+    def _round(self, m:int ):
+        return ((m + BLOCK_BITS - 1) // BLOCK_BITS) * BLOCK_BITS
+
+    def _positions(self, key:int ):
+        a = _mix(key ^ self.seed)
+        b = _mix(a)
+        base = (a % (self.m // BLOCK_BITS)) * BLOCK_BITS
+        h = b >> 32
+        step = (b & 0xFFFFFFFF) | 1
+        return [ base + ((h + i * step) & (BLOCK_BITS - 1)) for i in range(self.k) ]
+
+    def _np_positions(self, keys ):
+        a = _np_mix(keys ^ np.uint64(self.seed))
+        b = _np_mix(a)
+        base = (a % np.uint64(self.m // BLOCK_BITS)) * np.uint64(BLOCK_BITS)
+        h = b >> np.uint64(32)
+        step = (b & np.uint64(0xFFFFFFFF)) | np.uint64(1)
+        i = np.arange(self.k, dtype=np.uint64)
+        inner = (h[:, None] + i[None, :] * step[:, None]) & np.uint64(BLOCK_BITS - 1)
+        return base[:, None] + inner
+
+blockedbloomfilter = BlockedBloomFilter
+
+
+class CountingBloomFilter(BloomFilter):
+    """Bloom filter of 4-bit counters, two to a byte, so keys can be
+       removed.  Four times the memory of a BloomFilter of the same m."""
+
+    kind = COUNTING
+
+    def _store(self):
+        self.counters = bytearray((self.m + 1) >> 1)
+        self._view = None if np is None else np.frombuffer(self.counters, dtype=np.uint8)
+
+    def _get(self, p:int ):
+        return (self.counters[p >> 1] >> ((p & 1) << 2)) & 15
+
+    def _put(self, p:int, v:int ):
+        s = (p & 1) << 2
+        byte = p >> 1
+        self.counters[byte] = (self.counters[byte] & ~(15 << s) & 0xFF) | (v << s)
+
+    def _set(self, positions ):
+        for p in positions:
+            v = self._get(p)
+            if v < 15:
+                self._put(p, v + 1)
+
+    def _test(self, positions ):
+        for p in positions:
+            if not self._get(p):
+                return False
+        return True
+
+    def _np_update(self, pos, sign:int ):
+        """ Add sign per occurrence of each position, saturated counters
+            left alone.  Low and high nibbles apart, so no byte is
+            written twice in one assignment."""
+        u, c = np.unique(pos.ravel(), return_counts=True)
+        view = self._view
+        for half in (0, 1):
+            sel = (u & np.uint64(1)) == np.uint64(half)
+            byte = (u[sel] >> np.uint64(1)).astype(np.intp)
+            shift = np.uint8(half * 4)
+            cur = ((view[byte] >> shift) & np.uint8(15)).astype(np.int64)
+            new = np.clip(cur + sign * c[sel].astype(np.int64), 0, 15)
+            new = np.where(cur == 15, 15, new).astype(np.uint8)
+            keep = view[byte] & np.uint8(0xF0 if half == 0 else 0x0F)
+            view[byte] = keep | (new << shift)
+
+    def _np_set(self, pos ):
+        self._np_update(pos, 1)
+
+    def _np_test(self, pos ):
+        shift = ((pos & np.uint64(1)) * np.uint64(4)).astype(np.uint8)
+        counts = (self._view[(pos >> np.uint64(1)).astype(np.intp)] >> shift) & np.uint8(15)
+        return (counts > 0).all(axis=1)
+
+    def remove(self, x ):
+        """ Take a key out, False and nothing changed when it is
+            certainly not in the filter."""
+        positions = self._positions(_key(x))
+        if not self._test(positions):
+            return False
+        for p in positions:
+            v = self._get(p)
+            if 0 < v < 15:      # a position twice in one key
+                self._put(p, v - 1)
+        if self.count:      # saturated keys can be taken out more than added
+            self.count -= 1
+        return True
+
+    def remove_many(self, keys ):
+        """ remove() for each key in order, returns how many were taken
+            out.  With NumPy, keys passing the test whose counters all
+            cover every passing key's decrements ( or are saturated ) are
+            taken out at once, they pass in any order.  Keys on a counter
+            asked for more than it holds, repeats of a key among them,
+            go through remove() one at a time, in order."""
+        n = 0
+        for chunk in _chunks(keys):
+            arr = _np_keys(chunk) if np is not None else None
+            if arr is None:
+                for x in chunk:
+                    if self.remove(x):
+                        n += 1
+                continue
+            pos = self._np_positions(arr)
+            live = np.nonzero(self._np_test(pos))[0]
+            if not len(live):
+                continue
+            lpos = pos[live]
+            u, inv, c = np.unique(lpos.ravel(), return_inverse=True, return_counts=True)
+            shift = ((u & np.uint64(1)) * np.uint64(4)).astype(np.uint8)
+            cur = (self._view[(u >> np.uint64(1)).astype(np.intp)] >> shift) & np.uint8(15)
+            short = (cur < c) & (cur != np.uint8(15))
+            clash = short[inv.ravel()].reshape(lpos.shape).any(axis=1)
+            free = lpos[~clash]
+            self._np_update(free, -1)
+            n += len(free)
+            self.count = max(self.count - len(free), 0)
+            for j in live[clash]:
+                if self.remove(chunk[j]):
+                    n += 1
+        return n
+
+    """ Counters as a whole, NumPy nibble arrays or a loop """
+
+    def _nibbles(self):
+        """ Counter per position, uint8 array of m."""
+        v = self._view
+        c = np.empty(2 * len(v), dtype=np.uint8)
+        c[0::2] = v & np.uint8(15)
+        c[1::2] = v >> np.uint8(4)
+        return c[:self.m]
+
+    def _pack(self, c ):
+        if len(c) & 1:
+            c = np.concatenate((c, np.zeros(1, dtype=np.uint8)))
+        self._view[:] = c[0::2] | (c[1::2] << np.uint8(4))
+
+    def _combine(self, other, op ):
+        self._same(other)
+        f = self._empty()
+        if self._view is not None:
+            f._pack(op(self._nibbles().astype(np.int64), other._nibbles().astype(np.int64)).astype(np.uint8))
+        else:
+            for p in range(self.m):
+                f._put(p, op(self._get(p), other._get(p)))
+        return f
+
+    @property
+    def nbytes(self):
+        return len(self.counters)
+
+    def fill(self):
+        if self._view is not None:
+            return int(np.count_nonzero(self._nibbles())) / self.m
+        nonzero = 0
+        for p in range(self.m):
+            if self._get(p):
+                nonzero += 1
+        return nonzero / self.m
+
+    def to_bloom(self):
+        """ BloomFilter of the same m, k and seed, bits where counts."""
+        f = BloomFilter(m=self.m, k=self.k, seed=self.seed)
+        if self._view is not None:
+            f.bits._view[:] = np.packbits(self._nibbles() > 0, bitorder='little')
+        else:
+            for p in range(self.m):
+                if self._get(p):
+                    f.bits.set(p)
+        f.count = self.count
+        return f
+
+    def copy(self):
+        f = self._empty()
+        f.counters[:] = self.counters
+        f.count = self.count
+        return f
+
+    def match(self, other ):
+        """ Counter by counter minimum."""
+        f = self._combine(other, lambda a, b: np.minimum(a, b) if np is not None else min(a, b))
+        f.count = min(self.count, other.count)
+        return f
+
+    def union(self, other ):
+        """ Counter by counter sum, saturating at 15."""
+        f = self._combine(other, lambda a, b: np.minimum(a + b, 15) if np is not None else min(a + b, 15))
+        f.count = self.count + other.count
+        return f
+
+    __and__ = match
+    __or__ = union
+
+    def _body(self):
+        return bytes(self.counters)
+
+    def _load(self, body ):
+        if len(body) != len(self.counters):
+            raise BitLogicError('Filter body is ' + str(len(body)) + ' bytes, not ' +
+                                str(len(self.counters)))
+        self.counters[:] = body
+
+countingbloomfilter = CountingBloomFilter
+
+
+_KINDS = { STANDARD: BloomFilter, BLOCKED: BlockedBloomFilter, COUNTING: CountingBloomFilter }
+
+def from_bytes( b ):
+    """ Filter from to_bytes, of the kind it was."""
+    size = struct.calcsize(HEADER)
+    if len(b) < size:
+        raise BitLogicError('Filter bytes too short for the header.')
+    magic, kind, k, _, seed, m, count = struct.unpack(HEADER, bytes(b[:size]))
+    if magic != MAGIC or kind not in _KINDS:
+        raise BitLogicError('Not filter bytes.')
+    f = _KINDS[kind].__new__(_KINDS[kind])
+    f.m = m
+    f.k = k
+    f.seed = seed
+    f.count = count
+    f._store()
+    f._load(bytes(b[size:]))
+    return f
+
+
+if __name__=='__main__':
+
+    import random
+    import time
+
+    nl()
+    print('==================================')
+    print("=== Test Script for 'BitBloom' ===")
+    print('==================================')
+    nl()
+
+    bf = bloomfilter(100, 0.01)
+    bf.add_many([ 'alpha', 'beta', 42, b'\x00\x01' ])
+    print(bf, '  bytes ', bf.nbytes)
+    print('alpha, 42, gamma, 43 ', [ x in bf for x in ('alpha', 42, 'gamma', 43) ])
+    other = bloomfilter(100, 0.01)
+    other.add_many([ 'gamma', 42 ])
+    print('union gamma ', 'gamma' in bf.union(other), '  match 42 ', 42 in bf.match(other),
+          '  match alpha ', 'alpha' in bf.match(other))
+    cbf = countingbloomfilter(100, 0.01)
+    cbf.add_many([ 'alpha', 'beta' ])
+    cbf.remove('alpha')
+    print('counting, alpha removed ', 'alpha' in cbf, '  beta ', 'beta' in cbf)
+    print('round trip ', from_bytes(bf.to_bytes()).contains_many([ 'alpha', 42, 'gamma' ]))
+    nl()
+
+    n = 1000000
+    ids = random.sample(range(1 << 62), 2 * n)
+    present, absent = ids[:n], ids[n:]
+    for cls in (bloomfilter, blockedbloomfilter, countingbloomfilter):
+        f = cls(n, 0.01)
+        start = time.time()
+        f.add_many(present)
+        t_add = time.time() - start
+        start = time.time()
+        hits = f.contains_many(present)
+        fp = f.contains_many(absent)
+        t_query = time.time() - start
+        print('{:<20} MB {:>6.2f}   add/s {:>10.0f}   query/s {:>10.0f}   all found {}   false pos {:.4f}'.format(
+              cls.__name__, f.nbytes / 1e6, n / t_add, 2 * n / t_query, all(hits), sum(fp) / n))
+    nl()
+
+    print('The End.')
+    nl()
@@ -0,0 +1,356 @@
+
+"""
+
+Bit Buffer
+
+Mutable, fixed-width 'binary' int backed by a preallocated bytearray,
+with real in-place &= |= ^= <<= >>= and ones-complement invert.  The
+in-place operators on BitInt were left out as 'badly stateful', here
+the state is the point: an accumulator folded over thousands of masks
+without a new int and a new wrapper on every step.
+
+With NumPy the byte operations run on a uint8 view of the bytearray
+with out= set, otherwise a plain loop over bytes, which on micropython
+only touches small ints and so never allocates.
+
+module:
+  bitbuffer
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bitlogic import BitLogicError, BitInt, popcount, bform, _bit_length
+
+nl = print
+
+
+class BitBuffer(object):
+    """Fixed-width mutable bits, bit 0 is the low bit of byte 0.
+       Bits above width are always zero, ints wider than width are
+       truncated on the way in.
+    """
+
+    __slots__ = ('width', 'nbytes', '_buf', '_view', '_last', '_mv', '_tmp')
+
+    def __init__(self, width:int, x=0 ):
+
+        if width < 1:
+            raise BitLogicError('BitBuffer width must be at least 1.')
+
+        self.width = width
+        self.nbytes = (width + 7) >> 3
+        self._buf = bytearray(self.nbytes)
+        self._last = (1 << (width - ((self.nbytes - 1) << 3))) - 1
+        self._view = None if np is None else np.frombuffer(self._buf, dtype=np.uint8)
+        self._mv = None             # byte moves for the shifts, made on first use
+        self._tmp = None            # carry bits for the shifts, made on first use
+
+        if x:
+            self.load(x)
+
+    def _bytes(self, other ):
+        """ other as a byte sequence of at most nbytes, no copy for
+            a BitBuffer."""
+        if isinstance(other, BitBuffer):
+            return other._buf
+        if isinstance(other, BitInt):
+            other = other.value
+        if other < 0:
+            raise BitLogicError('Negative values and `0 ( minus zero ) are not BitInt numbers.')
+        need = (_bit_length(other) + 7) >> 3
+        n = min(need, self.nbytes)
+        if n < need:
+            other &= (1 << (n << 3)) - 1
+        return other.to_bytes(n, 'little')
+
+    def _array(self, other, ob ):
+        if isinstance(other, BitBuffer) and other._view is not None:
+            return other._view
+        return np.frombuffer(ob, dtype=np.uint8)
+
+    def _trim(self):
+        self._buf[-1] &= self._last
+
+    """ Whole-buffer state """
+
+    def load(self, x ):
+        """ Replace the contents with int x, truncated to width."""
+        self.clear_all()
+        self.__ior__(x)
+        return self
+
+    def clear_all(self):
+        if self._view is not None:
+            self._view.fill(0)
+        else:
+            buf = self._buf
+            for i in range(self.nbytes):
+                buf[i] = 0
+        return self
+
+    def copy(self):
+        bb = BitBuffer(self.width)
+        bb._buf[:] = self._buf
+        return bb
+
+    @property
+    def value(self):
+        return int.from_bytes(self._buf, 'little')
+
+    def __int__(self):
+        return self.value
+
+    @property
+    def bin(self):
+        return bin(self.value)
+
+    @property
+    def num_bits_set(self):
+        if self._view is not None and hasattr(np, 'bitwise_count'):
+            return int(np.bitwise_count(self._view).sum())
+        return popcount(self.value)
+
+    def form(self):
+        return bform(self.value, self.width)
+
+    """ Single bits """
+
+    def _index(self, i:int ):
+        if i < 0 or i >= self.width:
+            raise BitLogicError('Bit index out of range ' + str(i))
+        return i >> 3, 1 << (i & 7)
+
+    def set(self, i:int ):
+        byte, bit = self._index(i)
+        self._buf[byte] |= bit
+
+    def clear(self, i:int ):
+        byte, bit = self._index(i)
+        self._buf[byte] &= ~bit & 0xFF
+
+    def test(self, i:int ):
+        byte, bit = self._index(i)
+        return self._buf[byte] & bit != 0
+
+    def __getitem__(self, i:int ):
+        return 1 if self.test(i) else 0
+
+    def __setitem__(self, i:int, v ):
+        if v:
+            self.set(i)
+        else:
+            self.clear(i)
+
+    """ In place, return self as the augmented assignments expect """
+
+    def __iand__(self, other ):
+        """x &= y, bits of self above other are cleared."""
+        ob = self._bytes(other)
+        n = len(ob)
+        if self._view is not None:
+            ov = self._array(other, ob)
+            n = min(n, self.nbytes)
+            np.bitwise_and(self._view[:n], ov[:n], out=self._view[:n])
+            self._view[n:] = 0
+        else:
+            buf = self._buf
+            for i in range(self.nbytes):
+                buf[i] = buf[i] & ob[i] if i < n else 0
+        return self
+
+    def __ior__(self, other ):
+        """x |= y"""
+        ob = self._bytes(other)
+        n = min(len(ob), self.nbytes)
+        if self._view is not None:
+            ov = self._array(other, ob)
+            np.bitwise_or(self._view[:n], ov[:n], out=self._view[:n])
+        else:
+            buf = self._buf
+            for i in range(n):
+                buf[i] |= ob[i]
+        self._trim()
+        return self
+
+    def __ixor__(self, other ):
+        """x ^= y"""
+        ob = self._bytes(other)
+        n = min(len(ob), self.nbytes)
+        if self._view is not None:
+            ov = self._array(other, ob)
+            np.bitwise_xor(self._view[:n], ov[:n], out=self._view[:n])
+        else:
+            buf = self._buf
+            for i in range(n):
+                buf[i] ^= ob[i]
+        self._trim()
+        return self
+
+    def _np_shift(self, offset:int, left:bool ):
+        """ Shift in place, offset < width: whole bytes moved with one
+            overlapping memoryview copy ( memmove ), then the bits left
+            over shifted with out= ufuncs, carries through a scratch
+            array made once.  No width-sized object per shift."""
+        if self._mv is None:
+            self._mv = memoryview(self._buf)
+            self._tmp = np.zeros(self.nbytes, dtype=np.uint8)
+        q, r = offset >> 3, offset & 7
+        n = self.nbytes
+        view = self._view
+        tmp = self._tmp
+        if q:
+            if left:
+                self._mv[q:] = self._mv[:n - q]
+                view[:q] = 0
+            else:
+                self._mv[:n - q] = self._mv[q:]
+                view[n - q:] = 0
+        if r:
+            if left:
+                np.right_shift(view[:-1], 8 - r, out=tmp[1:])
+                tmp[0] = 0
+                np.left_shift(view, r, out=view)
+            else:
+                np.left_shift(view[1:], 8 - r, out=tmp[:-1])
+                tmp[-1] = 0
+                np.right_shift(view, r, out=view)
+            np.bitwise_or(view, tmp, out=view)
+        self._trim()
+
+    def __ilshift__(self, offset:int ):
+        """x <<= offset, bits shifted past width are lost."""
+        if offset >= self.width:
+            return self.clear_all()
+        if self._view is not None:
+            self._np_shift(offset, True)
+            return self
+        q, r = offset >> 3, offset & 7
+        buf = self._buf
+        for i in range(self.nbytes - 1, -1, -1):
+            src = i - q
+            v = 0
+            if src >= 0:
+                v = (buf[src] << r) & 0xFF
+                if r and src > 0:
+                    v |= buf[src - 1] >> (8 - r)
+            buf[i] = v
+        self._trim()
+        return self
+
+    def __irshift__(self, offset:int ):
+        """x >>= offset"""
+        if offset >= self.width:
+            return self.clear_all()
+        if self._view is not None:
+            self._np_shift(offset, False)
+            return self
+        q, r = offset >> 3, offset & 7
+        buf = self._buf
+        n = self.nbytes
+        for i in range(n):
+            src = i + q
+            v = 0
+            if src < n:
+                v = buf[src] >> r
+                if r and src + 1 < n:
+                    v |= (buf[src + 1] << (8 - r)) & 0xFF
+            buf[i] = v
+        return self
+
+    def invert(self):
+        """In-place ones-complement within width, returns self."""
+        if self._view is not None:
+            np.invert(self._view, out=self._view)
+        else:
+            buf = self._buf
+            for i in range(self.nbytes):
+                buf[i] ^= 0xFF
+        self._trim()
+        return self
+
+    """ Not in place, as BitInt, return ints """
+
+    def __and__(self, other ):
+        return self.value & int(other)
+
+    def __or__(self, other ):
+        return self.value | int(other)
+
+    def __xor__(self, other ):
+        return self.value ^ int(other)
+
+    def __eq__(self, other ):
+        if isinstance(other, BitBuffer):
+            return self.width == other.width and self._buf == other._buf
+        return self.value == other
+
+    __hash__ = None
+
+bitbuffer = BitBuffer
+
+
+if __name__=='__main__':
+
+    nl()
+    print('===================================')
+    print("=== Test Script for 'BitBuffer' ===")
+    print('===================================')
+    nl()
+
+    print('numpy ', 'available' if np is not None else 'not available, byte loops')
+    nl()
+
+    bb = bitbuffer(16, 0b0000111100001111)
+    print('bb           ', bb.form())
+    bb &= 0b0000000011111111
+    print('bb &= 0x00ff ', bb.form())
+    bb |= 0b1000000000000000
+    print('bb |= 0x8000 ', bb.form())
+    bb ^= 0b1111111111111111
+    print('bb ^= 0xffff ', bb.form())
+    bb <<= 4
+    print('bb <<= 4     ', bb.form())
+    bb >>= 6
+    print('bb >>= 6     ', bb.form())
+    bb.invert()
+    print('bb.invert()  ', bb.form())
+    nl()
+
+    print('set(0), clear(15), test(1) ')
+    bb.set(0)
+    bb.clear(15)
+    print('bb           ', bb.form(), bb.test(1))
+    print('num_bits_set ', bb.num_bits_set)
+    nl()
+
+    print('fold 1000 masks into an accumulator')
+    acc = bitbuffer(1000)
+    other = bitbuffer(1000)
+    for i in range(1000):
+        other.clear_all()
+        other.set(i)
+        acc |= other
+    print('acc.num_bits_set ', acc.num_bits_set)
+    nl()
+
+    print('The End.')
+    nl()
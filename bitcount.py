@@ -0,0 +1,343 @@
+
+"""
+
+Bit Count
+
+Bit-sliced population counts over many ints, which bit positions are
+set in at least one, exactly one, more than one or at least k of N
+masks, and how many, without a loop per bit.
+
+  at_least_one(ints)      OR of all
+  exactly_one(ints)       set in one only
+  more_than_one(ints)     set in two or more, the conflicts
+  at_least(ints, k)       set in k or more
+  column_counts(ints)     count per bit position, as a list
+
+The counts are held as bit planes, planes[j] is bit j of the count of
+every position at once, so a count of N masks is log2(N) + 1 ints.
+Planes are built with a tree of carry-save adders, three ints of one
+weight in, a sum of that weight and a carry of the next out, about five
+whole-int operations per mask, O(N log N) at worst, never per bit.
+Thresholds are a bit-sliced compare of the planes against k, from the
+top plane down, a few operations per plane.
+
+at_least_one, exactly_one and more_than_one need no planes, a running
+( ones, twos ) pair saturating at two is enough, two or three
+operations per mask.
+
+BitCounter keeps the planes for repeated questions, and add / remove
+of a single mask ripple a carry or borrow through the planes, O(log N).
+
+Runs on Python 3.9 and micropython.
+
+module:
+  bitcount
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bitlogic import BitLogicError, BitInt, make_bitmask, _bit_length
+
+nl = print
+
+
+def _value( x ):
+    if isinstance(x, BitInt):
+        x = x.value
+    if x < 0:
+        raise BitLogicError('Negative values are not BitInt numbers.')
+    return x
+
+def _saturate( ints ):
+    """ ( ones, twos ), positions set at least once and at least twice."""
+    ones = twos = 0
+    for x in ints:
+        x = _value(x)
+        twos |= ones & x
+        ones |= x
+    return ones, twos
+
+def _planes( ints ):
+    """ Bit planes of the per-position counts, carry-save adder tree.
+        Each round reduces a weight's column three to one, sending the
+        carries up to the next weight."""
+    col = [ x for x in map(_value, ints) if x ]
+    planes = []
+    while col:
+        carries = []
+        while len(col) > 2:
+            sums = []
+            for i in range(0, len(col) - 2, 3):
+                a = col[i]
+                b = col[i + 1]
+                c = col[i + 2]
+                t = a ^ b
+                sums.append(t ^ c)
+                carry = a & b | c & t
+                if carry:
+                    carries.append(carry)
+            sums.extend(col[len(col) - len(col) % 3:])
+            col = sums
+        if len(col) == 2:
+            planes.append(col[0] ^ col[1])
+            carry = col[0] & col[1]
+            if carry:
+                carries.append(carry)
+        else:
+            planes.append(col[0])
+        col = carries
+    return planes
+
+
+class BitCounter(object):
+    """Bit-sliced counts of the masks in ints, a BitList or any
+       iterable of ints >= 0 ( or BitInt ).  width is the number of
+       positions for at_least(0), at_most and counts, default the bit
+       length of the union."""
+
+    def __init__(self, ints=(), width=None ):
+        ints = list(ints)
+        self.n = len(ints)
+        self.planes = _planes(ints)
+        self._width = width
+
+    @property
+    def width(self):
+        if self._width is not None:
+            return self._width
+        return _bit_length(self.at_least_one())
+
+    """ Changes, a carry or borrow rippled through the planes """
+
+    def add(self, x ):
+        carry = _value(x)
+        if self._width is not None and _bit_length(carry) > self._width:
+            raise BitLogicError('BitCounter mask wider than width ' + str(self._width))
+        planes = self.planes
+        j = 0
+        while carry:
+            if j == len(planes):
+                planes.append(carry)
+                break
+            p = planes[j]
+            planes[j] = p ^ carry
+            carry = p & carry
+            j += 1
+        self.n += 1
+
+    def remove(self, x ):
+        """ Count x out, x must have been added."""
+        borrow = _value(x)
+        if self.n == 0:
+            raise BitLogicError('BitCounter is empty.')
+        planes = self.planes
+        j = 0
+        while borrow:
+            if j == len(planes):
+                raise BitLogicError('BitCounter remove of a mask not added.')
+            p = planes[j]
+            planes[j] = p ^ borrow
+            borrow = borrow & ~p
+            j += 1
+        while planes and planes[-1] == 0:
+            planes.pop()
+        self.n -= 1
+
+    """ Masks """
+
+    def at_least_one(self):
+        u = 0
+        for p in self.planes:
+            u |= p
+        return u
+
+    def more_than_one(self):
+        u = 0
+        for p in self.planes[1:]:
+            u |= p
+        return u
+
+    def exactly_one(self):
+        if not self.planes:
+            return 0
+        return self.planes[0] & ~self.more_than_one()
+
+    def _compare(self, k:int ):
+        """ ( greater, equal ), positions with count > k and == k."""
+        planes = self.planes
+        eq = make_bitmask(self.width) if self.width else 0
+        gt = 0
+        for j in range(max(len(planes), _bit_length(k)) - 1, -1, -1):
+            p = planes[j] if j < len(planes) else 0
+            if (k >> j) & 1:
+                eq &= p
+            else:
+                gt |= eq & p
+                eq &= ~p
+        return gt, eq
+
+    def at_least(self, k:int ):
+        """ Positions set in k or more masks."""
+        if k <= 0:
+            return make_bitmask(self.width) if self.width else 0
+        if k == 1:
+            return self.at_least_one()
+        if k == 2:
+            return self.more_than_one()
+        if k > self.n or _bit_length(k) > len(self.planes):
+            return 0
+        gt, eq = self._compare(k)
+        return gt | eq
+
+    def exactly(self, k:int ):
+        """ Positions set in exactly k masks."""
+        if k < 0 or k > self.n:
+            return 0
+        if k == 1:
+            return self.exactly_one()
+        return self._compare(k)[1]
+
+    def at_most(self, k:int ):
+        """ Positions set in k or fewer masks, within width."""
+        if k < 0:
+            return 0
+        all_ = make_bitmask(self.width) if self.width else 0
+        return all_ ^ self.at_least(k + 1)
+
+    """ Counts """
+
+    def count(self, i:int ):
+        """ Number of masks with bit i set."""
+        if i < 0:
+            raise BitLogicError('Negative bit index.')
+        c = 0
+        for j, p in enumerate(self.planes):
+            c |= ((p >> i) & 1) << j
+        return c
+
+    def counts(self):
+        """ Count for bits 0 to width - 1, as a list."""
+        w = self.width
+        if w == 0:
+            return []
+        if np is not None:
+            nbytes = (w + 7) >> 3
+            total = np.zeros(w, dtype=np.int64)
+            for j, p in enumerate(self.planes):
+                b = np.frombuffer((p & make_bitmask(w)).to_bytes(nbytes, 'little'), dtype=np.uint8)
+                total += np.unpackbits(b, count=w, bitorder='little').astype(np.int64) << j
+            return total.tolist()
+        return [ self.count(i) for i in range(w) ]
+
+    def __repr__(self):
+        return 'BitCounter(n=' + str(self.n) + ', planes=' + str(len(self.planes)) + ')'
+
+bitcounter = BitCounter
+
+
+""" One-shot functions, the pair or the planes built and dropped """
+
+def at_least_one( ints ):
+    """Positions set in any of ints"""
+    return _saturate(ints)[0]
+
+def more_than_one( ints ):
+    """Positions set in two or more of ints, the conflicts"""
+    return _saturate(ints)[1]
+
+def exactly_one( ints ):
+    """Positions set in only one of ints"""
+    ones, twos = _saturate(ints)
+    return ones & ~twos
+
+def at_least( ints, k:int, width=None ):
+    """Positions set in k or more of ints"""
+    if k == 1:
+        return at_least_one(ints)
+    if k == 2:
+        return more_than_one(ints)
+    return BitCounter(ints, width).at_least(k)
+
+def column_counts( ints, width=None ):
+    """Count of ints with bit i set, for bits 0 to width - 1"""
+    return BitCounter(ints, width).counts()
+
+
+if __name__=='__main__':
+
+    import random
+    import time
+
+    from bitlogic import BitList, bform
+
+    nl()
+    print('==================================')
+    print("=== Test Script for 'BitCount' ===")
+    print('==================================')
+    nl()
+
+    a = int(0b11101100000111)
+    b = int(0b10000000000000)
+    c = int(0b10100000000100)
+    d = int(0b00001111000000)
+
+    blist = BitList([a, b, c, d])
+    bc = bitcounter(blist)
+    print('masks          ', [ blist.form(x) for x in blist ])
+    print('at_least_one   ', blist.form(bc.at_least_one()))
+    print('exactly_one    ', blist.form(bc.exactly_one()))
+    print('more_than_one  ', blist.form(bc.more_than_one()))
+    print('at_least(3)    ', blist.form(bc.at_least(3)))
+    print('counts         ', bc.counts()[::-1], '  high bit first')
+    bc.remove(a)
+    print('remove a, more_than_one ', blist.form(bc.more_than_one()))
+    nl()
+
+    n = 5000
+    w = 1024
+    agents = [ random.getrandbits(w) & random.getrandbits(w) & random.getrandbits(w) for _ in range(n) ]
+
+    start = time.time()
+    slow = [ 0 ] * w
+    for x in agents:
+        for i in range(w):
+            if (x >> i) & 1:
+                slow[i] += 1
+    t_bits = time.time() - start
+
+    start = time.time()
+    bc = bitcounter(agents, w)
+    fast = bc.counts()
+    conflicts = more_than_one(agents)
+    t_planes = time.time() - start
+
+    k = max(slow)
+    print('agents ', n, '  bits ', w, '  planes ', len(bc.planes))
+    print('per-bit loop seconds    ', round(t_bits, 4))
+    print('bit-sliced seconds      ', round(t_planes, 4))
+    print('same counts ', fast == slow,
+          '  at_least(max) ', bc.at_least(k) == sum([ 1 << i for i in range(w) if slow[i] >= k ]),
+          '  conflicts ', conflicts == sum([ 1 << i for i in range(w) if slow[i] > 1 ]))
+    nl()
+
+    print('The End.')
+    nl()
@@ -0,0 +1,445 @@
+
+"""
+
+Bit Cover
+
+Exact cover and packing over 'binary' int candidates, for scheduling
+and slot assignment with one_of ( exactly one ) and morethanone_of
+( conflict ) constraints.
+
+  ExactCover(candidates, universe, secondary)
+      solutions()       every set of candidates covering each universe
+                        bit exactly once, one_of, and each secondary
+                        bit at most once, never morethanone_of
+      first(), count()
+      parallel()        the same search split over processes
+  packing(candidates, universe)
+      disjoint candidates covering as many universe bits as possible
+
+Solutions are lists of indexes into candidates.
+
+The search is Algorithm X on bitmasks.  Candidates get an index, and
+each column ( bit of the universe and secondary ) keeps an int over
+candidate indexes, the candidates holding it, so
+
+  live candidates   alive, one int, bit r for candidate r
+  column count      popcount(column[c] & alive)
+  choosing r        alive & ~conflicts[r], conflicts[r] the OR of the
+                    columns of r, every candidate overlapping r
+
+No links are dancing, each step is a few whole-int operations on
+10k-bit ints.  The column with fewest live candidates is branched on,
+a column with none ends the branch, and the covered bits of every
+branch found empty are remembered, so a sub-universe reached again by
+another order of choices is skipped at once.
+
+Before branching, the open primary columns are bounded against the free
+secondary bits.  Each column needs at least the fewest secondary bits a
+candidate of it takes per primary bit, and when the sum is more than
+the secondary bits still free the branch ends, so an overloaded
+schedule fails at the root rather than after an exhaustive search.
+Live candidates never hold a used secondary bit, so a column with no
+live candidate also ends the branch.
+
+parallel() opens the search breadth first until there are a few
+branches per process, and hands each branch to a multiprocessing Pool.
+CPython, micropython runs the same search in-process.
+
+Runs on Python 3.9 and micropython.
+
+module:
+  bitcover
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+import os
+
+try:
+    import multiprocessing
+except ImportError: # upython
+    multiprocessing = None
+
+from bitlogic import BitLogicError, BitInt, bit_indexes, popcount, _bit_length
+
+nl = print
+
+MEMO_MAX = 1 << 20          # failed sub-universes kept
+BRANCHES_PER_PROCESS = 4
+
+
+def _int( x ):
+    if isinstance(x, BitInt):
+        x = x.value
+    x = int(x)
+    if x < 0:
+        raise BitLogicError('Negative values are not BitInt numbers.')
+    return x
+
+
+class ExactCover(object):
+    """Exact cover of universe by candidates, secondary bits covered
+       at most once.  Candidates with bits outside universe | secondary,
+       or no universe bits, are never chosen and are left out."""
+
+    def __init__(self, candidates, universe, secondary=0 ):
+
+        universe = _int(universe)
+        secondary = _int(secondary)
+        if universe & secondary:
+            raise BitLogicError('Bits both primary and secondary.')
+        self.universe = universe
+        self.secondary = secondary
+        allowed = universe | secondary
+
+        self.candidates = [ _int(x) for x in candidates ]
+        self._index = []            # candidate number -> original index
+        cands = []
+        for i, x in enumerate(self.candidates):
+            if x & universe and x & ~allowed == 0:
+                self._index.append(i)
+                cands.append(x)
+        self._cands = cands
+
+        columns = {}
+        for c in bit_indexes(allowed):
+            columns[c] = []
+        for r, x in enumerate(cands):
+            for c in bit_indexes(x):
+                columns[c].append(r)
+        self._columns = {}
+        for c, rows in columns.items():
+            self._columns[c] = _from_list(rows)
+
+        # secondary bits a candidate takes per primary bit it covers, the
+        # least of them for each primary column
+        self._need = {}
+        for c in bit_indexes(universe):
+            self._need[c] = 0.0
+        for c in bit_indexes(universe):
+            least = None
+            for r in bit_indexes(self._columns[c]):
+                x = cands[r]
+                w = popcount(x & secondary) / popcount(x & universe)
+                if least is None or w < least:
+                    least = w
+            if least:
+                self._need[c] = least
+
+        self._conflicts = []
+        for x in cands:
+            m = 0
+            for c in bit_indexes(x):
+                m |= self._columns[c]
+            self._conflicts.append(m)
+
+        self._all = (1 << len(cands)) - 1
+        self._failed = set()
+        self.nodes = 0
+        self.memo_hits = 0
+
+    def _choose(self, rem:int, alive:int, used:int ):
+        """ Live candidates of the primary column with fewest, 0 when
+            the branch is infeasible: some column has no live candidate
+            ( live candidates only hold free secondary bits ), or the
+            secondary bits the open columns need at least are more than
+            are free."""
+        best = None
+        most = -1
+        columns = self._columns
+        need = self._need
+        total = 0.0
+        for c in bit_indexes(rem):
+            opts = columns[c] & alive
+            if not opts:
+                return 0
+            total += need[c]
+            n = popcount(opts)
+            if best is None or n < most:
+                best = opts
+                most = n
+        if total > popcount(self.secondary & ~used) + 1e-9:
+            return 0
+        return best
+
+    def _search(self, used:int, alive:int, path ):
+        """ Generator of solutions below a state, path the chosen so far.
+            Iterative, a frame per choice, no recursion depth."""
+        universe = self.universe
+        rem = universe & ~used
+        if not rem:
+            yield list(path)
+            return
+        if used in self._failed:
+            self.memo_hits += 1
+            return
+        opts = self._choose(rem, alive, used)
+        if not opts:
+            self._remember(used)
+            return
+
+        cands = self._cands
+        conflicts = self._conflicts
+        failed = self._failed
+        path = list(path)
+        stack = [[used, alive, opts, 0]]     # used, alive, options left, solutions found
+        while stack:
+            frame = stack[-1]
+            opts = frame[2]
+            if not opts:
+                stack.pop()
+                if frame[3] == 0:
+                    self._remember(frame[0])
+                elif stack:
+                    stack[-1][3] += frame[3]
+                if stack:
+                    path.pop()
+                continue
+            low = opts & -opts
+            frame[2] = opts ^ low
+            r = _bit_length(low) - 1
+            self.nodes += 1
+            nused = frame[0] | cands[r]
+            nrem = universe & ~nused
+            if not nrem:
+                frame[3] += 1
+                yield path + [r]
+                continue
+            if nused in failed:
+                self.memo_hits += 1
+                continue
+            nalive = frame[1] & ~conflicts[r]
+            nopts = self._choose(nrem, nalive, nused)
+            if not nopts:
+                self._remember(nused)
+                continue
+            path.append(r)
+            stack.append([nused, nalive, nopts, 0])
+
+    def _remember(self, used:int ):
+        if len(self._failed) < MEMO_MAX:
+            self._failed.add(used)
+
+    def _solutions(self, used:int, alive:int, path, limit ):
+        n = 0
+        for s in self._search(used, alive, path):
+            yield [ self._index[r] for r in s ]
+            n += 1
+            if limit is not None and n >= limit:
+                return
+
+    def solutions(self, limit=None ):
+        """ Generator of exact covers, lists of candidate indexes."""
+        return self._solutions(0, self._all, [], limit)
+
+    def first(self):
+        """ One exact cover, or None."""
+        for s in self.solutions(1):
+            return s
+        return None
+
+    def count(self):
+        n = 0
+        for s in self._search(0, self._all, []):
+            n += 1
+        return n
+
+    """ Multi-process """
+
+    def _branches(self, want:int ):
+        """ ( used, alive, path ) states breadth first, until there are
+            want of them or the search runs out, and any solutions met
+            on the way."""
+        level = [(0, self._all, [])]
+        done = []
+        while level and len(level) < want:
+            nxt = []
+            for used, alive, path in level:
+                rem = self.universe & ~used
+                if not rem:
+                    done.append(path)
+                    continue
+                opts = self._choose(rem, alive, used)
+                for r in bit_indexes(opts):
+                    nxt.append((used | self._cands[r], alive & ~self._conflicts[r], path + [r]))
+            if not nxt:
+                level = nxt
+                break
+            level = nxt
+        return level, done
+
+    def parallel(self, processes=None, first=False ):
+        """ All exact covers, or with first only one ( None when there
+            is none ), searched in a pool of processes."""
+        processes = processes or (os.cpu_count() if hasattr(os, 'cpu_count') else 1) or 1
+        if multiprocessing is None or processes < 2:
+            return self.first() if first else list(self.solutions())
+        level, done = self._branches(processes * BRANCHES_PER_PROCESS)
+        found = [ [ self._index[r] for r in p ] for p in done ]
+        if first and found:
+            return found[0]
+        jobs = [ (used, alive, path, first) for used, alive, path in level ]
+        pool = multiprocessing.get_context().Pool(processes, _worker_init,
+                                                   (self.candidates, self.universe, self.secondary))
+        try:
+            for sols in pool.imap_unordered(_worker, jobs):
+                if first and sols:
+                    return sols[0]
+                found.extend(sols)
+        finally:
+            pool.terminate()
+            pool.join()
+        return None if first else found
+
+    def __repr__(self):
+        return ('ExactCover(candidates=' + str(len(self._cands)) + ', columns=' +
+                str(popcount(self.universe)) + '+' + str(popcount(self.secondary)) + ')')
+
+exactcover = ExactCover
+
+
+def _from_list( rows ):
+    m = 0
+    for r in rows:
+        m |= 1 << r
+    return m
+
+_solver = None
+
+def _worker_init( candidates, universe, secondary ):
+    global _solver
+    _solver = ExactCover(candidates, universe, secondary)
+
+def _worker( job ):
+    used, alive, path, first = job
+    return list(_solver._solutions(used, alive, path, 1 if first else None))
+
+
+def exact_cover( candidates, universe, secondary=0 ):
+    """ One exact cover of universe, candidate indexes, or None."""
+    return ExactCover(candidates, universe, secondary).first()
+
+
+def packing( candidates, universe ):
+    """ Pairwise disjoint candidates within universe covering as many
+        universe bits as possible, at most one per bit, a list of
+        candidate indexes.  Branch and bound, each column either
+        covered by one of its live candidates or left empty, bounded by
+        the bits some live candidate can still cover."""
+    ec = ExactCover(candidates, universe)
+    cands = ec._cands
+    columns = ec._columns
+    conflicts = ec._conflicts
+    target = popcount(ec.universe)
+
+    best = [0, []]
+    stack = [(ec.universe, ec._all, 0, [])]    # open bits, alive, covered, path
+    while stack:
+        rem, alive, covered, path = stack.pop()
+        if covered > best[0]:
+            best[0] = covered
+            best[1] = path
+            if covered == target:
+                break
+        # columns still coverable, and the one with fewest candidates
+        reach = 0
+        pick = -1
+        fewest = 0
+        for c in bit_indexes(rem):
+            opts = columns[c] & alive
+            if opts:
+                reach += 1
+                n = popcount(opts)
+                if pick < 0 or n < fewest:
+                    pick = c
+                    fewest = n
+        if pick < 0 or covered + reach <= best[0]:
+            continue
+        bit = 1 << pick
+        stack.append((rem & ~bit, alive & ~columns[pick], covered, path))  # left empty, tried last
+        for r in bit_indexes(columns[pick] & alive):
+            x = cands[r]
+            stack.append((rem & ~x, alive & ~conflicts[r], covered + popcount(x), path + [r]))
+    return [ ec._index[r] for r in best[1] ]
+
+
+if __name__=='__main__':
+
+    import random
+    import time
+
+    from bitlogic import BitList, bform, from_indexes
+
+    nl()
+    print('==================================')
+    print("=== Test Script for 'BitCover' ===")
+    print('==================================')
+    nl()
+
+    # Knuth's example, columns a..g as bits 0..6
+    rows = BitList([ from_indexes([ 'abcdefg'.index(ch) for ch in r ])
+                     for r in ('cef', 'adg', 'bcf', 'ad', 'bg', 'deg') ])
+    universe = 0b1111111
+    ec = exactcover(rows, universe)
+    print('candidates ', [ bform(x, 7) for x in rows ])
+    print('solutions  ', list(ec.solutions()), '  count ', ec.count())
+    print('packing    ', packing(rows[1:], universe), '  of rows[1:]')
+    nl()
+
+    # slot assignment, every task in exactly one run of free slots,
+    # no slot used twice, tasks primary bits 0..199, slots secondary 200..499,
+    # one planted schedule among 50 starts per task so a cover exists
+    random.seed(1)
+    ntasks = 200
+    nslots = 300
+    durations = [ random.randrange(1, 3) for _ in range(ntasks) ]
+    while sum(durations) > nslots:
+        durations[durations.index(2)] = 1
+    planted = {}
+    s0 = 0
+    for t in random.sample(range(ntasks), ntasks):
+        planted[t] = s0
+        s0 += durations[t]
+    cands = []
+    for t in range(ntasks):
+        d = durations[t]
+        starts = random.sample(range(nslots - d + 1), 49)
+        if planted[t] not in starts:
+            starts.append(planted[t])
+        for s0 in starts:
+            cands.append((1 << t) | (((1 << d) - 1) << (ntasks + s0)))
+    tasks = (1 << ntasks) - 1
+    slots = ((1 << nslots) - 1) << ntasks
+
+    start = time.time()
+    ec = exactcover(cands, tasks, slots)
+    t_setup = time.time() - start
+    start = time.time()
+    s = ec.first()
+    t_first = time.time() - start
+    used = 0
+    clash = False
+    for r in s or []:
+        clash = clash or cands[r] & used != 0
+        used |= cands[r]
+    print('columns ', ntasks + nslots, '  candidates ', len(cands), '  setup seconds ', round(t_setup, 3))
+    print('first cover seconds ', round(t_first, 3), '  rows ', len(s or []), '  nodes ', ec.nodes,
+          '  memo hits ', ec.memo_hits, '  every task once ', used & tasks == tasks and not clash)
+    nl()
+
+    print('The End.')
+    nl()
@@ -0,0 +1,351 @@
+
+"""
+
+Bit Enum
+
+Generators over the subsets of a 'binary' int mask, for combinatorial
+search without building lists.
+
+  submasks(mask)                every s with s & ~mask == 0, mask down
+                                to 0, s = (s - 1) & mask
+  supermasks(mask, width)       every s within width holding mask,
+                                mask up to all ones, s = (s + 1) | mask
+  combinations(mask, k)         the k-bit submasks of mask, ascending,
+                                Gosper's hack carried through mask
+  gray(mask)                    the bit to XOR in at each step of a
+                                Gray-code walk of the submasks of mask
+
+Each step is a few int operations on the last value, nothing is kept
+but the yielded ints.  combinations on a contiguous mask is the plain
+Gosper step,
+
+  c = s & -s;  r = s + c;  s = ((((r ^ s) >> 2) // c) << shift) | r
+
+shift the index of the mask's lowest bit, and on a sparse mask the add
+carries through the bits outside the mask, r = ((s | ~mask) + c) & mask,
+and the bits the carry cleared come back as the lowest bits of mask.
+gray yields one single-bit int per step, the low bit of the step
+counter moved onto mask by a small dict, so the caller keeps its own
+running XOR.
+
+The _batches variants yield the same sequences in blocks of up to batch
+values, NumPy uint64 arrays when NumPy is installed, array('Q')
+otherwise, for masks up to 64 bits wide.  With NumPy the submask,
+supermask and Gray blocks are a counter deposited onto the mask bits,
+a byte table lookup per 8 mask bits for the whole block, no Python step
+per value.  gray_batches yields the submasks in Gray order, not the
+changed bits.
+
+Runs on Python 3.9 and micropython ( array batches, no NumPy ).
+
+module:
+  bitenum
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bitlogic import BitLogicError, BitInt, bit_indexes, popcount, _bit_length
+
+nl = print
+
+BATCH = 1 << 16             # values per block
+WORD = 64                   # widest mask for the batches
+
+
+def _mask( x ):
+    if isinstance(x, BitInt):
+        x = x.value
+    if x < 0:
+        raise BitLogicError('Negative values are not BitInt numbers.')
+    return x
+
+def _lowest( mask:int, k:int ):
+    """ The k lowest set bits of mask."""
+    t = mask
+    for _ in range(k):
+        t &= t - 1
+    return mask ^ t
+
+def _contiguous( mask:int ):
+    """ True when the set bits of mask are one run."""
+    low = mask & -mask
+    return mask & (mask + low) == 0
+
+
+""" Generators """
+
+def submasks( mask ):
+    """ Every submask of mask, mask first, 0 last."""
+    m = _mask(mask)
+    s = m
+    while s:
+        yield s
+        s = (s - 1) & m
+    yield 0
+
+def supermasks( mask, width:int ):
+    """ Every superset of mask within width bits, mask first, all ones
+        last."""
+    m = _mask(mask)
+    full = (1 << width) - 1
+    if m & ~full:
+        raise BitLogicError('Mask wider than width ' + str(width) + '.')
+    s = m
+    while True:
+        yield s
+        if s == full:
+            return
+        s = (s + 1) | m
+
+def combinations( mask, k:int ):
+    """ The submasks of mask with k bits set, ascending."""
+    m = _mask(mask)
+    if k < 0 or k > popcount(m):
+        return
+    if k == 0:
+        yield 0
+        return
+    s = _lowest(m, k)
+    if _contiguous(m):
+        top = _bit_length(m)
+        shift = _bit_length(m & -m) - 1
+        while not s >> top:
+            yield s
+            c = s & -s
+            r = s + c
+            s = ((((r ^ s) >> 2) // c) << shift) | r
+        return
+    outside = ~m
+    while True:
+        yield s
+        c = s & -s
+        r = ((s | outside) + c) & m
+        if not r:
+            return
+        s = r | _lowest(m, popcount(s & ~r) - 1)
+
+def gray( mask ):
+    """ Single-bit ints, XOR each into a running value from 0 to visit
+        every submask of mask once, 2**n - 1 steps for n mask bits."""
+    m = _mask(mask)
+    step = {}
+    for j, p in enumerate(bit_indexes(m)):
+        step[1 << j] = 1 << p
+    end = 1 << len(step)
+    i = 1
+    while i < end:
+        yield step[i & -i]
+        i += 1
+
+
+""" Batches """
+
+def _check_batches( m:int, batch:int ):
+    """ Argument checks of the _batches, made when called rather than
+        on first iteration, with or without NumPy."""
+    if _bit_length(m) > WORD:
+        raise BitLogicError('Batches hold masks up to ' + str(WORD) + ' bits.')
+    if batch < 1:
+        raise BitLogicError('batch must be at least 1.')
+
+def _block( values ):
+    if np is not None:
+        return np.frombuffer(values, dtype=np.uint64).copy() if len(values) else np.zeros(0, dtype=np.uint64)
+    return values
+
+def _batches( values, batch:int ):
+    """ Blocks of up to batch values from a generator, filled in C by
+        array.append."""
+    a = array('Q')
+    for x in values:
+        a.append(x)
+        if len(a) == batch:
+            yield _block(a)
+            a = array('Q')
+    if len(a):
+        yield _block(a)
+
+def _tables( m:int ):
+    """ For each 8 bits of the counter, 256 uint64 deposits onto the
+        next 8 set bits of m."""
+    tables = []
+    pos = list(bit_indexes(m))
+    v = np.arange(256, dtype=np.uint64)
+    for g in range(0, len(pos), 8):
+        t = np.zeros(256, dtype=np.uint64)
+        for j, p in enumerate(pos[g:g + 8]):
+            t |= ((v >> np.uint64(j)) & np.uint64(1)) << np.uint64(p)
+        tables.append(t)
+    return tables
+
+def _deposit( tables, counter ):
+    out = np.zeros(len(counter), dtype=np.uint64)
+    for g, t in enumerate(tables):
+        out |= t[((counter >> np.uint64(8 * g)) & np.uint64(255)).astype(np.intp)]
+    return out
+
+def _np_batches( m:int, n:int, batch:int, order, base=0 ):
+    """ Blocks of base | deposit(order(i)) onto m for i over 2**n."""
+    tables = _tables(m)
+    total = 1 << n
+    start = 0
+    while start < total:
+        size = min(batch, total - start)
+        i = np.arange(size, dtype=np.uint64) + np.uint64(start)
+        out = _deposit(tables, order(i))
+        if base:
+            out |= np.uint64(base)
+        yield out
+        start += size
+
+def _down( total:int ):
+    last = np.uint64(total - 1)
+    return lambda i: last - i
+
+def _gray_code( i ):
+    return i ^ (i >> np.uint64(1))
+
+def submask_batches( mask, batch=BATCH ):
+    """ submasks(mask) in blocks."""
+    m = _mask(mask)
+    _check_batches(m, batch)
+    if np is None:
+        return _batches(submasks(m), batch)
+    n = popcount(m)
+    return _np_batches(m, n, batch, _down(1 << n))
+
+def supermask_batches( mask, width:int, batch=BATCH ):
+    """ supermasks(mask, width) in blocks."""
+    m = _mask(mask)
+    _check_batches((1 << width) - 1, batch)
+    if m & ~((1 << width) - 1):
+        raise BitLogicError('Mask wider than width ' + str(width) + '.')
+    if np is None:
+        return _batches(supermasks(m, width), batch)
+    free = ((1 << width) - 1) & ~m
+    return _np_batches(free, popcount(free), batch, lambda i: i, m)
+
+def combination_batches( mask, k:int, batch=BATCH ):
+    """ combinations(mask, k) in blocks."""
+    m = _mask(mask)
+    _check_batches(m, batch)
+    return _batches(combinations(m, k), batch)
+
+def gray_batches( mask, batch=BATCH ):
+    """ The submasks of mask in Gray-code order from 0, in blocks, each
+        one bit from the one before."""
+    m = _mask(mask)
+    _check_batches(m, batch)
+    if np is None:
+        return _batches(_gray_walk(m), batch)
+    return _np_batches(m, popcount(m), batch, _gray_code)
+
+def _gray_walk( m:int ):
+    s = 0
+    yield s
+    for b in gray(m):
+        s ^= b
+        yield s
+
+
+if __name__=='__main__':
+
+    import sys
+    import time
+
+    if 'nonp' in sys.argv:
+        np = None
+
+    from bitlogic import bform
+
+    nl()
+    print('=================================')
+    print("=== Test Script for 'BitEnum' ===")
+    print('=================================')
+    nl()
+
+    m = int(0b1011010)
+    print('mask          ', bform(m, 7))
+    print('submasks      ', [ bform(s, 7) for s in submasks(m) ])
+    print('supermasks    ', [ bform(s, 7) for s in supermasks(0b1011000, 7) ])
+    print('combinations 2', [ bform(s, 7) for s in combinations(m, 2) ])
+    s = 0
+    walk = []
+    for b in gray(m):
+        s ^= b
+        walk.append(bform(s, 7))
+    print('gray walk     ', walk)
+    print('batches       ', [ [ int(x) for x in b ] for b in submask_batches(m, 6) ])
+    nl()
+
+    from itertools import combinations as icombinations
+
+    m = ((1 << 24) - 1) ^ 0b1001000100100000010001
+    n = popcount(m)
+    pos = list(bit_indexes(m))
+
+    start = time.time()
+    count = 0
+    for s in submasks(m):
+        count += 1
+    t_sub = time.time() - start
+    start = time.time()
+    count_i = 0
+    for k in range(n + 1):
+        for c in icombinations(pos, k):
+            x = 0
+            for p in c:
+                x |= 1 << p
+            count_i += 1
+    t_iter = time.time() - start
+    print('mask bits ', n, '  submasks ', count, count_i)
+    print('submasks seconds             ', round(t_sub, 3))
+    print('itertools + loop seconds     ', round(t_iter, 3))
+
+    k = n // 2
+    start = time.time()
+    count = 0
+    for s in combinations(m, k):
+        count += 1
+    t_comb = time.time() - start
+    print('combinations', k, 'seconds      ', round(t_comb, 3), '  count ', count)
+
+    start = time.time()
+    count = 0
+    for b in gray(m):
+        count += 1
+    t_gray = time.time() - start
+    print('gray seconds                 ', round(t_gray, 3), '  steps ', count)
+
+    start = time.time()
+    count = 0
+    for b in submask_batches(m):
+        count += len(b)
+    t_batch = time.time() - start
+    print('submask_batches seconds      ', round(t_batch, 3), '  values ', count,
+          '  numpy ' if np is not None else '  array ')
+    nl()
+
+    print('The End.')
+    nl()
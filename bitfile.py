@@ -0,0 +1,322 @@
+
+"""
+
+Bit File
+
+Compact binary file format for collections of fixed-width 'binary'
+ints, and a memory-mapped reader.
+
+  header   32 bytes, little-endian struct '<4sHHIQQ4x'
+             magic      b'BITL'
+             version    1
+             flags      FLAG_STREAM when count was unknown at write,
+                        the body then runs to end of file
+             wordbytes  8
+             width      bits per mask
+             count      number of masks
+  body     count masks, each nwords little-endian uint64 words,
+           nwords = ceil(width / 64), bit 0 is the low bit of word 0
+
+BitFile maps the file with mmap, hands out zero-copy memoryview slices
+per mask, and with NumPy runs the bitlogic predicates straight against
+the mapped words, a block of rows at a time, no ints built.
+
+CPython only, micropython has no mmap.
+
+module:
+  bitfile
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+import mmap
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bitlogic import (BitLogicError, BitInt, BitList, bform,
+                      all_of, any_of, none_of, one_of, morethanone_of)
+from bitmatrix import BitMatrix
+
+nl = print
+
+MAGIC = b'BITL'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIQQ4x')
+HEADER_SIZE = HEADER.size     # 32
+WORD_BYTES = 8
+FLAG_STREAM = 1
+
+BLOCK_ROWS = 1 << 16           # rows per vectorized block
+
+
+def _stride( width:int ):
+    return ((width + 63) >> 6) * WORD_BYTES
+
+
+class BitFileWriter(object):
+    """Stream masks to a bit file, a path or a binary file object,
+       count patched into the header on close.  When the file cannot
+       seek ( a pipe ) the header is flagged FLAG_STREAM instead.
+       Masks are packed and written batch at a time."""
+
+    def __init__(self, path, width:int, batch=4096 ):
+
+        if width < 1:
+            raise BitLogicError('Bit file width must be at least 1.')
+        self.path = path
+        self.width = width
+        self.stride = _stride(width)
+        self.count = 0
+        self.batch = batch
+        self._pending = []
+        if hasattr(path, 'write'):
+            self._f = path
+            self._owned = False
+        else:
+            self._f = open(path, 'wb')
+            self._owned = True
+        try:
+            self._flags = 0 if self._f.seekable() else FLAG_STREAM
+        except AttributeError:
+            self._flags = FLAG_STREAM
+        self._f.write(HEADER.pack(MAGIC, VERSION, self._flags, WORD_BYTES, width, 0))
+
+    def write(self, x ):
+        if isinstance(x, BitInt):
+            x = x.value
+        if x < 0 or x.bit_length() > self.width:
+            raise BitLogicError('Mask does not fit bit file width ' + str(self.width))
+        self._pending.append(x.to_bytes(self.stride, 'little'))
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def writemany(self, ints ):
+        for x in ints:
+            self.write(x)
+
+    def flush(self):
+        if self._pending:
+            self._f.write(b''.join(self._pending))
+            self.count += len(self._pending)
+            self._pending = []
+
+    def close(self):
+        if self._f is None:
+            return
+        self.flush()
+        if not self._flags & FLAG_STREAM:
+            end = self._f.tell()
+            self._f.seek(0)
+            self._f.write(HEADER.pack(MAGIC, VERSION, 0, WORD_BYTES, self.width, self.count))
+            self._f.seek(end)
+        if self._owned:
+            self._f.close()
+        else:
+            self._f.flush()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args ):
+        self.close()
+
+
+def write_bitfile( path, ints, width=None ):
+    """ Write a BitList ( or any ints ) to path, width defaults to
+        max_length, or 1 with no rows.  Returns the count written."""
+    if width is None:
+        if not isinstance(ints, BitList):
+            ints = BitList(ints)
+        width = ints.max_length if len(ints) else 1
+    with BitFileWriter(path, width) as w:
+        w.writemany(ints)
+    return w.count
+
+
+class BitFile(object):
+    """Read-only, memory-mapped bit file.  bf[i] is a zero-copy
+       memoryview of mask i, bf.value(i) its int.  Predicates test a
+       query x against every mask, all_of(x, mask) and so on, and
+       return a bool array ( or list without NumPy ).
+    """
+
+    def __init__(self, path ):
+
+        self.path = path
+        self._f = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:   # empty file
+            self._f.close()
+            raise BitLogicError('Not a bit file, empty: ' + str(path))
+
+        if len(self._map) < HEADER_SIZE:
+            self.close()
+            raise BitLogicError('Not a bit file, short header: ' + str(path))
+        magic, version, flags, wordbytes, width, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise BitLogicError('Not a bit file, bad magic: ' + str(path))
+        if version != VERSION or wordbytes != WORD_BYTES:
+            self.close()
+            raise BitLogicError('Unsupported bit file version ' + str(version))
+
+        self.width = width
+        self.stride = _stride(width)
+        if flags & FLAG_STREAM:
+            count = (len(self._map) - HEADER_SIZE) // self.stride
+        self.count = count
+        if len(self._map) < HEADER_SIZE + count * self.stride:
+            self.close()
+            raise BitLogicError('Bit file truncated: ' + str(path))
+
+        self._mv = memoryview(self._map)[HEADER_SIZE:HEADER_SIZE + count * self.stride]
+        self._words = None
+        if np is not None:
+            self._words = np.frombuffer(self._mv, dtype='<u8').reshape(count, self.stride // WORD_BYTES)
+
+    def close(self):
+        """ Release the mapping, slices handed out must be released first."""
+        self._words = None
+        if getattr(self, '_mv', None) is not None:
+            self._mv.release()
+            self._mv = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args ):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i:int ):
+        """ Zero-copy memoryview of mask i."""
+        if i < 0:
+            i += self.count
+        if i < 0 or i >= self.count:
+            raise IndexError('bit file index out of range')
+        start = i * self.stride
+        return self._mv[start:start + self.stride]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def value(self, i:int ):
+        return int.from_bytes(self[i], 'little')
+
+    def values(self):
+        """ Generator of ints, one at a time."""
+        for i in range(self.count):
+            yield int.from_bytes(self[i], 'little')
+
+    def to_bitlist(self):
+        return BitList(self.values())
+
+    def form(self, x:int ):
+        return bform(x, self.width)
+
+    def blocks(self, rows=BLOCK_ROWS ):
+        """ Generator of BitMatrix views over the mapped words, rows at
+            a time, NumPy only."""
+        if self._words is None:
+            raise BitLogicError('BitFile.blocks needs NumPy.')
+        for start in range(0, self.count, rows):
+            yield BitMatrix._from_words(self._words[start:start + rows], self.width)
+
+    def _apply(self, name:str, func, x ):
+        if isinstance(x, BitInt):
+            x = x.value
+        if self._words is None:
+            return [ func(x, v) for v in self.values() ]
+        if self.count == 0:
+            return np.zeros(0, dtype=bool)
+        return np.concatenate([ getattr(bm, name)(x) for bm in self.blocks() ])
+
+    def all_of(self, x ):
+        """All of x in each mask"""
+        return self._apply('all_of', all_of, x)
+
+    def any_of(self, x ):
+        """Any of x in each mask"""
+        return self._apply('any_of', any_of, x)
+
+    def none_of(self, x ):
+        """None of x in each mask"""
+        return self._apply('none_of', none_of, x)
+
+    def one_of(self, x ):
+        """Only one of x in each mask"""
+        return self._apply('one_of', one_of, x)
+
+    def morethanone_of(self, x ):
+        """More than one of x in each mask"""
+        return self._apply('morethanone_of', morethanone_of, x)
+
+bitfile = BitFile
+
+
+if __name__=='__main__':
+
+    import os
+    import tempfile
+
+    nl()
+    print('=================================')
+    print("=== Test Script for 'BitFile' ===")
+    print('=================================')
+    nl()
+
+    a = int(0b11101100000111)
+    b = int(0b10000000000000)
+    c = int(0b10100000000100)
+    d = int(0b00001111000000)
+    o = int(0b00000000000001)
+    z = int(0b00000000000000)
+
+    path = os.path.join(tempfile.gettempdir(), 'bitfile_test.bits')
+
+    n = write_bitfile(path, BitList([a, b, c, d, o, z]))
+    print('wrote ', n, ' masks, ', os.path.getsize(path), ' bytes to ', path)
+    nl()
+
+    with bitfile(path) as bf:
+        print('width, count, stride ', bf.width, bf.count, bf.stride)
+        for i in range(len(bf)):
+            print('mask', i, ' = ', bf.form(bf.value(i)), '  ', bytes(bf[i]).hex())
+        nl()
+        print('all_of(b, mask)  ', [ bool(v) for v in bf.all_of(b) ])
+        print('any_of(d, mask)  ', [ bool(v) for v in bf.any_of(d) ])
+        print('none_of(d, mask) ', [ bool(v) for v in bf.none_of(d) ])
+        print('one_of(o, mask)  ', [ bool(v) for v in bf.one_of(o) ])
+        nl()
+
+    os.remove(path)
+
+    print('The End.')
+    nl()
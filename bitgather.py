@@ -0,0 +1,251 @@
+
+"""
+
+Bit Gather
+
+Select items of a sequence by mask, and put them back, without one
+interpreted step per bit.
+
+  compress(seq, mask)               items at the set bits, in order
+  expand(values, mask, length)      values spread out to the set bits,
+                                    fill elsewhere, compress inverted
+  scatter(values, mask, target)     the same, written into target
+
+Lists, tuples and the like go through itertools.compress against a
+selector of 0/1 bytes built from the mask in C, a byte table lookup per
+8 bits.  array.array, bytes, bytearray, memoryview and NumPy arrays go
+through NumPy boolean indexing on a view of the buffer, no lists at all,
+and come back as the same type.  Without NumPy, buffers are gathered
+with map over the set bit indexes ( bit_indexes, a step per set bit ).
+
+Bit i of the mask selects seq[i], the order of iter(BitInt), so
+
+  compress(ilist, odd_index)
+
+is the enumerate(iter(odd_index)) loop of the bitlogic test script.
+
+Runs on Python 3.9 and micropython ( lists, bytes and array, no NumPy ).
+
+module:
+  bitgather
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+from array import array
+
+try:
+    from itertools import compress as _icompress
+except ImportError: # upython
+    _icompress = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bitlogic import BitLogicError, BitInt, bit_indexes, popcount, _bit_length
+
+nl = print
+
+_SELECT = None      # byte -> 8 bytes of 0/1, low bit first
+
+
+def _mask( mask, n:int ):
+    if isinstance(mask, BitInt):
+        mask = mask.value
+    if mask < 0:
+        raise BitLogicError('Negative values are not BitInt numbers.')
+    if _bit_length(mask) > n:
+        raise BitLogicError('Mask wider than sequence, ' + str(_bit_length(mask)) + ' > ' + str(n))
+    return mask
+
+def _selector( mask:int, n:int ):
+    """ n bytes of 0/1, byte i is bit i of mask."""
+    global _SELECT
+    b = mask.to_bytes((n + 7) >> 3, 'little')
+    if np is not None:
+        return np.unpackbits(np.frombuffer(b, dtype=np.uint8), count=n, bitorder='little').tobytes()
+    if _SELECT is None:
+        _SELECT = [ bytes([ (v >> j) & 1 for j in range(8) ]) for v in range(256) ]
+    return b''.join([ _SELECT[v] for v in b ])[:n]
+
+def _bools( mask:int, n:int ):
+    """ NumPy bool array, element i is bit i of mask."""
+    b = mask.to_bytes((n + 7) >> 3, 'little')
+    return np.unpackbits(np.frombuffer(b, dtype=np.uint8), count=n, bitorder='little').view(bool)
+
+def _view( seq ):
+    """ ( NumPy view, rebuild ) for buffer types, rebuild turning a
+        NumPy result back into the type of seq, or None."""
+    if np is None:
+        return None
+    if isinstance(seq, np.ndarray):
+        return seq, lambda r: r
+    if isinstance(seq, bytes):
+        return np.frombuffer(seq, dtype=np.uint8), lambda r: r.tobytes()
+    if isinstance(seq, bytearray):
+        return np.frombuffer(seq, dtype=np.uint8), lambda r: bytearray(r.tobytes())
+    if isinstance(seq, array):
+        try:
+            dtype = np.dtype(seq.typecode)
+        except TypeError:   # 'u', no NumPy match
+            return None
+        if dtype.itemsize != seq.itemsize:
+            return None
+
+        def rebuild(r):
+            a = array(seq.typecode)
+            a.frombytes(r.tobytes())
+            return a
+
+        return np.frombuffer(seq, dtype=dtype), rebuild
+    if isinstance(seq, memoryview):
+
+        def rebuild(r):
+            mv = memoryview(r.tobytes())
+            if r.size == 0:     # no casts to shapes with zeros
+                return mv.cast(seq.format)
+            return mv.cast(seq.format, list(r.shape))
+
+        return np.asarray(seq), rebuild
+    return None
+
+def _rebuild_like( seq, items ):
+    """ Type of seq from an iterable of items, no NumPy."""
+    if isinstance(seq, bytes):
+        return bytes(items)
+    if isinstance(seq, bytearray):
+        return bytearray(items)
+    if isinstance(seq, array):
+        return array(seq.typecode, items)
+    if isinstance(seq, memoryview):
+        return memoryview(array(getattr(seq, 'format', 'B'), items))
+    return list(items)
+
+
+def compress( seq, mask ):
+    """ Items of seq where mask has bit i set, in order.  Buffers come
+        back as their own type, anything else as a list."""
+    n = len(seq)
+    mask = _mask(mask, n)
+    v = _view(seq)
+    if v is not None:
+        view, rebuild = v
+        return rebuild(view[_bools(mask, n)])
+    if isinstance(seq, (bytes, bytearray, array, memoryview)):
+        return _rebuild_like(seq, map(seq.__getitem__, bit_indexes(mask)))
+    if _icompress is not None:
+        return list(_icompress(seq, _selector(mask, n)))
+    return [ seq[i] for i in bit_indexes(mask) ]
+
+def expand( values, mask, length=None, fill=0 ):
+    """ Sequence of length ( default the bit length of mask ) holding
+        values in order at the set bits of mask and fill elsewhere,
+        the inverse of compress.  Same type as values."""
+    if isinstance(mask, BitInt):
+        mask = mask.value
+    if length is None:
+        length = _bit_length(mask) if mask > 0 else 0
+    mask = _mask(mask, length)
+    if popcount(mask) != len(values):
+        raise BitLogicError('expand needs one value per set bit, ' + str(popcount(mask)) +
+                            ' bits, ' + str(len(values)) + ' values')
+    v = _view(values)
+    if v is not None:
+        view, rebuild = v
+        out = np.full((length,) + view.shape[1:], fill, dtype=view.dtype)
+        out[_bools(mask, length)] = view
+        return rebuild(out)
+    if isinstance(values, (bytes, bytearray, array, memoryview)):
+        out = _rebuild_like(values, [fill] * length)
+        if isinstance(out, bytes):
+            out = bytearray(out)
+            scatter(values, mask, out)
+            return bytes(out)
+        return scatter(values, mask, out)
+    return scatter(values, mask, [fill] * length)
+
+def scatter( values, mask, target ):
+    """ Write values in order into target at the set bits of mask, in
+        place, and return target.  target is a list, array, bytearray,
+        writable memoryview or NumPy array."""
+    mask = _mask(mask, len(target))
+    if popcount(mask) != len(values):
+        raise BitLogicError('scatter needs one value per set bit, ' + str(popcount(mask)) +
+                            ' bits, ' + str(len(values)) + ' values')
+    t = _view(target) if not isinstance(target, bytes) else None
+    v = _view(values)
+    if t is not None and v is not None:
+        t[0][_bools(mask, len(target))] = v[0]
+        return target
+    for i, x in zip(bit_indexes(mask), values):
+        target[i] = x
+    return target
+
+
+if __name__=='__main__':
+
+    import random
+    import time
+
+    from bitlogic import bitint
+
+    nl()
+    print('===================================')
+    print("=== Test Script for 'BitGather' ===")
+    print('===================================')
+    nl()
+
+    ilist = ['one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight' ]
+    odd_index = bitint(int(0b01010101))
+    even_index = bitint(int(0b10101010))
+
+    print('odd_index  ', odd_index.bin, '  ', compress(ilist, odd_index))
+    print('even_index ', even_index.bin, '  ', compress(ilist, even_index))
+    print('array      ', compress(array('h', range(1, 9)), odd_index))
+    print('bytes      ', compress(b'abcdefgh', odd_index))
+    odds = compress(ilist, odd_index)
+    print('expand     ', expand(odds, odd_index, 8, None))
+    print('scatter    ', scatter([ x.upper() for x in odds ], odd_index, list(ilist)))
+    nl()
+
+    n = 1000000
+    mask = random.getrandbits(n)
+    rows = list(range(n))
+    buf = array('d', rows)
+
+    start = time.time()
+    old = [ rows[i] for i, v in enumerate(iter(bitint(mask))) if v == 1 ]
+    t_old = time.time() - start
+
+    start = time.time()
+    new = compress(rows, mask)
+    t_list = time.time() - start
+
+    start = time.time()
+    got = compress(buf, mask)
+    t_buf = time.time() - start
+
+    print('rows ', n, '  selected ', len(new), '  same ', new == old and list(got) == [ float(x) for x in old ])
+    print('enumerate(iter(mask)) seconds ', round(t_old, 4))
+    print('compress list seconds         ', round(t_list, 4))
+    print('compress array(d) seconds     ', round(t_buf, 4))
+    nl()
+
+    print('The End.')
+    nl()
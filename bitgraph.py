@@ -0,0 +1,419 @@
+
+"""
+
+Bit Graph
+
+Boolean matrices on BitList rows, for dependency graphs held as
+adjacency masks, row i the mask of the nodes i points to.
+
+  transpose(rows, width)       row j of the result, the nodes pointing
+                               to j
+  product(a, b)                boolean a x b, row i the OR of the rows
+                               of b that a[i] selects
+  closure(rows)                row i, every node reachable from i by
+                               one or more edges
+  reflexive_closure(rows)      the same with i itself, zero or more
+  bfs(rows, sources)           frontier masks, level by level
+  IncrementalClosure(rows).add_edge(u, v)
+                               closure kept current edge by edge
+
+product is the Method of Four Russians.  The rows of b are taken 8 at
+a time and the 256 ORs of each group built once, so each byte of a[i]
+is one table lookup and one whole-row OR instead of up to 8.  Zero
+bytes of a are skipped, found with NumPy when present.
+
+closure is not repeated products.  Strongly connected components come
+out of an iterative Tarjan sinks first, every node of a component
+shares one reach mask, and each component ORs in the reach of its
+successors, skipping any successor already covered by an earlier one.
+That is O(n + e) whole-row ORs at worst, and far fewer on graphs with
+shared reach, a few seconds for 20k nodes.
+
+bfs ORs the rows of the whole frontier for the next level ( push ), or
+given the transpose, tests each unvisited node against the frontier
+with one AND ( pull ), whichever touches fewer rows.
+
+Runs on Python 3.9 and micropython.
+
+module:
+  bitgraph
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bitlogic import (BitLogicError, BitInt, BitList, bit_indexes, from_indexes,
+                      make_bitmask, popcount, _bit_length)
+
+nl = print
+
+GROUP = 8               # rows of b per Four Russians table
+TABLE_MIN = 32          # rows of a using a group before a full table pays
+PULL_RATIO = 8          # pull when the frontier is over 1/8 of the unvisited
+
+
+def _ints( rows ):
+    out = []
+    for x in rows:
+        if isinstance(x, BitInt):
+            x = x.value
+        if x < 0:
+            raise BitLogicError('Negative values are not BitInt numbers.')
+        out.append(x)
+    return out
+
+def _square( rows ):
+    """ Rows as ints, checked against the node count."""
+    rows = _ints(rows)
+    u = 0
+    for x in rows:
+        u |= x
+    if _bit_length(u) > len(rows):
+        raise BitLogicError('Edge to node ' + str(_bit_length(u) - 1) +
+                            ', only ' + str(len(rows)) + ' rows')
+    return rows
+
+def _lowest( x:int ):
+    return _bit_length(x & -x) - 1
+
+
+""" Transpose and product """
+
+def transpose( rows, width=None ):
+    """ BitList of width rows ( default the widest row ), bit i of row j
+        set where bit j of rows[i] is set."""
+    rows = _ints(rows)
+    if width is None:
+        width = BitList(rows).max_length if rows else 0
+    n = len(rows)
+    if np is not None and n:
+        nbytes = (width + 7) >> 3
+        try:
+            a = np.frombuffer(b''.join([ x.to_bytes(nbytes, 'little') for x in rows ]),
+                              dtype=np.uint8).reshape(n, nbytes)
+        except OverflowError:
+            raise BitLogicError('Row wider than width ' + str(width))
+        cols = []
+        step = 4096
+        for start in range(0, n, step):    # bounded bool block, step x width
+            block = np.unpackbits(a[start:start + step], axis=1, count=width, bitorder='little')
+            cols.append(np.packbits(block.T, axis=1, bitorder='little'))
+        t = np.concatenate(cols, axis=1) if len(cols) > 1 else cols[0]
+        return BitList([ int.from_bytes(r.tobytes(), 'little') for r in t ])
+    out = [ [] for _ in range(width) ]
+    for i, x in enumerate(rows):
+        for j in bit_indexes(x):
+            if j >= width:
+                raise BitLogicError('Row wider than width ' + str(width))
+            out[j].append(i)
+    return BitList([ from_indexes(c) for c in out ])
+
+def _table( group ):
+    """ The 256 ORs of up to 8 rows, entry m the OR of the rows at the
+        set bits of m, each entry one OR on an earlier one."""
+    t = [0] * (1 << GROUP)
+    for m in range(1, 1 << GROUP):
+        low = m & -m
+        j = _bit_length(low) - 1
+        t[m] = t[m ^ low] | (group[j] if j < len(group) else 0)
+    return t
+
+def product( a, b ):
+    """ Boolean product a x b, BitList with row i the OR of b[j] for
+        each bit j of a[i].  a is len(a) x len(b), b any width."""
+    a = _ints(a)
+    b = _ints(b)
+    nb = len(b)
+    ngroups = (nb + GROUP - 1) // GROUP
+    u = 0
+    for x in a:
+        u |= x
+    if _bit_length(u) > nb:
+        raise BitLogicError('Product a row wider than the ' + str(nb) + ' rows of b')
+    out = [0] * len(a)
+    if not a or not nb:
+        return BitList(out)
+
+    abytes = [ x.to_bytes(ngroups, 'little') for x in a ]
+    if np is not None:
+        m = np.frombuffer(b''.join(abytes), dtype=np.uint8).reshape(len(a), ngroups)
+        used = m.any(axis=0).nonzero()[0].tolist()
+    else:
+        m = None
+        used = range(ngroups)
+
+    for g in used:
+        group = b[g * GROUP:(g + 1) * GROUP]
+        if m is not None:
+            col = m[:, g]
+            idx = col.nonzero()[0].tolist()
+            vals = col[idx].tolist()
+        else:
+            idx = [ i for i in range(len(a)) if abytes[i][g] ]
+            vals = [ abytes[i][g] for i in idx ]
+        if len(idx) >= TABLE_MIN:
+            t = _table(group)
+            for i, v in zip(idx, vals):
+                out[i] |= t[v]
+        else:
+            for i, v in zip(idx, vals):
+                r = 0
+                while v:
+                    low = v & -v
+                    r |= group[_bit_length(low) - 1]
+                    v ^= low
+                out[i] |= r
+    return BitList(out)
+
+
+""" Closure """
+
+def _components( rows ):
+    """ Strongly connected components, iterative Tarjan, each a list
+        of nodes, sinks first ( reverse topological order )."""
+    n = len(rows)
+    index = [-1] * n
+    low = [0] * n
+    onstack = bytearray(n)
+    stack = []
+    comps = []
+    counter = 0
+    for s in range(n):
+        if index[s] != -1:
+            continue
+        index[s] = low[s] = counter
+        counter += 1
+        stack.append(s)
+        onstack[s] = 1
+        work = [(s, bit_indexes(rows[s]))]
+        while work:
+            v, it = work[-1]
+            descended = False
+            for w in it:
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    onstack[w] = 1
+                    work.append((w, bit_indexes(rows[w])))
+                    descended = True
+                    break
+                if onstack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+            if descended:
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                if low[v] < low[u]:
+                    low[u] = low[v]
+            if low[v] == index[v]:
+                comp = []
+                while True:
+                    w = stack.pop()
+                    onstack[w] = 0
+                    comp.append(w)
+                    if w == v:
+                        break
+                comps.append(comp)
+    return comps
+
+def _closure( rows ):
+    """ list of reach masks, rows already ints and square."""
+    reach = [0] * len(rows)
+    for comp in _components(rows):
+        mask = from_indexes(comp)
+        succ = 0
+        for v in comp:
+            succ |= rows[v]
+        acc = mask if len(comp) > 1 or succ & mask else 0    # on a cycle
+        rem = succ & ~mask
+        while rem:
+            w = _lowest(rem)
+            acc |= reach[w] | (1 << w)
+            rem &= ~acc
+        for v in comp:
+            reach[v] = acc
+    return reach
+
+def closure( rows ):
+    """ Transitive closure, BitList with row i the nodes reachable from
+        i by one or more edges, i itself only on a cycle."""
+    return BitList(_closure(_square(rows)))
+
+def reflexive_closure( rows ):
+    """ Reflexive-transitive closure, closure with every i in row i."""
+    return BitList([ r | (1 << i) for i, r in enumerate(_closure(_square(rows))) ])
+
+
+""" Breadth-first search """
+
+def bfs( rows, sources, rows_t=None ):
+    """ Generator of frontier masks from sources ( a mask ), sources
+        first, each level the nodes first reached at that depth.
+        rows_t, the transpose of rows, enables pull levels."""
+    rows = rows if isinstance(rows, list) else list(rows)
+    if isinstance(sources, BitInt):
+        sources = sources.value
+    n = len(rows)
+    if _bit_length(sources) > n:
+        raise BitLogicError('Source node beyond the ' + str(n) + ' rows')
+    everything = make_bitmask(n) if n else 0
+    visited = frontier = sources
+    while frontier:
+        yield frontier
+        unvisited = everything & ~visited
+        if not unvisited:
+            break
+        if rows_t is not None and popcount(frontier) * PULL_RATIO > popcount(unvisited):
+            nxt = from_indexes([ v for v in bit_indexes(unvisited) if rows_t[v] & frontier ])
+        else:
+            nxt = 0
+            for v in bit_indexes(frontier):
+                nxt |= rows[v]
+        frontier = nxt & unvisited
+        visited |= frontier
+
+def reachable( rows, sources, rows_t=None ):
+    """ Mask of every node reachable from sources, sources included."""
+    r = 0
+    for f in bfs(rows, sources, rows_t):
+        r |= f
+    return r
+
+
+class IncrementalClosure(object):
+    """Transitive closure of rows kept current as edges are added.
+       rows and reach are BitLists, reach[i] as closure(rows)[i]."""
+
+    def __init__(self, rows=() ):
+        self.rows = BitList(_square(rows))
+        self.reach = BitList(_closure(self.rows))
+        self._reach_t = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _sources(self, u:int ):
+        """ Mask of the nodes reaching u, from the transposed reach."""
+        if self._reach_t is None:
+            self._reach_t = transpose(self.reach, len(self.rows))
+        return self._reach_t[u]
+
+    def add_node(self):
+        """ New node, no edges, returns its index."""
+        self.rows.append(0)
+        self.reach.append(0)
+        if self._reach_t is not None:
+            self._reach_t.append(0)
+        return len(self.rows) - 1
+
+    def reaches(self, u:int, v:int ):
+        return (self.reach[u] >> v) & 1 == 1
+
+    def add_edge(self, u:int, v:int ):
+        """ Add u -> v, and to every node reaching u or u itself, v and
+            the reach of v.  Returns the number of reach rows changed."""
+        n = len(self.rows)
+        if not (0 <= u < n and 0 <= v < n):
+            raise BitLogicError('Edge ' + str(u) + ' -> ' + str(v) + ' outside ' + str(n) + ' nodes')
+        self.rows[u] |= 1 << v
+        if (self.reach[u] >> v) & 1:
+            return 0
+        new = self.reach[v] | (1 << v)
+        preds = self._sources(u) | (1 << u)
+        reach = self.reach
+        changed = 0
+        for x in bit_indexes(preds):
+            r = reach[x]
+            if new & ~r:
+                reach[x] = r | new
+                changed += 1
+        reach_t = self._reach_t
+        for y in bit_indexes(new):
+            if preds & ~reach_t[y]:
+                reach_t[y] |= preds
+        return changed
+
+    def closure(self):
+        return BitList(self.reach)
+
+    def reflexive(self):
+        return BitList([ r | (1 << i) for i, r in enumerate(self.reach) ])
+
+incrementalclosure = IncrementalClosure
+
+
+if __name__=='__main__':
+
+    import random
+    import time
+
+    nl()
+    print('==================================')
+    print("=== Test Script for 'BitGraph' ===")
+    print('==================================')
+    nl()
+
+    from bitlogic import bform
+
+    def show( rows ):
+        return [ bform(x, 5) for x in rows ]
+
+    # 0 -> 1 -> 2 -> 0, 2 -> 3, 4 -> 3
+    g = BitList([ 0b00010, 0b00100, 0b01001, 0b00000, 0b01000 ])
+    print('rows       ', show(g))
+    print('transpose  ', show(transpose(g, 5)))
+    print('product    ', show(product(g, g)), '  two steps')
+    print('closure    ', show(closure(g)))
+    print('reflexive  ', show(reflexive_closure(g)))
+    print('bfs from 4 ', [ bin(f) for f in bfs(g, 1 << 4) ])
+    c = incrementalclosure(g)
+    print('add 3 -> 4 changed ', c.add_edge(3, 4), '  ', show(c.closure()))
+    nl()
+
+    n = 20000
+    rows = [ 0 ] * n
+    for _ in range(3 * n):
+        i = random.randrange(n - 1)
+        rows[i] |= 1 << random.randrange(i + 1, min(i + 400, n))    # a DAG, little shared reach
+
+    start = time.time()
+    reach = closure(rows)
+    t_closure = time.time() - start
+
+    start = time.time()
+    rows_t = transpose(rows, n)
+    t_transpose = time.time() - start
+
+    start = time.time()
+    frontiers = list(bfs(rows, 1, rows_t))
+    t_bfs = time.time() - start
+
+    print('nodes ', n, '  edges ', sum([ popcount(x) for x in rows ]))
+    print('closure seconds ', round(t_closure, 3), '  reach of 0 ', popcount(reach[0]))
+    print('transpose seconds ', round(t_transpose, 3))
+    print('bfs seconds     ', round(t_bfs, 3), '  levels ', len(frontiers),
+          '  same ', sum(frontiers) == reach[0] | 1)
+    nl()
+
+    print('The End.')
+    nl()
@@ -0,0 +1,222 @@
+
+"""
+
+Bitmap Index
+
+Each value of each indexed attribute owns a 'binary' int whose set
+bits are the row ids of the records holding that value.  Boolean
+queries combine these masks with match, diff and invert rather than
+scanning rows, and row ids come back through bit_indexes.
+
+Best for low-cardinality attributes, every value mask is as wide as
+the highest row id holding that value.
+
+module:
+  bitindex
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+from bitlogic import (BitLogicError, BitList, bit_indexes, from_indexes,
+                      popcount, match, diff, bform, partial)
+
+nl = print
+
+
+class BitmapIndex(object):
+    """Bitmap index over records, dicts or sequences, for the given
+       fields ( dict keys or sequence positions ).  Row ids are the
+       order of insert and stay stable across deletes.
+    """
+
+    def __init__(self, fields, records=None ):
+
+        self.fields = tuple(fields)
+        self._masks = dict([ (f, {}) for f in self.fields ])
+        self._records = []
+        self._live = 0
+
+        if records:
+            self.extend(records)
+
+    """ Building """
+
+    def extend(self, records ):
+        """ Bulk insert in one pass, row ids gathered per value and
+            each value mask built once with from_indexes."""
+        start = len(self._records)
+        gathered = dict([ (f, {}) for f in self.fields ])
+
+        rid = start
+        for rec in records:
+            self._records.append(rec)
+            for f in self.fields:
+                ids = gathered[f].get(rec[f])
+                if ids is None:
+                    gathered[f][rec[f]] = [rid]
+                else:
+                    ids.append(rid)
+            rid += 1
+
+        for f in self.fields:
+            masks = self._masks[f]
+            for value, ids in gathered[f].items():
+                masks[value] = masks.get(value, 0) | from_indexes(ids)
+
+        self._live |= ((1 << (rid - start)) - 1) << start
+        return range(start, rid)
+
+    def insert(self, record ):
+        """ Add one record, returns its row id."""
+        rid = len(self._records)
+        bit = 1 << rid
+        self._records.append(record)
+        for f in self.fields:
+            masks = self._masks[f]
+            masks[record[f]] = masks.get(record[f], 0) | bit
+        self._live |= bit
+        return rid
+
+    def delete(self, rid:int ):
+        """ Remove row rid from every value mask, the id is not reused."""
+        record = self.record(rid)
+        bit = 1 << rid
+        for f in self.fields:
+            masks = self._masks[f]
+            m = masks[record[f]] ^ bit
+            if m:
+                masks[record[f]] = m
+            else:
+                del masks[record[f]]
+        self._records[rid] = None
+        self._live ^= bit
+
+    def record(self, rid:int ):
+        if rid < 0 or rid >= len(self._records) or self._records[rid] is None:
+            raise BitLogicError('No live row ' + str(rid))
+        return self._records[rid]
+
+    """ Masks and queries """
+
+    @property
+    def live(self):
+        """Mask of all live row ids."""
+        return self._live
+
+    def __len__(self):
+        return popcount(self._live)
+
+    def values(self, field ):
+        return list(self._masks[field].keys())
+
+    def mask(self, field, value ):
+        """ Rows where field == value, 0 when none."""
+        return self._masks[field].get(value, 0)
+
+    def isin(self, field, values ):
+        """ Rows where field is any of values."""
+        masks = self._masks[field]
+        m = 0
+        for v in values:
+            m |= masks.get(v, 0)
+        return m
+
+    def where(self, **conds ):
+        """ Rows matching all conds, field=value or field=[values].
+            Only usable with str field names."""
+        m = self._live
+        for f, v in conds.items():
+            if isinstance(v, (list, tuple, set, frozenset)):
+                m = match(m, self.isin(f, v))
+            else:
+                m = match(m, self.mask(f, v))
+            if m == 0:
+                break
+        return m
+
+    def invert(self, mask:int ):
+        """ Live rows not in mask, ones-complement within the live rows."""
+        return diff(match(mask, self._live), self._live)
+
+    def rows(self, mask:int ):
+        """ Generator of row ids set in mask."""
+        return bit_indexes(mask)
+
+    def records(self, mask:int ):
+        """ Generator of the records set in mask."""
+        recs = self._records
+        return (recs[i] for i in bit_indexes(mask))
+
+    def count(self, mask:int ):
+        return popcount(mask)
+
+    def form(self):
+        """ BitList of the live mask and every value mask, for bform."""
+        bl = BitList([self._live])
+        for f in self.fields:
+            bl.extend(self._masks[f].values())
+        return bl
+
+bitmapindex = BitmapIndex
+
+
+if __name__=='__main__':
+
+    nl()
+    print('=====================================')
+    print("=== Test Script for 'BitmapIndex' ===")
+    print('=====================================')
+    nl()
+
+    recs = [ { 'name': 'one',   'parity': 'odd',  'size': 'small' },
+             { 'name': 'two',   'parity': 'even', 'size': 'small' },
+             { 'name': 'three', 'parity': 'odd',  'size': 'small' },
+             { 'name': 'four',  'parity': 'even', 'size': 'small' },
+             { 'name': 'five',  'parity': 'odd',  'size': 'large' },
+             { 'name': 'six',   'parity': 'even', 'size': 'large' },
+             { 'name': 'seven', 'parity': 'odd',  'size': 'large' },
+             { 'name': 'eight', 'parity': 'even', 'size': 'large' } ]
+
+    bx = bitmapindex(['parity', 'size'], recs)
+    bbform = partial(bform, maxblen=bx.form().max_length)
+
+    print('live          ', bbform(bx.live))
+    print('parity odd    ', bbform(bx.mask('parity', 'odd')))
+    print('size large    ', bbform(bx.mask('size', 'large')))
+    nl()
+
+    m = bx.where(parity='odd', size='large')
+    print("where(parity='odd', size='large') ", bbform(m))
+    print('rows    ', list(bx.rows(m)))
+    print('names   ', [ r['name'] for r in bx.records(m) ])
+    nl()
+
+    m = bx.invert(bx.mask('parity', 'odd'))
+    print("invert(mask('parity', 'odd'))     ", bbform(m))
+    print('names   ', [ r['name'] for r in bx.records(m) ])
+    nl()
+
+    print('delete(4), insert nine')
+    bx.delete(4)
+    rid = bx.insert({ 'name': 'nine', 'parity': 'odd', 'size': 'large' })
+    m = bx.where(parity='odd', size='large')
+    print('new row id ', rid, '  len ', len(bx))
+    print('names   ', [ r['name'] for r in bx.records(m) ])
+    nl()
+
+    print('The End.')
+    nl()
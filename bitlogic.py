@@ -29,8 +29,6 @@ author:
     
 """
 
-from math import log, floor, ceil
-
 try:
     from functools import partial
 except:
@@ -173,19 +171,23 @@ class BitInt(object):
              
          """ 
 
-        # print('iter- for self ', self)
-        # print('iter- bin(self) ', bin(self))
-        # print('iter- bit_length ', self.bit_length)
-        # nl()
-
-        for bindex in range(self.bit_length):
-        
-            # print('iter- bindex ', bindex)
-            test = pow( 2, bindex ) & self._int
-            if test == 0:
-                yield 0
-            else:
-                yield 1
+        blen = self.bit_length
+        bindex = 0
+        for w in _words(self._int):
+            for j in range(min(_WORD, blen - bindex)):
+                yield (w >> j) & 1
+            bindex += _WORD
+        while bindex < blen:  # zero has no words, but bit_length 1
+            yield 0
+            bindex += 1
+
+    def indexes(self):
+        """Generator of the indexes of bits set, lowest first.
+           Costs one step per set bit, not one per bit.
+
+           ex. list(bitint(11).indexes()) is [0, 1, 3]
+        """
+        return bit_indexes(self._int)
                 
     @property
     def value(self):
@@ -197,11 +199,7 @@ class BitInt(object):
             
     @property
     def num_bits_set(self):
-
-        bl = [ v for v in iter(self) ]
-        #print('nbs ', bl)
-        #print('nbs ' , bl.count(1))
-        return bl.count(1)
+        return popcount(self._int)
     
     @property       
     def bin(self):
@@ -224,41 +222,133 @@ class BitList( list ):
         
         try:
             return max(max(self).bit_length(), 1)
-        except:  # upython  
-            max_len = max([ bit_length(i) for i in self ]) 
-            return max(max_len, 1)           
+        except:  # upython, no int.bit_length, the largest is the longest
+            return max(bit_length(max(self)), 1)
     
     def make_bitmask( self ):
         """ Bit_mask of binary ones with max length in collection
                 of 'binary' ints. Inverting leading 0 to 1 is significant."""
-        # return int(str( '1'* self.max_length), base=2)  crashes micropython, no base kw
-        return int(str( '1'* self.max_length), 2)
+        return make_bitmask(self.max_length)
     
     def form( self, x:int ):
             
-        try:
-            return zfill(x, 'b').zfill(self.max_length)
-        except: # upython
-            return zfill(x, self.max_length)
+        return bform(x, self.max_length)
+
+    def forms( self, fmt='b', sep=' ' ):
+        """ Generator of aligned lines for every int in the list,
+                max_length is taken once. See bforms."""
+        return bforms(self, fmt, self.max_length if self else None, sep)
+
+    def dump( self, out, fmt='b', sep=' ', batch=1024 ):
+        """ Stream aligned lines to a file or writer. See bdump."""
+        return bdump(self, out, fmt, self.max_length if self else None, sep, batch)
                     
 bitlist = BitList
 
 
 def zfill(x:int, maxlen=None):
     """ Make string of 1/0 for int x, filling zeros to left.
-            For upython, dumb but nails it and can also work as
-            zfill of last resort."""
+            For upython, no str.zfill, and can also work as
+            zfill of last resort.  One byte lookup per 8 bits."""
     
     if maxlen is None: return None
     
-    s = []
-    for i in range(maxlen):
-        if x << i == 0:
-            s.insert(0, '0')
-        else:
-            s.insert(0, '1') 
-                     
-    return ''.join(s)
+    return _lut_bin(x, maxlen)
+
+""" Exact integer engine, no float log.  int.bit_length/int.bit_count
+    where they exist, shift and count fallbacks for micropython."""
+
+try:
+    (1).bit_length()
+    def _bit_length( x:int ):
+        return x.bit_length()
+except AttributeError: # upython
+    def _bit_length( x:int ):
+        """ Binary search on shifts, O(log n) shifts of the int
+            rather than one shift per bit."""
+        n = 0
+        s = 32
+        while x >> s:
+            s <<= 1
+        while s:
+            if x >> s:
+                x >>= s
+                n += s
+            s >>= 1
+        return n + x  # x is now 0 or 1
+
+try:
+    (1).bit_count()
+    def popcount( x:int ):
+        """Number of bits set in x."""
+        return x.bit_count()
+except AttributeError: # Python < 3.10, upython
+    def popcount( x:int ):
+        """Number of bits set in x."""
+        return bin(x).count('1')
+
+try:
+    from sys import byteorder as _byteorder
+except ImportError:
+    _byteorder = 'little'
+
+_WORD = 64
+_WORD_MASK = (1 << _WORD) - 1
+
+def _words( x:int ):
+    """ x as a little-endian sequence of 64-bit words, from a single
+        to_bytes rather than one big shift per word when possible."""
+    nwords = (_bit_length(x) + _WORD - 1) // _WORD
+    try:
+        b = x.to_bytes(nwords * 8, 'little')
+    except (AttributeError, OverflowError, TypeError): # upython, old mpz
+        return _shift_words(x, nwords)
+    try:
+        if _byteorder == 'little':
+            return memoryview(b).cast('Q')
+    except (AttributeError, TypeError, ValueError): # upython, no cast
+        pass
+    return _byte_words(b, nwords)
+
+def _byte_words( b, nwords:int ):
+    for i in range(0, nwords * 8, 8):
+        yield int.from_bytes(b[i:i + 8], 'little')
+
+def _shift_words( x:int, nwords:int ):
+    for _ in range(nwords):
+        yield x & _WORD_MASK
+        x >>= _WORD
+
+def bit_indexes( x:int ):
+    """ Generator of the indexes of bits set in x, lowest first.
+        Zero words are skipped and each set bit is taken with
+        low-bit extraction, w & -w, on a small word int."""
+    base = 0
+    for w in _words(x):
+        while w:
+            low = w & -w
+            yield base + _bit_length(low) - 1
+            w ^= low
+        base += _WORD
+
+def from_indexes( indexes ):
+    """ int with the bits at indexes set, the inverse of bit_indexes.
+        Built in a bytearray and converted once, rather than one
+        big-int OR per index."""
+    if not isinstance(indexes, (list, tuple)):
+        indexes = list(indexes)
+    if not indexes:
+        return 0
+    if min(indexes) < 0:
+        raise BitLogicError('Negative bit index.')
+    bits = bytearray((max(indexes) >> 3) + 1)
+    for i in indexes:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+def is_power_of_two( x:int ):
+    """ Exactly one bit set in x."""
+    return x > 0 and x & (x - 1) == 0
 
 def bit_length( bint:int ):
     """ bint is binary view of int.
@@ -271,18 +361,68 @@ def bit_length( bint:int ):
     if bint == 0:
        return 1 # unlike Py bit_length()
        
-    lb = log(bint,2)
-    lbi = int(lb)
-    if lb == lbi: 
-            return lbi+1
-    return ceil(lb)
+    return _bit_length(bint)
+
+
+try:
+    from collections import OrderedDict as _LRUDict
+except ImportError: # upython without collections, eviction order arbitrary
+    _LRUDict = dict
+
+class MaskCache(object):
+    """Bounded LRU of width to bit_mask of binary ones, shared by
+       make_bitmask, make_bitmask_for, invert and BitList, with hit
+       and miss counts.  Bounded by maxsize entries and by maxbits,
+       the total width cached, so memory is at most some maxbits / 8
+       bytes.  A mask wider than maxbits is built and not cached. """
+
+    def __init__(self, maxsize=128, maxbits=1 << 22 ):
+        self.maxsize = maxsize
+        self.maxbits = maxbits
+        self.bits = 0
+        self.hits = 0
+        self.misses = 0
+        self._masks = _LRUDict()
+
+    def __call__(self, width:int ):
+        masks = self._masks
+        m = masks.pop(width, None)
+        if m is None:
+            self.misses += 1
+            m = (1 << width) - 1
+            if width > self.maxbits:
+                return m
+            self.bits += width
+            while masks and (len(masks) >= self.maxsize or self.bits > self.maxbits):
+                oldest = next(iter(masks))
+                del masks[oldest]
+                self.bits -= oldest
+        else:
+            self.hits += 1
+        masks[width] = m
+        return m
+
+    def __len__(self):
+        return len(self._masks)
+
+    def stats(self):
+        return { 'hits': self.hits, 'misses': self.misses,
+                 'size': len(self._masks), 'maxsize': self.maxsize,
+                 'bits': self.bits, 'maxbits': self.maxbits }
+
+    def clear(self):
+        self._masks = _LRUDict()
+        self.bits = 0
+        self.hits = 0
+        self.misses = 0
 
+mask_cache = MaskCache()
 
 def make_bitmask( blength=1 ):
     """Need to partial make_bitmask with max length of collection
        of 'binary' ints."""
        
-    return int(str( '1'* max(blength, 1)), 2)
+    return mask_cache(max(blength, 1))
     
 def make_bitmask_for( x:int ):
 
@@ -298,22 +438,140 @@ def bform( x:int, maxblen=None ):
     except: # upython
             return zfill(x, maxblen)
 
-""" Functions to Compare Bitwise Integers"""
+""" Bulk formatting, byte lookup tables built on first use. """
+
+_BYTE_BIN = None
+_BYTE_HEX = None
+_NIBBLE_BIN = ('0000', '0001', '0010', '0011', '0100', '0101', '0110', '0111',
+               '1000', '1001', '1010', '1011', '1100', '1101', '1110', '1111')
+_HEX_DIGITS = '0123456789abcdef'
+
+def _tables():
+    global _BYTE_BIN, _BYTE_HEX
+    if _BYTE_BIN is None:
+        _BYTE_BIN = tuple([ _NIBBLE_BIN[b >> 4] + _NIBBLE_BIN[b & 15] for b in range(256) ])
+        _BYTE_HEX = tuple([ _HEX_DIGITS[b >> 4] + _HEX_DIGITS[b & 15] for b in range(256) ])
+    return _BYTE_BIN, _BYTE_HEX
+
+def _le_bytes( x:int, nbytes:int ):
+    try:
+        return x.to_bytes(nbytes, 'little')
+    except (AttributeError, OverflowError, TypeError): # upython, old mpz
+        b = bytearray(nbytes)
+        for i in range(nbytes):
+            b[i] = x & 0xFF
+            x >>= 8
+        return b
+
+def _lut_bin( x:int, width:int ):
+    """ Binary string of x, zero filled to width, by byte lookup."""
+    width = max(width, _bit_length(x), 1)
+    table = _tables()[0]
+    s = ''.join([ table[c] for c in reversed(_le_bytes(x, (width + 7) >> 3)) ])
+    return s[len(s) - width:]
+
+def _lut_hex( x:int, digits:int ):
+    """ Hex string of x, zero filled to digits, by byte lookup."""
+    digits = max(digits, (_bit_length(x) + 3) >> 2, 1)
+    table = _tables()[1]
+    s = ''.join([ table[c] for c in reversed(_le_bytes(x, (digits + 1) >> 1)) ])
+    return s[len(s) - digits:]
+
+def _formatter( fmt:str, width:int, sep:str ):
+    """ One function for a whole table: format() with a fixed spec when
+        it is exact here, byte lookup otherwise."""
+    if fmt == 'n':
+        return _nibbler(_formatter('b', (width + 3) & ~3, sep), sep)
+    if fmt == 'x':
+        digits = (width + 3) >> 2
+        spec = '0' + str(digits) + 'x'
+        probe, expect = (1 << 100) | 0xab, '1' + '0' * 23 + 'ab'
+        slow = lambda x: _lut_hex(x, digits)
+    elif fmt == 'b':
+        spec = '0' + str(width) + 'b'
+        probe, expect = (1 << 100) | 5, '1' + '0' * 97 + '101'
+        slow = lambda x: _lut_bin(x, width)
+    else:
+        raise BitLogicError("Format must be 'b', 'x' or 'n', not " + repr(fmt))
+
+    try:
+        fast = format(probe, spec)[-len(expect):] == expect
+    except: # upython
+        fast = False
+    return (lambda x: format(x, spec)) if fast else slow
+
+def _nibbler( binf, sep:str ):
+    """ Binary string cut into nibbles by strided slice assignment into
+        a template of '0000' + sep, four C-level copies per line."""
+    sepb = sep.encode()
+    stride = 4 + len(sepb)
+
+    def strided(x):
+        bs = binf(x).encode()
+        if len(bs) & 3:
+            bs = b'0' * (-len(bs) & 3) + bs
+        out = bytearray((b'0000' + sepb) * (len(bs) >> 2))
+        for j in range(4):
+            out[j::stride] = bs[j::4]
+        return out[:len(out) - len(sepb)].decode()
+
+    def joined(x):  # upython, no extended slice assignment
+        s = binf(x)
+        s = '0' * (-len(s) & 3) + s
+        return sep.join([ s[i:i + 4] for i in range(0, len(s), 4) ])
 
+    try:
+        return strided if strided(5) == joined(5) else joined
+    except: # upython
+        return joined
+
+def bforms( ints, fmt='b', width=None, sep=' ' ):
+    """ Generator of aligned lines for a list of 'binary' ints, in one
+        pass with the width taken once.
+
+        fmt 'b' binary, 'x' hex, 'n' binary in nibbles split by sep.
+        No ints, no lines.
+    """
+    if width is None:
+        if not isinstance(ints, BitList):
+            ints = BitList(ints)
+        if not ints:
+            return
+        width = ints.max_length
+    f = _formatter(fmt, width, sep)
+    for x in ints:
+        yield f(x)
+
+def bdump( ints, out, fmt='b', width=None, sep=' ', batch=1024 ):
+    """ Stream bforms lines to out, a file or anything with write(),
+        or a callable, batch lines per write.  Returns lines written."""
+    write = out.write if hasattr(out, 'write') else out
+    lines = []
+    n = 0
+    for line in bforms(ints, fmt, width, sep):
+        lines.append(line)
+        if len(lines) >= batch:
+            write('\n'.join(lines) + '\n')
+            n += len(lines)
+            lines = []
+    if lines:
+        write('\n'.join(lines) + '\n')
+        n += len(lines)
+    return n
+
+
+""" Functions to Compare Bitwise Integers"""
 
-""" Possible for the log func to blow up with large numbers, 2^1000 or so ?"""
 
 def one_of( x:int, y:int ):
     """Only one of x in y. """
-    if x == 0: return False
-    t = log((x & y), 2)
-    return t == floor(t)
+    m = x & y
+    return m > 0 and m & (m - 1) == 0
 
 def morethanone_of( x:int, y:int ):
     """More than one of x in y. """
-    if x == 0: return False
-    t = log((x & y), 2)
-    return t != floor(t)
+    m = x & y
+    return m & (m - 1) > 0
     
 def all_of( x:int, y:int ):
     """All of x in y"""
@@ -338,16 +596,32 @@ def match( x:int, y:int ):
     """Like all_of, but returns value rather than bool"""
     return x & y
     
-def invert( x:int ):
-    """Logical ones-complement, not '~' which sets neg. bit"""
-    # must be partialled with bitlength 
+def invert( x:int, width=None ):
+    """Logical ones-complement, not '~' which sets neg. bit.
+       Within width when given, leading zeros up to width invert
+       to ones, otherwise within the bit_length of x."""
     
     if x == ~0: return 0
+    if width is not None:
+        if _bit_length(x) > width:
+            raise BitLogicError('Invert of int wider than width ' + str(width))
+        if width == 0:
+            return 0    # x is 0, nothing to invert
+        return x ^ make_bitmask(width)
     if x == 0: return 1
     
     return x ^ make_bitmask_for(x)
 
 
+if DEBUG:   # instrumentation, see bitprofile, nothing installed when False
+    try:
+        import bitprofile
+        if hasattr(bitprofile, 'enable'):
+            bitprofile.enable()
+    except ImportError:
+        pass
+
+
 if __name__=='__main__':
 
     nl()
@@ -502,6 +776,12 @@ if __name__=='__main__':
     print('odds ', olist)
     print('evens ', elist)
     nl()
+
+    print('Using odd_index.indexes() ', list(odd_index.indexes()), ' set bits only')
+    nl()
+    print('odds ', [ ilist[i] for i in odd_index.indexes() ])
+    print('evens ', [ ilist[i] for i in even_index.indexes() ])
+    nl()
     
    
     print('=== bitlist class and bform ===')
@@ -528,6 +808,12 @@ if __name__=='__main__':
     print('blist make_bitmask: ', blist.form(blist.make_bitmask()))
     nl()
     
+    print('blist.forms() in hex and nibbles, one pass')
+    nl()
+    for hline, nline in zip(blist.forms('x'), blist.forms('n')):
+        print('   ', hline, '  ', nline)
+    nl()
+
     print('bbform, bform partialled to length blist.max_length')
     nl()
     bbform = partial( bform, maxblen=blist.max_length)
@@ -540,6 +826,7 @@ if __name__=='__main__':
     print('bform(int)            ', bform(int(0b0101011101111001110001110)))
     print('bform(invert(int, 24) ', bform(invert(int(0b0101011101111001110001110)), 24), '   length 24')
     print('bform(invert(int)     ', bform(invert(int(0b0101011101111001110001110))), '    length becomes 23')
+    print('bform(invert(int, 26))', bform(invert(int(0b0101011101111001110001110), 26)), ' width bound')
     nl()
     print('Not working with CircuitPython, bad partial function ? ')
 
@@ -710,6 +997,8 @@ if __name__=='__main__':
     print('1^make_bitmask(4)      ', bin(1^make_bitmask(4)))
     print('1^int(0b1111)          ', bin(1^int(0b1111))) 
     nl()
+    print('mask_cache.stats() ', mask_cache.stats())
+    nl()
   
     nl()
     print('The End.')
@@ -0,0 +1,333 @@
+
+"""
+
+Bit Logic Bench
+
+Benchmark suite for bitlogic, every public function and the BitInt and
+BitList methods, for operands from 8 bits to 1M bits.  For each
+benchmark and width it reports calls per second and bytes allocated
+per call, and compares against a stored JSON baseline.
+
+  python bitlogic_bench.py                       run, print tables
+  python bitlogic_bench.py --save                store the baseline
+  python bitlogic_bench.py --check               compare, exit 1 on
+                                                 any regression
+  micropython bitlogic_bench.py --check          same, unix port
+
+options:
+
+  --widths 8,64,1024    operand widths, default WIDTHS
+  --only all_of,bform   benchmarks by name, default all
+  --budget 10           milliseconds per timing, best of REPEAT
+  --tolerance 0.25      allowed slowdown / growth before a regression
+  --baseline path       default bitlogic_bench.json beside this module
+
+Allocations are tracemalloc peak bytes per call on CPython, and heap
+used per call with gc off ( gc.mem_free deltas ) on micropython.  The
+two are not the same measure, so the baseline file keeps one section
+per interpreter ( sys.implementation.name ).  Timings include one
+Python call of overhead, constant across runs, so fine for regressions.
+
+Runs unchanged on Python 3.9+ and the micropython unix port, on a
+Pico use --widths, 1M-bit operands will not fit.
+
+module:
+  bitlogic_bench
+
+version:
+  v0.2.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+import gc
+import sys
+import time
+
+try:
+    import json
+except ImportError: # upython, older ports
+    import ujson as json
+
+try:
+    import tracemalloc
+except ImportError: # upython
+    tracemalloc = None
+
+from bitlogic import (BitInt, BitList, zfill, bform, bit_length, popcount,
+                      is_power_of_two, invert, make_bitmask, bit_indexes,
+                      from_indexes, all_of, any_of, none_of, one_of,
+                      morethanone_of, match, diff, _bit_length)
+
+try:
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(end, start):
+        return end - start
+
+
+nl = print
+
+WIDTHS = [ 8, 64, 256, 1024, 4096, 16384, 65536, 262144, 1048576 ]
+BUDGET_MS = 10
+REPEAT = 5
+TOLERANCE = 0.25
+ALLOC_SLACK = 64        # bytes, allocator noise
+def _beside( name:str ):
+    """ name in the directory of this module, not the working one.
+        String split, micropython has no os.path."""
+    here = globals().get('__file__', '')
+    cut = max(here.rfind('/'), here.rfind('\\'))
+    return here[:cut + 1] + name if cut >= 0 else name
+
+BASELINE = _beside('bitlogic_bench.json')
+
+
+def operand( width:int ):
+    """ Dense-ish operand of exactly width bits, alternating nibbles."""
+    x = 0
+    for i in range(0, width, 8):
+        x |= 0x5a << i
+    x &= (1 << width) - 1
+    return x | (1 << (width - 1))
+
+def _drain( it ):
+    for v in it:
+        pass
+
+
+""" Benchmarks, ( name, setup( operands ) returning ( func, args ) ) """
+
+def _operands( width:int ):
+    x = operand(width)
+    y = x >> 1 | 1
+    p = 1 << (width - 1)
+    bl = BitList([ x >> (i * width // 8) for i in range(8) ])
+    return { 'x': x, 'y': y, 'p': p, 'bx': BitInt(x), 'bl': bl }
+
+BENCHMARKS = [
+    ('BitInt()',              lambda o: (BitInt, (o['x'],))),
+    ('BitInt &',              lambda o: (lambda a, b: a & b, (o['bx'], o['y']))),
+    ('BitInt |',              lambda o: (lambda a, b: a | b, (o['bx'], o['y']))),
+    ('BitInt ^',              lambda o: (lambda a, b: a ^ b, (o['bx'], o['y']))),
+    ('BitInt ~',              lambda o: (lambda a: ~a, (o['bx'],))),
+    ('BitInt <<',             lambda o: (lambda a: a << 3, (o['bx'],))),
+    ('BitInt >>',             lambda o: (lambda a: a >> 3, (o['bx'],))),
+    ('BitInt iter',           lambda o: (lambda a: _drain(a), (o['bx'],))),
+    ('BitInt indexes',        lambda o: (lambda a: _drain(a.indexes()), (o['bx'],))),
+    ('num_bits_set',          lambda o: (lambda a: a.num_bits_set, (o['bx'],))),
+    ('BitList.max_length',    lambda o: (lambda l: l.max_length, (o['bl'],))),
+    ('BitList.form',          lambda o: (o['bl'].form, (o['x'],))),
+    ('BitList.make_bitmask',  lambda o: (o['bl'].make_bitmask, ())),
+    ('zfill',                 lambda o: (zfill, (o['x'], _bit_length(o['x'])))),
+    ('bform',                 lambda o: (bform, (o['x'], _bit_length(o['x'])))),
+    ('bit_length',            lambda o: (bit_length, (o['x'],))),
+    ('popcount',              lambda o: (popcount, (o['x'],))),
+    ('is_power_of_two',       lambda o: (is_power_of_two, (o['p'],))),
+    ('make_bitmask',          lambda o: (make_bitmask, (_bit_length(o['x']),))),
+    ('invert',                lambda o: (invert, (o['x'],))),
+    ('bit_indexes',           lambda o: (lambda a: _drain(bit_indexes(a)), (o['p'] | 1,))),
+    ('from_indexes',          lambda o: (from_indexes, ([0, _bit_length(o['x']) - 1],))),
+    ('all_of',                lambda o: (all_of, (o['y'], o['x']))),
+    ('any_of',                lambda o: (any_of, (o['y'], o['x']))),
+    ('none_of',               lambda o: (none_of, (o['y'], o['x']))),
+    ('one_of',                lambda o: (one_of, (o['p'], o['x']))),
+    ('morethanone_of',        lambda o: (morethanone_of, (o['x'], o['x']))),
+    ('match',                 lambda o: (match, (o['x'], o['y']))),
+    ('diff',                  lambda o: (diff, (o['x'], o['y']))),
+]
+
+
+""" Measures """
+
+def time_call( func, args, reps:int ):
+    """ Microseconds for reps calls."""
+    start = ticks_us()
+    for _ in range(reps):
+        func(*args)
+    return ticks_diff(ticks_us(), start)
+
+def ops_per_sec( func, args, budget_ms=BUDGET_MS, repeat=REPEAT ):
+    """ Calls per second, reps grown until one timing fills the budget,
+        then the best of repeat timings."""
+    budget = budget_ms * 1000
+    reps = 1
+    while True:
+        us = time_call(func, args, reps)
+        if us >= budget or reps >= 1 << 24:
+            break
+        reps = reps * 4 if us < budget // 16 else max(reps * 2, int(reps * budget / max(us, 1)) + 1)
+    for _ in range(repeat - 1):
+        us = min(us, time_call(func, args, reps))
+    return reps * 1000000 / max(us, 1)
+
+def alloc_per_call( func, args ):
+    """ Bytes allocated by one call, see the module docstring."""
+    gc.collect()
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func(*args)
+            return max(tracemalloc.get_traced_memory()[1] - before, 0)
+        finally:
+            tracemalloc.stop()
+    gc.disable()
+    try:
+        free = gc.mem_free()
+        r = func(*args)     # held, so its bytes count
+        used = free - gc.mem_free()
+        r = None
+        return max(used, 0)
+    finally:
+        gc.enable()
+
+
+def run( widths=None, names=None, budget_ms=BUDGET_MS, out=True ):
+    """ { name: { width: [ ops/sec, bytes/call ] } }, widths as str
+        keys ( json ).  Prints a table per benchmark when out."""
+
+    widths = widths or WIDTHS
+    results = {}
+    for w in widths:
+        ops = _operands(w)
+        for name, setup in BENCHMARKS:
+            if names and name not in names:
+                continue
+            func, args = setup(ops)
+            func(*args)     # warm caches, first-call costs
+            results.setdefault(name, {})[str(w)] = [ ops_per_sec(func, args, budget_ms),
+                                                     alloc_per_call(func, args) ]
+        ops = None
+        gc.collect()
+
+    if out:
+        report(results)
+    return results
+
+def report( results, baseline=None, tolerance=TOLERANCE ):
+    """ Print results, with change against baseline when given.
+        Returns the list of regressions, ( name, width, what, old, new )."""
+
+    regressions = []
+    for name, _ in BENCHMARKS:
+        if name not in results:
+            continue
+        nl()
+        print(name)
+        print('{:>10} {:>14} {:>12} {:>9} {:>9}'.format('width', 'ops/sec', 'bytes/call',
+                                                      'ops', 'bytes'))
+        base = (baseline or {}).get(name, {})
+        for w in sorted(results[name], key=int):
+            ops, alloc = results[name][w]
+            dops = dalloc = ''
+            if w in base:
+                bops, balloc = base[w]
+                dops = '{:+.0f}%'.format((ops / bops - 1) * 100) if bops else ''
+                dalloc = '{:+d}'.format(alloc - balloc)
+                if ops * (1 + tolerance) < bops:
+                    regressions.append((name, w, 'ops/sec', bops, ops))
+                    dops += ' !'
+                if alloc > balloc * (1 + tolerance) + ALLOC_SLACK:
+                    regressions.append((name, w, 'bytes/call', balloc, alloc))
+                    dalloc += ' !'
+            print('{:>10} {:>14.0f} {:>12} {:>9} {:>9}'.format(w, ops, alloc, dops, dalloc))
+    return regressions
+
+
+""" Baseline, one section per interpreter """
+
+def implementation():
+    return sys.implementation.name
+
+def load_baseline( path=BASELINE ):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+def save_baseline( results, path=BASELINE ):
+    """ Merge results into this interpreter's section of path."""
+    data = load_baseline(path)
+    section = data.setdefault(implementation(), {})
+    for name in results:
+        section.setdefault(name, {}).update(results[name])
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    return data
+
+
+""" Command line, by hand, micropython has no argparse """
+
+def _args( argv ):
+    opts = { 'widths': None, 'only': None, 'budget': BUDGET_MS, 'tolerance': TOLERANCE,
+             'baseline': BASELINE, 'save': False, 'check': False }
+    i = 0
+    while i < len(argv):
+        a = argv[i]
+        if a in ('--save', '--check'):
+            opts[a[2:]] = True
+        elif a in ('--widths', '--only', '--budget', '--tolerance', '--baseline') and i + 1 < len(argv):
+            i += 1
+            opts[a[2:]] = argv[i]
+        else:
+            print('unknown argument ', a, ' see the bitlogic_bench docstring')
+            return None
+        i += 1
+    if opts['widths']:
+        opts['widths'] = [ int(w) for w in opts['widths'].split(',') ]
+    if opts['only']:
+        opts['only'] = opts['only'].split(',')
+    opts['budget'] = float(opts['budget'])
+    opts['tolerance'] = float(opts['tolerance'])
+    return opts
+
+def main( argv=None ):
+    opts = _args(sys.argv[1:] if argv is None else argv)
+    if opts is None:
+        return 2
+
+    print('bitlogic bench, ', implementation(), sys.version.split()[0])
+    results = run(opts['widths'], opts['only'], opts['budget'], out=False)
+
+    baseline = None
+    if opts['check']:
+        baseline = load_baseline(opts['baseline']).get(implementation())
+        if not baseline:
+            print('no', implementation(), 'baseline in', opts['baseline'])
+    regressions = report(results, baseline, opts['tolerance'])
+    nl()
+
+    if opts['save']:
+        save_baseline(results, opts['baseline'])
+        print('baseline saved to', opts['baseline'])
+    if regressions:
+        print(len(regressions), 'regressions, more than', opts['tolerance'], 'worse:')
+        for name, w, what, old, new in regressions:
+            print('   {} {} bits {} {:.0f} -> {:.0f}'.format(name, w, what, old, new))
+        return 1
+    if baseline:
+        print('no regressions against', opts['baseline'])
+    return 0
+
+
+if __name__=='__main__':
+
+    sys.exit(main())
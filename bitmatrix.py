@@ -0,0 +1,324 @@
+
+"""
+
+Bit Matrix
+
+Batch counterpart to BitList.  A BitMatrix holds many fixed-width
+'binary' ints packed as rows of little-endian uint64 words in a NumPy
+array, and runs the bitlogic predicates against every row in one
+vectorized call.
+
+Without NumPy ( micropython ) the rows are kept as a BitList and the
+same methods loop over the bitlogic functions, slower but identical.
+
+module:
+  bitmatrix
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bitlogic import (BitLogicError, BitInt, BitList, bform, make_bitmask,
+                      all_of, any_of, none_of, one_of, morethanone_of, _bit_length)
+
+nl = print
+
+_WORD = 64
+
+
+def _nwords( width:int ):
+    return (width + _WORD - 1) // _WORD
+
+def _int( x ):
+    """ int or BitInt to int, no negatives."""
+    if isinstance(x, BitInt):
+        x = x.value
+    x = int(x)
+    if x < 0:
+        raise BitLogicError('Negative values are not BitInt numbers.')
+    return x
+
+def _pack( ints, nwords:int ):
+    """ ints to an (n, nwords) uint64 array, one to_bytes per int."""
+    nbytes = nwords * 8
+    try:
+        buf = b''.join([ x.to_bytes(nbytes, 'little') for x in ints ])
+    except OverflowError:
+        raise BitLogicError('Mask wider than matrix width.')
+    return np.frombuffer(buf, dtype='<u8').reshape(-1, nwords)
+
+def _unpack( row ):
+    return int.from_bytes(row.astype('<u8').tobytes(), 'little')
+
+
+class BitMatrix(object):
+    """Fixed-width masks as rows of packed words.  Predicates take
+       a query x and test x against each row, all_of(x, row) and so on,
+       returning a bool array ( or list ).  A query may be an int, a
+       BitInt or a BitMatrix / BitList of the same length, tested row
+       by row.  match, diff and invert return a new BitMatrix.
+    """
+
+    def __init__(self, masks=None, width=None ):
+
+        masks = [ _int(x) for x in (masks or []) ]
+
+        if width is None:
+            width = BitList(masks).max_length if masks else 1
+        self.width = max(int(width), 1)
+        self.nwords = _nwords(self.width)
+
+        if masks and _bit_length(max(masks)) > self.width:
+            raise BitLogicError('Mask wider than matrix width.')
+        if np is None:
+            self._rows = BitList(masks)
+            self._words = None
+        else:
+            self._rows = None
+            self._words = _pack(masks, self.nwords)
+
+    @classmethod
+    def from_bitlist(cls, blist, width=None ):
+        return cls(blist, width or BitList(blist).max_length)
+
+    @classmethod
+    def _from_words(cls, words, width:int ):
+        bm = cls.__new__(cls)
+        bm.width = width
+        bm.nwords = _nwords(width)
+        bm._rows = None
+        bm._words = words
+        return bm
+
+    @classmethod
+    def _from_rows(cls, rows, width:int ):
+        bm = cls.__new__(cls)
+        bm.width = width
+        bm.nwords = _nwords(width)
+        bm._rows = BitList(rows)
+        bm._words = None
+        return bm
+
+    @property
+    def words(self):
+        """The (n, nwords) uint64 array, None without NumPy."""
+        return self._words
+
+    def to_bitlist(self):
+        if self._words is None:
+            return BitList(self._rows)
+        return BitList([ _unpack(row) for row in self._words ])
+
+    def __len__(self):
+        if self._words is None:
+            return len(self._rows)
+        return self._words.shape[0]
+
+    def __getitem__(self, index ):
+        if isinstance(index, slice):
+            if self._words is None:
+                return self._from_rows(self._rows[index], self.width)
+            return self._from_words(self._words[index], self.width)
+        if self._words is None:
+            return self._rows[index]
+        return _unpack(self._words[index])
+
+    def __iter__(self):
+        if self._words is None:
+            return iter(self._rows)
+        return (_unpack(row) for row in self._words)
+
+    def make_bitmask(self):
+        """ Bit_mask of binary ones for the matrix width."""
+        return make_bitmask(self.width)
+
+    def form(self, x:int ):
+        """ x in binary, zero filled to the matrix width."""
+        return bform(_int(x), self.width)
+
+    def _query(self, x ):
+        """ Query as words, (nwords,) for a single mask or (n, nwords)
+            for a matrix, or as a list of ints without NumPy."""
+        if isinstance(x, BitMatrix):
+            if x.width > self.width:
+                raise BitLogicError('Query wider than matrix width.')
+            x = x.to_bitlist() if self._words is None or x._words is None else x
+        if isinstance(x, (list, tuple)):
+            if len(x) != len(self):
+                raise BitLogicError('Query matrix length does not match.')
+            qs = [ _int(q) for q in x ]
+            if qs and _bit_length(max(qs)) > self.width:
+                raise BitLogicError('Query wider than matrix width.')
+            if self._words is None:
+                return qs
+            return _pack(qs, self.nwords)
+        if isinstance(x, BitMatrix):
+            if len(x) != len(self):
+                raise BitLogicError('Query matrix length does not match.')
+            if x.nwords == self.nwords:
+                return x._words
+            q = np.zeros((len(x), self.nwords), dtype='<u8')
+            q[:, :x.nwords] = x._words
+            return q
+        x = _int(x)
+        if _bit_length(x) > self.width:
+            raise BitLogicError('Query wider than matrix width.')
+        if self._words is None:
+            return x
+        return _pack([x], self.nwords)[0]
+
+    def _pairs(self, q ):
+        if isinstance(q, list):
+            return zip(q, self._rows)
+        return ((q, row) for row in self._rows)
+
+    """ Predicates, one bool per row """
+
+    def all_of(self, x ):
+        """All of x in each row"""
+        q = self._query(x)
+        if self._words is None:
+            return [ all_of(a, b) for a, b in self._pairs(q) ]
+        nonzero = q.any(axis=-1)
+        return ((self._words & q) == q).all(axis=1) & nonzero
+
+    def any_of(self, x ):
+        """Any of x in each row"""
+        q = self._query(x)
+        if self._words is None:
+            return [ any_of(a, b) for a, b in self._pairs(q) ]
+        return (self._words & q).any(axis=1)
+
+    def none_of(self, x ):
+        """None of x in each row"""
+        q = self._query(x)
+        if self._words is None:
+            return [ none_of(a, b) for a, b in self._pairs(q) ]
+        return ~(self._words & q).any(axis=1)
+
+    def one_of(self, x ):
+        """Only one of x in each row"""
+        q = self._query(x)
+        if self._words is None:
+            return [ one_of(a, b) for a, b in self._pairs(q) ]
+        m = self._words & q
+        single = ((m & (m - np.uint64(1))) == 0).all(axis=1)
+        return single & (np.count_nonzero(m, axis=1) == 1)
+
+    def morethanone_of(self, x ):
+        """More than one of x in each row"""
+        q = self._query(x)
+        if self._words is None:
+            return [ morethanone_of(a, b) for a, b in self._pairs(q) ]
+        m = self._words & q
+        single = ((m & (m - np.uint64(1))) == 0).all(axis=1)
+        return ~(single & (np.count_nonzero(m, axis=1) <= 1))
+
+    """ Operations, one int per row """
+
+    def match(self, x ):
+        """x & row for each row, as a BitMatrix"""
+        q = self._query(x)
+        if self._words is None:
+            return self._from_rows([ a & b for a, b in self._pairs(q) ], self.width)
+        return self._from_words(self._words & q, self.width)
+
+    def diff(self, x ):
+        """x ^ row for each row, as a BitMatrix"""
+        q = self._query(x)
+        if self._words is None:
+            return self._from_rows([ a ^ b for a, b in self._pairs(q) ], self.width)
+        return self._from_words(self._words ^ q, self.width)
+
+    def invert(self):
+        """Ones-complement of each row within the matrix width,
+           leading zeros are significant as in BitList."""
+        if self._words is None:
+            mask = self.make_bitmask()
+            return self._from_rows([ r ^ mask for r in self._rows ], self.width)
+        return self._from_words(self._words ^ self._width_words(), self.width)
+
+    def _width_words(self):
+        return _pack([make_bitmask(self.width)], self.nwords)[0]
+
+bitmatrix = BitMatrix
+
+
+if __name__=='__main__':
+
+    nl()
+    print('===================================')
+    print("=== Test Script for 'BitMatrix' ===")
+    print('===================================')
+    nl()
+
+    def bools(seq):
+        return [ bool(v) for v in seq ]
+
+    print('numpy ', 'available' if np is not None else 'not available, BitList fallback')
+    nl()
+
+    a = int(0b11101100000111)
+    b = int(0b10000000000000)
+    c = int(0b10100000000100)
+    d = int(0b00001111000000)
+    o = int(0b00000000000001)
+    z = int(0b00000000000000)
+
+    bm = bitmatrix([a, b, c, d, o, z])
+
+    print('bm width, nwords ', bm.width, bm.nwords)
+    for i, x in enumerate(bm):
+        print('row', i, ' = ', bm.form(x))
+    nl()
+
+    print('query b  ', bm.form(b))
+    print('all_of(b, row)         ', bools(bm.all_of(b)))
+    print('any_of(b, row)         ', bools(bm.any_of(b)))
+    print('none_of(b, row)        ', bools(bm.none_of(b)))
+    print('one_of(b, row)         ', bools(bm.one_of(b)))
+    print('morethanone_of(a, row) ', bools(bm.morethanone_of(a)))
+    nl()
+
+    print('match(a, row)')
+    for x in bm.match(a):
+        print('   ', bm.form(x))
+    nl()
+
+    print('invert within width')
+    for x in bm.invert():
+        print('   ', bm.form(x))
+    nl()
+
+    print('row by row, all_of(bm.match(a), bm) ', bools(bm.all_of(bm.match(a))))
+    nl()
+
+    print('to_bitlist ', bm.to_bitlist())
+    nl()
+
+    wide = bitmatrix([ 1 << 200, (1 << 200) | 1, 3 ], width=201)
+    print('wide width, nwords ', wide.width, wide.nwords)
+    print('one_of(1 << 200, row)  ', bools(wide.one_of(1 << 200)))
+    print('morethanone_of(1 | 1 << 200, row)  ', bools(wide.morethanone_of(1 | 1 << 200)))
+    nl()
+
+    print('The End.')
+    nl()
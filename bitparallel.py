@@ -0,0 +1,347 @@
+
+"""
+
+Bit Parallel
+
+Multi-core evaluation of bitlogic pipelines over large collections of
+fixed-width masks.  The masks are packed once into a shared memory
+block of little-endian uint64 words ( the bitfile body layout ), a
+process pool runs the pipeline on row chunks in place, and results
+come back through a second shared block, so no big ints are pickled.
+Results are read back by row index, in order.
+
+A pipeline is a list of ( name, mask ) steps, applied in order:
+
+  ('match', M)  ('diff', M)  ('invert', None)      transforms
+  ('all_of', M) ('any_of', M) ('none_of', M)
+  ('one_of', M) ('morethanone_of', M)              filters, x kept
+                                                   when pred(M, x)
+
+Masks come from a BitList, a BitMatrix or a mapped BitFile, the last
+two copied into shared memory word for word.  Small inputs run
+in-process, same code, no pool.  CPython only.
+
+module:
+  bitparallel
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+import os
+import multiprocessing
+from multiprocessing import shared_memory
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import bitlogic
+from bitlogic import BitLogicError, BitInt, BitList, make_bitmask, _bit_length
+from bitmatrix import BitMatrix
+from bitfile import BitFile
+
+nl = print
+
+TRANSFORMS = ('match', 'diff', 'invert')
+FILTERS = ('all_of', 'any_of', 'none_of', 'one_of', 'morethanone_of')
+
+MIN_PARALLEL_ROWS = 1 << 16     # below this, in-process
+MIN_CHUNK_ROWS = 1 << 13
+CHUNKS_PER_PROCESS = 4
+
+
+def _stride( width:int ):
+    return ((width + 63) >> 6) * 8
+
+def _check_ops( ops, width:int ):
+    """ ops as ( name, int mask ), every mask within width, the same
+        BitLogicError on the NumPy and the int path."""
+    ops = [ (name, None if m is None else int(m)) for name, m in ops ]
+    for name, m in ops:
+        if name not in TRANSFORMS and name not in FILTERS:
+            raise BitLogicError('Unknown pipeline step ' + repr(name))
+        if name == 'invert':
+            continue
+        if m is None or m < 0:
+            raise BitLogicError('Pipeline step ' + name + ' needs a mask.')
+        if _bit_length(m) > width:
+            raise BitLogicError('Pipeline step ' + name + ' mask wider than width ' + str(width))
+    return ops
+
+def _attach( name:str ):
+    """ Attach to an existing block, the creator unlinks it.  Pool
+        workers share the creator's resource tracker, so before 3.13
+        ( no track= ) a plain attach only repeats its registration."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+""" Workers, one row chunk each, results written in place """
+
+def _run_words( src, dst, flags, width:int, ops ):
+    """ NumPy chunk: src and dst (rows, nwords) uint64, flags uint8."""
+    bm = BitMatrix._from_words(src, width)
+    keep = bm.none_of(0)        # all True
+    for name, m in ops:
+        if name == 'invert':
+            bm = bm.invert()
+        elif name in TRANSFORMS:
+            bm = getattr(bm, name)(m)
+        else:
+            keep &= getattr(bm, name)(m)
+    dst[:] = bm.words
+    flags[:] = keep
+
+def _run_ints( src, dst, flags, start:int, stop:int, stride:int, width:int, ops ):
+    """ Pure Python chunk over memoryviews, one int at a time."""
+    inv = make_bitmask(width)
+    funcs = [ (name, m, getattr(bitlogic, name)) for name, m in ops ]
+    for i in range(start, stop):
+        at = i * stride
+        x = int.from_bytes(src[at:at + stride], 'little')
+        kept = 1
+        for name, m, f in funcs:
+            if name == 'invert':
+                x ^= inv
+            elif name in TRANSFORMS:
+                x = f(x, m)
+            elif not f(m, x):
+                kept = 0
+                break
+        if kept:
+            dst[at:at + stride] = x.to_bytes(stride, 'little')
+        flags[i] = kept
+
+def _chunk( job ):
+    in_name, out_name, n, start, stop, width, ops, use_numpy = job
+    shm_in = _attach(in_name)
+    shm_out = _attach(out_name)
+    try:
+        _run(shm_in.buf, shm_out.buf, n, start, stop, width, ops, use_numpy)
+    finally:
+        shm_in.close()
+        shm_out.close()
+    return stop - start
+
+def _run( inbuf, outbuf, n:int, start:int, stop:int, width:int, ops, use_numpy:bool ):
+    stride = _stride(width)
+    if use_numpy:
+        nwords = stride // 8
+        src = np.ndarray((n, nwords), dtype='<u8', buffer=inbuf)
+        dst = np.ndarray((n, nwords), dtype='<u8', buffer=outbuf)
+        flags = np.ndarray((n,), dtype=np.uint8, buffer=outbuf, offset=n * stride)
+        try:
+            _run_words(src[start:stop], dst[start:stop], flags[start:stop], width, ops)
+        finally:
+            del src, dst, flags     # no export left to block close()
+    else:
+        flags = outbuf[n * stride:]
+        try:
+            _run_ints(inbuf, outbuf, flags, start, stop, stride, width, ops)
+        finally:
+            flags.release()
+
+
+class ParallelExecutor(object):
+    """Process pool for bitlogic pipelines.  Use as a context manager,
+       or close() when done; the pool starts on first parallel run.
+
+       processes    pool size, default os.cpu_count()
+       chunk_rows   rows per task, default picked from the row count
+       min_rows     below this many rows run in-process
+    """
+
+    def __init__(self, processes=None, chunk_rows=None, min_rows=MIN_PARALLEL_ROWS ):
+
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_rows = chunk_rows
+        self.min_rows = min_rows
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.get_context().Pool(self.processes)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args ):
+        self.close()
+
+    def chunk_size(self, n:int ):
+        """ Rows per task, about CHUNKS_PER_PROCESS tasks per process for
+            load balance, but never tiny."""
+        if self.chunk_rows:
+            return self.chunk_rows
+        per = -(-n // (self.processes * CHUNKS_PER_PROCESS))
+        return max(per, MIN_CHUNK_ROWS)
+
+    def _pack(self, masks, width, shm ):
+        stride = _stride(width)
+        if isinstance(masks, BitMatrix) and masks.words is not None and masks.nwords * 8 == stride:
+            shm.buf[:len(masks) * stride] = masks.words.astype('<u8', copy=False).tobytes()
+            return
+        if isinstance(masks, BitFile) and masks.stride == stride:
+            shm.buf[:len(masks) * stride] = masks._mv
+            return
+        at = 0
+        batch = []
+        for x in masks:
+            if isinstance(x, BitInt):
+                x = x.value
+            batch.append(x.to_bytes(stride, 'little'))
+            if len(batch) >= 4096:
+                b = b''.join(batch)
+                shm.buf[at:at + len(b)] = b
+                at += len(b)
+                batch = []
+        if batch:
+            b = b''.join(batch)
+            shm.buf[at:at + len(b)] = b
+
+    def _execute(self, masks, ops, width ):
+        """ Run ops, returns ( out shm, n, width ), caller unlinks."""
+        if width is None:
+            if isinstance(masks, (BitMatrix, BitFile)):
+                width = masks.width
+            else:
+                if not isinstance(masks, BitList):
+                    masks = BitList(masks)
+                width = masks.max_length
+        ops = _check_ops(ops, width)
+        n = len(masks)
+        stride = _stride(width)
+        use_numpy = np is not None
+
+        shm_in = shared_memory.SharedMemory(create=True, size=max(n * stride, 1))
+        shm_out = shared_memory.SharedMemory(create=True, size=max(n * stride + n, 1))
+        try:
+            try:
+                self._pack(masks, width, shm_in)
+            except OverflowError:
+                raise BitLogicError('Mask wider than width ' + str(width))
+
+            if n < self.min_rows or self.processes < 2:
+                _run(shm_in.buf, shm_out.buf, n, 0, n, width, ops, use_numpy)
+            else:
+                size = self.chunk_size(n)
+                jobs = [ (shm_in.name, shm_out.name, n, s, min(s + size, n), width, ops, use_numpy)
+                         for s in range(0, n, size) ]
+                for done in self._get_pool().imap(_chunk, jobs):
+                    pass
+        except BaseException:
+            try:
+                shm_out.close()
+            finally:
+                shm_out.unlink()
+            raise
+        finally:
+            try:
+                shm_in.close()
+            finally:
+                shm_in.unlink()
+        return shm_out, n, width
+
+    def evaluate(self, masks, ops, width=None ):
+        """ Keep flag per row, list of bools."""
+        shm, n, width = self._execute(masks, ops, width)
+        try:
+            return [ f == 1 for f in bytes(shm.buf[n * _stride(width):n * _stride(width) + n]) ]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def map(self, masks, ops, width=None, as_matrix=False ):
+        """ Transformed masks that passed every filter, in order, as a
+            BitList, or a BitMatrix with as_matrix ( NumPy )."""
+        shm, n, width = self._execute(masks, ops, width)
+        stride = _stride(width)
+        try:
+            flags = bytes(shm.buf[n * stride:n * stride + n])
+            if as_matrix and np is not None:
+                words = np.ndarray((n, stride // 8), dtype='<u8', buffer=shm.buf)
+                kept = words[np.frombuffer(flags, dtype=np.uint8) == 1].copy()
+                del words
+                return BitMatrix._from_words(kept, width)
+            mv = shm.buf
+            out = BitList([ int.from_bytes(mv[i * stride:(i + 1) * stride], 'little')
+                            for i in range(n) if flags[i] ])
+            del mv
+            return out
+        finally:
+            shm.close()
+            shm.unlink()
+
+parallelexecutor = ParallelExecutor
+
+
+def parallel_map( masks, ops, width=None, processes=None ):
+    """ One-shot ParallelExecutor.map."""
+    with ParallelExecutor(processes) as px:
+        return px.map(masks, ops, width)
+
+
+if __name__=='__main__':
+
+    import random
+    import time
+
+    nl()
+    print('=====================================')
+    print("=== Test Script for 'BitParallel' ===")
+    print('=====================================')
+    nl()
+
+    a = int(0b11101100000111)
+    b = int(0b10000000000000)
+    c = int(0b10100000000100)
+    d = int(0b00001111000000)
+    o = int(0b00000000000001)
+    z = int(0b00000000000000)
+
+    blist = BitList([a, b, c, d, o, z])
+    ops = [ ('all_of', b), ('diff', o), ('invert', None) ]
+
+    print('ops ', ops)
+    nl()
+    with parallelexecutor() as px:
+        print('in-process evaluate ', px.evaluate(blist, ops))
+        for x in px.map(blist, ops):
+            print('   ', bitlogic.bform(x, blist.max_length))
+        nl()
+
+        n = 400000
+        big = BitList([ random.getrandbits(256) for _ in range(n) ])
+        ops = [ ('none_of', 0b1010), ('match', (1 << 255) - 1), ('any_of', 0b11 << 100) ]
+        print('processes ', px.processes, '  rows ', n, '  chunk ', px.chunk_size(n))
+        start = time.time()
+        kept = px.map(big, ops, 256)
+        print('kept ', len(kept), '  seconds ', round(time.time() - start, 3))
+    nl()
+
+    print('The End.')
+    nl()
@@ -0,0 +1,317 @@
+
+"""
+
+Bit Pipe
+
+Streaming pipeline for mask files and a command line front end.
+Masks are read one record at a time from stdin or files as text
+( 1/0 lines ), hex lines or the bitfile binary format, passed through
+a chain of bitlogic operations and filters, and written out in
+batches.  Generators all the way, memory is bounded by the batch size.
+
+  python bitpipe.py masks.txt --all-of 0b1000 --diff 0xff --out hex
+  cat masks.bits | python bitpipe.py --in bin --invert --out bin > inv.bits
+
+Operations apply in command line order:
+
+  --match M      x & M
+  --diff M       x ^ M
+  --invert       ones-complement within the width
+  --all-of M     keep x when all_of(M, x)
+  --any-of M     keep x when any_of(M, x)
+  --none-of M    keep x when none_of(M, x)
+  --one-of M     keep x when one_of(M, x)
+
+M is any int literal, 0b..., 0x... or decimal.  The output width is
+--width, or the input width widened to the widest --match / --diff
+mask, and a --width narrower than such a mask is refused before any
+input is read.  Text input takes its width from the first line.  The
+input is streamed, not scanned ahead, so a record wider than the width
+stops the run with an error ( exit 2 ) at that record, the records
+before it already written.  Give --width for ragged input.
+
+module:
+  bitpipe
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+import sys
+
+from bitlogic import (BitLogicError, bforms, make_bitmask, _bit_length,
+                      all_of, any_of, none_of, one_of, match, diff)
+from bitfile import HEADER, HEADER_SIZE, MAGIC, VERSION, WORD_BYTES, FLAG_STREAM, BitFileWriter
+
+nl = print
+
+READ_HINT = 1 << 16     # bytes per readlines batch
+BATCH = 4096            # records per binary read / any write
+
+FORMATS = ('text', 'hex', 'bin')
+OUT_FORMATS = ('text', 'hex', 'nibble', 'bin')
+
+
+""" Readers, each returns ( width, generator of ints ) """
+
+def _text_lines( stream ):
+    while True:
+        lines = stream.readlines(READ_HINT)
+        if not lines:
+            return
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield line
+
+def read_text( stream, base=2 ):
+    """ 1/0 lines ( base 2 ) or hex lines ( base 16 ), spaces and
+        underscores ignored.  Width is taken from the first line."""
+    lines = _text_lines(stream)
+    first = None
+    for first in lines:
+        break
+    if first is None:
+        return 1, iter(())
+
+    def clean(s):
+        if isinstance(s, bytes):
+            s = s.decode()
+        return s.replace(' ', '').replace('_', '')
+
+    first = clean(first)
+    digits = len(first[2:] if first[:2] in ('0b', '0x') else first)
+    width = digits if base == 2 else digits * 4
+
+    def gen():
+        yield int(first, base)
+        for line in lines:
+            yield int(clean(line), base)
+
+    return width, gen()
+
+def read_bin( stream ):
+    """ bitfile format from a binary stream, pipes welcome."""
+    head = stream.read(HEADER_SIZE)
+    if len(head) < HEADER_SIZE:
+        raise BitLogicError('Not a bit file, short header.')
+    magic, version, flags, wordbytes, width, count = HEADER.unpack(head)
+    if magic != MAGIC or version != VERSION or wordbytes != WORD_BYTES:
+        raise BitLogicError('Not a bit file, or unsupported version.')
+    stride = ((width + 63) >> 6) * WORD_BYTES
+    remaining = None if flags & FLAG_STREAM else count
+
+    def gen():
+        left = remaining
+        while left is None or left > 0:
+            n = BATCH if left is None else min(BATCH, left)
+            chunk = stream.read(n * stride)
+            if not chunk:
+                break
+            if len(chunk) % stride:
+                raise BitLogicError('Bit file truncated mid record.')
+            for i in range(0, len(chunk), stride):
+                yield int.from_bytes(chunk[i:i + stride], 'little')
+            if left is not None:
+                left -= len(chunk) // stride
+
+    return width, gen()
+
+def read_masks( stream, fmt='text' ):
+    """ ( width, generator of ints ) from a text or binary stream."""
+    if fmt == 'text':
+        return read_text(stream, 2)
+    if fmt == 'hex':
+        return read_text(stream, 16)
+    if fmt == 'bin':
+        return read_bin(stream)
+    raise BitLogicError('Input format must be one of ' + str(FORMATS))
+
+
+""" Operations, each maps an int to an int, or None to drop it """
+
+def op_match( m:int ):
+    return lambda x: match(x, m)
+
+def op_diff( m:int ):
+    return lambda x: diff(x, m)
+
+def op_invert( width:int ):
+    mask = make_bitmask(width)
+    return lambda x: x ^ mask
+
+def _keep( pred, m:int ):
+    return lambda x: x if pred(m, x) else None
+
+def op_all_of( m:int ):
+    return _keep(all_of, m)
+
+def op_any_of( m:int ):
+    return _keep(any_of, m)
+
+def op_none_of( m:int ):
+    return _keep(none_of, m)
+
+def op_one_of( m:int ):
+    return _keep(one_of, m)
+
+OPS = { 'match': op_match, 'diff': op_diff, 'all_of': op_all_of,
+        'any_of': op_any_of, 'none_of': op_none_of, 'one_of': op_one_of }
+
+def within( masks, width:int ):
+    """ masks unchanged, BitLogicError at the first one wider than
+        width.  Streams are not scanned ahead, memory stays bounded."""
+    for x in masks:
+        if _bit_length(x) > width:
+            raise BitLogicError('Record ' + bin(x) + ' wider than width ' + str(width) +
+                                ', give a wider --width')
+        yield x
+
+def pipeline( masks, ops ):
+    """ Generator of masks passed through ops in order, dropped at the
+        first op returning None."""
+    ops = list(ops)
+    for x in masks:
+        for op in ops:
+            x = op(x)
+            if x is None:
+                break
+        else:
+            yield x
+
+
+""" Writers """
+
+def write_masks( masks, out, fmt='text', width=1, batch=BATCH ):
+    """ Write masks to out, text stream for text/hex/nibble, binary
+        stream for bin.  Returns count written."""
+    if fmt == 'bin':
+        with BitFileWriter(out, width, batch) as w:
+            w.writemany(masks)
+        return w.count
+    f = { 'text': 'b', 'hex': 'x', 'nibble': 'n' }.get(fmt)
+    if f is None:
+        raise BitLogicError('Output format must be one of ' + str(OUT_FORMATS))
+    n = 0
+    lines = []
+    for line in bforms(masks, f, width):
+        lines.append(line)
+        if len(lines) >= batch:
+            out.write('\n'.join(lines) + '\n')
+            n += len(lines)
+            lines = []
+    if lines:
+        out.write('\n'.join(lines) + '\n')
+        n += len(lines)
+    return n
+
+
+""" Command line """
+
+def _chain_inputs( paths, fmt ):
+    """ ( width, generator ) over stdin or the files in order, width
+        of the first input."""
+    binary = fmt == 'bin'
+    if not paths:
+        stream = sys.stdin.buffer if binary else sys.stdin
+        return read_masks(stream, fmt)
+
+    files = [ open(p, 'rb' if binary else 'r') for p in paths ]
+    width, first = read_masks(files[0], fmt)
+
+    def gen():
+        try:
+            for x in first:
+                yield x
+            for f in files[1:]:
+                w, rest = read_masks(f, fmt)
+                for x in rest:
+                    yield x
+        finally:
+            for f in files:
+                f.close()
+
+    return width, gen()
+
+def _parser():
+    import argparse
+
+    class Op(argparse.Action):
+        """Keep every operation in command line order."""
+        def __call__(self, parser, namespace, values, option_string=None):
+            ops = getattr(namespace, 'ops', None) or []
+            ops.append((self.dest, values))
+            namespace.ops = ops
+
+    p = argparse.ArgumentParser(prog='bitpipe',
+            description='Filter and transform mask files with bitlogic operations.')
+    p.add_argument('files', nargs='*', help='input files, stdin when none')
+    p.add_argument('--in', dest='infmt', choices=FORMATS, default='text')
+    p.add_argument('--out', dest='outfmt', choices=OUT_FORMATS, default='text')
+    p.add_argument('--width', type=int, default=None,
+                   help='output width, default input width or the widest --match/--diff mask')
+    p.add_argument('--output', '-o', default=None, help='output file, stdout when none')
+    mask = lambda s: int(s, 0)
+    for name in ('match', 'diff', 'all_of', 'any_of', 'none_of', 'one_of'):
+        p.add_argument('--' + name.replace('_', '-'), dest=name, type=mask,
+                       action=Op, metavar='M')
+    p.add_argument('--invert', dest='invert', nargs=0, action=Op)
+    p.set_defaults(ops=[])
+    return p
+
+def main( argv=None ):
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    # --match / --diff masks may be wider than the input
+    needed = 0
+    for name, value in args.ops:
+        if name in ('match', 'diff'):
+            needed = max(needed, _bit_length(value))
+    if args.width and args.width < needed:
+        parser.error('--width ' + str(args.width) + ' narrower than a --match/--diff mask, ' +
+                     str(needed) + ' bits')
+
+    width, masks = _chain_inputs(args.files, args.infmt)
+    width = args.width or max(width, needed)
+
+    ops = []
+    for name, value in args.ops:
+        if name == 'invert':
+            ops.append(op_invert(width))
+        else:
+            ops.append(OPS[name](value))
+
+    binary = args.outfmt == 'bin'
+    if args.output:
+        out = open(args.output, 'wb' if binary else 'w')
+    else:
+        out = sys.stdout.buffer if binary else sys.stdout
+    try:
+        write_masks(pipeline(within(masks, width), ops), out, args.outfmt, width)
+    except BitLogicError as e:
+        parser.error(str(e))
+    finally:
+        if args.output:
+            out.close()
+        else:
+            out.flush()
+    return 0
+
+
+if __name__=='__main__':
+
+    sys.exit(main())
@@ -0,0 +1,379 @@
+
+"""
+
+Bit Profile
+
+Opt-in instrumentation for bitlogic, which predicates and which operand
+widths are burning CPU, without an external profiler.
+
+    import bitprofile
+    bitprofile.enable()
+    ...
+    bitprofile.report()
+
+    with bitprofile.Profile() as p:     # scoped, enables and restores
+        ...
+    bitprofile.report(p.stats)
+
+    bitprofile.enable(memory=False)     # time only, no allocation tracing
+
+or set DEBUG = True in bitlogic.py, which enables at import.
+
+enable() wraps the public bitlogic functions and the BitInt / BitList
+methods and properties in place, and rebinds the functions in every
+loaded module that imported them by name ( from bitlogic import ... ).
+disable() puts the originals back, so when off there is no wrapper on
+the call path at all.  Modules imported after enable() get whatever
+bitlogic held at the time they imported.
+
+Per name it records calls, cumulative seconds ( inclusive of nested
+bitlogic calls ), allocated bytes and a breakdown by operand width,
+bucketed to the next power of two of the widest int operand, 8 bits at
+least.  Generators ( BitInt iteration, bit_indexes, bforms ) are timed
+to creation only.
+
+Allocated bytes are, per call, the tracemalloc peak above the traced
+memory at the start of the call on CPython, intermediates included,
+nested bitlogic calls passing their peak up to the caller.  On
+micropython they are the gc.mem_alloc() growth over the call, heap
+still held at the end, a collection during the call counts less.
+enable() starts tracemalloc when it is not already tracing and
+disable() stops it, tracing slows every allocation, so memory=False
+when only the times matter.  When something else is already tracing,
+bitlogic_bench for one, its peak is never reset, and the bytes are the
+traced memory still held at the end of the call instead, intermediates
+freed within the call not counted.
+
+Runs on Python 3.9 and micropython.
+
+module:
+  bitprofile
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError: # upython
+    tracemalloc = None
+
+try:
+    from gc import mem_alloc as _mem_alloc
+except ImportError: # CPython
+    _mem_alloc = None
+
+import bitlogic
+from bitlogic import BitInt, BitList, _bit_length
+
+nl = print
+
+try:
+    _clock = time.perf_counter
+except AttributeError: # upython
+    def _clock():
+        return time.ticks_us() / 1000000
+
+FUNCTIONS = ('zfill', 'bit_length', 'popcount', 'is_power_of_two', 'bit_indexes',
+             'from_indexes', 'make_bitmask', 'make_bitmask_for', 'bform', 'bforms',
+             'bdump', 'one_of', 'morethanone_of', 'all_of', 'any_of', 'none_of',
+             'diff', 'match', 'invert')
+
+METHODS = { BitInt: ('__init__', '__and__', '__or__', '__xor__', '__invert__',
+                     '__lshift__', '__rshift__', '__iter__', 'indexes'),
+            BitList: ('make_bitmask', 'form', 'forms', 'dump') }
+
+PROPERTIES = { BitInt: ('value', 'bit_length', 'num_bits_set', 'bin'),
+               BitList: ('max_length',) }
+
+_stats = {}         # name -> [ calls, seconds, bytes, { width: [ calls, seconds ] } ]
+_patched = []       # ( namespace, attribute, original ), to undo
+
+_memory = None      # 'tracemalloc', 'traced', 'gc' or None, how allocation is measured
+_started = False    # tracemalloc started by enable()
+_frames = []        # [ traced at start, peak seen ] per wrapped call in progress
+
+
+def _bucket( args ):
+    """ Next power of two of the widest int operand, 8 at least, 0 when
+        there are no int operands."""
+    w = 0
+    for a in args:
+        if type(a) is int:
+            n = _bit_length(a) if a > 0 else 1
+        elif type(a) is BitInt:
+            n = _bit_length(a._int) if a._int > 0 else 1
+        else:
+            continue
+        if n > w:
+            w = n
+    if w == 0:
+        return 0
+    return 1 << _bit_length(w - 1) if w > 8 else 8
+
+def _alloc_begin():
+    """ Start measuring a call, see the module docstring.  The peak
+        so far is kept in the caller's frame before it is reset."""
+    if _memory is None:
+        return None
+    if _memory == 'gc':
+        return _mem_alloc()
+    if _memory == 'traced':
+        return tracemalloc.get_traced_memory()[0]
+    f = [0, 0]
+    cur, peak = tracemalloc.get_traced_memory()
+    if _frames and peak > _frames[-1][1]:
+        _frames[-1][1] = peak
+    tracemalloc.reset_peak()
+    f[0] = f[1] = cur
+    _frames.append(f)
+    return f
+
+def _alloc_end( f ):
+    """ Bytes allocated since _alloc_begin returned f."""
+    if f is None:
+        return 0
+    if _memory == 'gc':
+        return max(_mem_alloc() - f, 0)
+    if _memory == 'traced':
+        return max(tracemalloc.get_traced_memory()[0] - f, 0)
+    if not _frames or _frames[-1] is not f:     # disabled during the call
+        return 0
+    _frames.pop()
+    top = max(tracemalloc.get_traced_memory()[1], f[1])
+    if _frames and top > _frames[-1][1]:
+        _frames[-1][1] = top
+    return top - f[0]
+
+def _wrap( name:str, func ):
+    s = _stats.get(name)
+    if s is None:
+        s = _stats[name] = [0, 0.0, 0, {}]
+    widths = s[3]
+
+    def wrapper(*args, **kwargs):
+        f = _alloc_begin()
+        try:
+            start = _clock()
+            r = func(*args, **kwargs)
+            t = _clock() - start
+        finally:
+            nbytes = _alloc_end(f)
+        s[0] += 1
+        s[1] += t
+        s[2] += nbytes
+        b = _bucket(args)
+        w = widths.get(b)
+        if w is None:
+            w = widths[b] = [0, 0.0]
+        w[0] += 1
+        w[1] += t
+        return r
+
+    return wrapper
+
+def _patch( namespace, attr:str, new, original ):
+    setattr(namespace, attr, new)
+    _patched.append((namespace, attr, original))
+
+
+def enabled():
+    return bool(_patched)
+
+def enable( memory=True ):
+    """ Install the wrappers, a no-op when already on.  memory
+        measures allocated bytes, tracemalloc on CPython."""
+    global _memory, _started
+    if _patched:
+        return
+    bitlogic.DEBUG = True
+
+    if memory and tracemalloc is not None:
+        if tracemalloc.is_tracing():
+            _memory = 'traced'      # someone else's peak, left alone
+        else:
+            tracemalloc.start()
+            _started = True
+            _memory = 'tracemalloc'
+    elif memory and _mem_alloc is not None:
+        _memory = 'gc'
+
+    wrapped = {}
+    for name in FUNCTIONS:
+        original = getattr(bitlogic, name)
+        wrapped[id(original)] = (_wrap(name, original), original)
+
+    for mod in list(sys.modules.values()):
+        if mod is None:
+            continue
+        for name in FUNCTIONS:
+            f = getattr(mod, name, None)
+            if f is not None and id(f) in wrapped and wrapped[id(f)][1] is f:
+                _patch(mod, name, wrapped[id(f)][0], f)
+
+    for cls, names in METHODS.items():
+        for name in names:
+            original = cls.__dict__[name]
+            _patch(cls, name, _wrap(cls.__name__ + '.' + name, original), original)
+
+    for cls, names in PROPERTIES.items():
+        for name in names:
+            original = cls.__dict__[name]
+            _patch(cls, name, property(_wrap(cls.__name__ + '.' + name, original.fget)), original)
+
+def disable():
+    """ Put every original back, recorded stats are kept."""
+    global _memory, _started
+    while _patched:
+        namespace, attr, original = _patched.pop()
+        setattr(namespace, attr, original)
+    bitlogic.DEBUG = False
+    _memory = None
+    del _frames[:]
+    if _started:
+        tracemalloc.stop()
+        _started = False
+
+def reset():
+    """ Zero the stats, wrappers stay as they are."""
+    for s in _stats.values():
+        s[0] = 0
+        s[1] = 0.0
+        s[2] = 0
+        s[3].clear()
+
+
+def snapshot():
+    """ { name: { 'calls', 'seconds', 'bytes', 'widths': { width:
+        ( calls, seconds ) } } } for every name called so far, bytes
+        allocated."""
+    snap = {}
+    for name, (calls, seconds, nbytes, widths) in _stats.items():
+        if calls:
+            snap[name] = { 'calls': calls, 'seconds': seconds, 'bytes': nbytes,
+                           'widths': dict([ (w, tuple(v)) for w, v in widths.items() ]) }
+    return snap
+
+def delta( after, before ):
+    """ after - before, two snapshots."""
+    snap = {}
+    for name, a in after.items():
+        b = before.get(name)
+        if b is None:
+            snap[name] = a
+            continue
+        calls = a['calls'] - b['calls']
+        if calls <= 0:
+            continue
+        widths = {}
+        for w, (c, t) in a['widths'].items():
+            bc, bt = b['widths'].get(w, (0, 0.0))
+            if c > bc:
+                widths[w] = (c - bc, t - bt)
+        snap[name] = { 'calls': calls, 'seconds': a['seconds'] - b['seconds'],
+                       'bytes': a['bytes'] - b['bytes'], 'widths': widths }
+    return snap
+
+
+class Profile(object):
+    """Scoped profiling, stats holds the snapshot delta of the block.
+       Enables on entry, and disables on exit unless already enabled."""
+
+    def __init__(self, memory=True ):
+        self.stats = {}
+        self.memory = memory
+        self._was_enabled = False
+        self._before = None
+
+    def __enter__(self):
+        self._was_enabled = enabled()
+        enable(self.memory)
+        self._before = snapshot()
+        return self
+
+    def __exit__(self, *args ):
+        self.stats = delta(snapshot(), self._before)
+        if not self._was_enabled:
+            disable()
+
+profile = Profile
+
+
+def report( snap=None, top=20, widths=True ):
+    """ Print the top names by cumulative time, and their time by
+        operand width."""
+    if snap is None:
+        snap = snapshot()
+    names = sorted(snap, key=lambda n: -snap[n]['seconds'])[:top]
+    print('{:<22} {:>10} {:>12} {:>10} {:>12}'.format('name', 'calls', 'total ms',
+                                                      'mean us', 'alloc bytes'))
+    for name in names:
+        s = snap[name]
+        print('{:<22} {:>10} {:>12.3f} {:>10.3f} {:>12}'.format(name, s['calls'],
+                s['seconds'] * 1000, s['seconds'] * 1000000 / s['calls'], s['bytes']))
+        if widths:
+            for w in sorted(s['widths']):
+                c, t = s['widths'][w]
+                print('{:>22} {:>10} {:>12.3f}'.format(('<= ' + str(w) + ' bits') if w else 'no int',
+                                                       c, t * 1000))
+
+
+if bitlogic.DEBUG and not _patched:    # imported before bitlogic, see its end
+    enable()
+
+
+if __name__=='__main__':
+
+    nl()
+    print('====================================')
+    print("=== Test Script for 'BitProfile' ===")
+    print('====================================')
+    nl()
+
+    from bitlogic import all_of, any_of, bform
+
+    a = int(0b11101100000111)
+    b = int(0b10000000000000)
+    d = int(0b00001111000000)
+    blist = BitList([a, b, d])
+
+    plain = all_of
+    print('enabled          ', enabled())
+    nl()
+
+    with profile() as p:
+        print('enabled in block ', enabled(), '  all_of wrapped ', all_of is not plain)
+        for x in blist:
+            all_of(b, x)
+            any_of(d, x)
+        big = (1 << 4000) | 1
+        for _ in range(100):
+            bitlogic.all_of(big, big)
+        bi = BitInt(a)
+        bi & d
+        ~bi
+        blist.form(b)
+    print('after block      ', enabled(), '  all_of plain ', all_of is plain)
+    nl()
+
+    report(p.stats)
+    nl()
+
+    print('The End.')
+    nl()
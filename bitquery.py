@@ -0,0 +1,357 @@
+
+"""
+
+Bit Query
+
+Compound conditions over 'binary' ints built from the bitlogic
+predicates, compiled into one fused test.
+
+    q = AllOf(a) & NoneOf(z) & ~MoreThanOneOf(w)
+    cq = q.compile(sample)
+    cq(y)                 same as all_of(a, y) and none_of(z, y)
+                          and not morethanone_of(w, y)
+    cq.filter(blist)
+
+Every term tests a mask against the int y, predicate(mask, y), the
+bitlogic 'x in y' order.  compile() folds all AllOf masks into one
+required mask R and all NoneOf masks into one forbidden mask F, tested
+together as y & (R | F) == R, then orders the remaining terms by
+measured cost over measured rejection on a sample, cheapest and most
+rejecting first.  The result is a single generated lambda, no per-term
+calls.
+
+module:
+  bitquery
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+import time
+
+from bitlogic import (BitLogicError, BitInt, BitList, from_indexes,
+                      is_power_of_two, all_of, any_of, none_of, one_of,
+                      morethanone_of)
+
+nl = print
+
+try:
+    _clock = time.perf_counter
+except AttributeError: # upython
+    def _clock():
+        return time.ticks_us() / 1000000
+
+
+class Term(object):
+    """One bitlogic predicate of a fixed mask against y."""
+
+    func = None
+    expr = None     # source with {m} for the mask, y for the tested int
+
+    def __init__(self, mask ):
+        if isinstance(mask, BitInt):
+            mask = mask.value
+        self.mask = int(mask)
+        if self.mask < 0:
+            raise BitLogicError('Negative values are not BitInt numbers.')
+
+    def __call__(self, y:int ):
+        return self.func(self.mask, y)
+
+    def __invert__(self):
+        return Not(self)
+
+    def __and__(self, other ):
+        return Query(self) & other
+
+    def source(self, m:str ):
+        return self.expr.format(m=m)
+
+    def vector(self, bm ):
+        """ bool per row of a BitMatrix."""
+        return getattr(bm, self.func.__name__)(self.mask)
+
+    def __repr__(self):
+        return type(self).__name__ + '(' + bin(self.mask) + ')'
+
+class AllOf(Term):
+    func = staticmethod(all_of)
+    expr = 'y & {m} == {m}'
+
+    def source(self, m:str ):
+        if not self.mask:
+            return 'False'      # all_of(0, y) is False
+        return self.expr.format(m=m)
+
+class AnyOf(Term):
+    func = staticmethod(any_of)
+    expr = 'y & {m} != 0'
+
+    def __invert__(self):
+        return NoneOf(self.mask)
+
+class NoneOf(Term):
+    func = staticmethod(none_of)
+    expr = 'y & {m} == 0'
+
+    def __invert__(self):
+        return AnyOf(self.mask)
+
+class OneOf(Term):
+    func = staticmethod(one_of)
+    expr = '((_t := y & {m}) != 0 and _t & (_t - 1) == 0)'
+
+class MoreThanOneOf(Term):
+    func = staticmethod(morethanone_of)
+    expr = '(_t := y & {m}) & (_t - 1) != 0'
+
+class Not(Term):
+    """Negation of any term."""
+
+    def __init__(self, term ):
+        self.term = term
+        self.mask = term.mask
+
+    def __call__(self, y:int ):
+        return not self.term(y)
+
+    def __invert__(self):
+        return self.term
+
+    def source(self, m:str ):
+        return 'not (' + self.term.source(m) + ')'
+
+    def vector(self, bm ):
+        return ~self.term.vector(bm)
+
+    def __repr__(self):
+        return '~' + repr(self.term)
+
+
+class _Fused(Term):
+    """y & (R | F) == R, all_of R and none_of F in one test."""
+
+    def __init__(self, required:int, forbidden:int ):
+        self.required = required
+        self.forbidden = forbidden
+        self.mask = required | forbidden
+
+    def __call__(self, y:int ):
+        return y & self.mask == self.required
+
+    def source(self, m:str ):
+        return 'y & ' + m + ' == ' + m + '_r'
+
+    def vector(self, bm ):
+        ok = bm.all_of(self.required) if self.required else bm.none_of(0)
+        if self.forbidden:
+            ok = ok & bm.none_of(self.forbidden)
+        return ok
+
+    def __repr__(self):
+        return 'Fused(R=' + bin(self.required) + ', F=' + bin(self.forbidden) + ')'
+
+
+class Query(object):
+    """Conjunction of terms, built with & .  Calling a Query evaluates
+       it term by term, compile() for the fused form."""
+
+    def __init__(self, *terms ):
+        self.terms = list(terms)
+
+    def __and__(self, other ):
+        if isinstance(other, Query):
+            return Query(*(self.terms + other.terms))
+        return Query(*(self.terms + [other]))
+
+    def __call__(self, y:int ):
+        for t in self.terms:
+            if not t(y):
+                return False
+        return True
+
+    def compile(self, sample=None ):
+        return CompiledQuery(self.terms, sample)
+
+    def __repr__(self):
+        return ' & '.join([ repr(t) for t in self.terms ]) or 'Query()'
+
+
+def _rank( stats ):
+    """ cost / rejection, cheapest and most rejecting first, terms that
+        never reject last."""
+    cost, passed = stats
+    reject = 1.0 - passed
+    return cost / reject if reject > 0 else float('inf')
+
+
+class CompiledQuery(object):
+    """Fused, ordered and code generated form of a Query.
+
+       required, forbidden  the folded masks
+       order                terms as evaluated, fused test included
+       stats                term -> ( seconds per call, pass rate ),
+                            from the calibration sample
+       source               the generated lambda
+    """
+
+    def __init__(self, terms, sample=None ):
+
+        required = 0
+        forbidden = 0
+        rest = []
+        self.satisfiable = True
+
+        for t in terms:
+            kind = type(t)
+            if kind in (AnyOf, OneOf) and is_power_of_two(t.mask):
+                kind = AllOf    # one bit, any/one of is all of
+            if kind is AllOf:
+                if t.mask == 0:
+                    self.satisfiable = False    # all_of(0, y) is False
+                required |= t.mask
+            elif kind is NoneOf:
+                forbidden |= t.mask
+            elif kind is MoreThanOneOf and t.mask & (t.mask - 1) == 0:
+                self.satisfiable = False        # needs two bits of one
+            else:
+                rest.append(t)
+
+        if required & forbidden:
+            self.satisfiable = False
+
+        self.required = required
+        self.forbidden = forbidden
+        self.order = rest
+        if required or forbidden:
+            self.order = [_Fused(required, forbidden)] + rest
+        self.stats = {}
+
+        if sample is not None and self.satisfiable:
+            self.calibrate(sample)
+        else:
+            self._generate()
+
+    def calibrate(self, sample ):
+        """ Measure cost and pass rate of each term on sample ints and
+            reorder, cheapest and most rejecting first."""
+        sample = list(sample)
+        if sample:
+            for t in self.order:
+                start = _clock()
+                n = 0
+                for y in sample:
+                    if t(y):
+                        n += 1
+                cost = (_clock() - start) / len(sample)
+                self.stats[t] = (cost, n / len(sample))
+            self.order.sort(key=lambda t: _rank(self.stats[t]))
+        self._generate()
+        return self
+
+    def _generate(self):
+        if not self.satisfiable:
+            self.source = 'lambda y: False'
+            self._func = lambda y: False
+            return
+        if not self.order:
+            self.source = 'lambda y: True'
+            self._func = lambda y: True
+            return
+
+        args = []
+        consts = {}
+        exprs = []
+        for i, t in enumerate(self.order):
+            m = '_m' + str(i)
+            if isinstance(t, _Fused):
+                args.append(m + '_r=' + m + '_r')
+                consts[m + '_r'] = t.required
+            args.append(m + '=' + m)
+            consts[m] = t.mask
+            exprs.append('(' + t.source(m) + ')')
+
+        self.source = 'lambda y, ' + ', '.join(args) + ': ' + ' and '.join(exprs)
+        self._func = eval(self.source, consts)
+
+    def __call__(self, y:int ):
+        return self._func(y)
+
+    def evaluate(self, ints ):
+        """ bool per int, list for a BitList or any ints, bool array for
+            a NumPy-backed BitMatrix."""
+        if getattr(ints, 'words', None) is not None:
+            return self._vector(ints)
+        f = self._func
+        return [ f(y) for y in ints ]
+
+    def _vector(self, bm ):
+        ok = bm.none_of(0)      # all True
+        if not self.satisfiable:
+            return ~ok
+        for t in self.order:
+            ok = ok & t.vector(bm)
+        return ok
+
+    def filter(self, ints ):
+        """ BitList of the ints that pass."""
+        f = self._func
+        return BitList([ y for y in ints if f(y) ])
+
+    def mask(self, ints ):
+        """ int with bit i set when ints[i] passes, a row mask."""
+        f = self._func
+        return from_indexes([ i for i, y in enumerate(ints) if f(y) ])
+
+    def __repr__(self):
+        return 'CompiledQuery(' + ' & '.join([ repr(t) for t in self.order ]) + ')'
+
+
+if __name__=='__main__':
+
+    nl()
+    print('==================================')
+    print("=== Test Script for 'BitQuery' ===")
+    print('==================================')
+    nl()
+
+    a = int(0b11101100000111)
+    b = int(0b10000000000000)
+    c = int(0b10100000000100)
+    d = int(0b00001111000000)
+    o = int(0b00000000000001)
+    z = int(0b00000000000000)
+
+    blist = BitList([a, b, c, d, o, z])
+
+    q = AllOf(b) & NoneOf(d) & AnyOf(0b00000000000110) & ~MoreThanOneOf(0b00000000000111)
+    print('query    ', q)
+    print('by term  ', [ q(y) for y in blist ])
+    nl()
+
+    cq = q.compile(blist)
+    print('compiled ', cq)
+    print('source   ', cq.source)
+    print('fused    ', [ cq(y) for y in blist ])
+    print('filter   ', cq.filter(blist))
+    print('mask     ', bin(cq.mask(blist)))
+    nl()
+
+    print('unsatisfiable, AllOf(d) & NoneOf(d) ', (AllOf(d) & NoneOf(d)).compile().source)
+    nl()
+
+    print('The End.')
+    nl()
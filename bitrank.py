@@ -0,0 +1,279 @@
+
+"""
+
+Bit Rank
+
+Succinct rank / select over a 'binary' int, for mask-driven indexing of
+lists, how many rows a mask selects before position i, and which row
+is the k-th selected, without a scan of a million-bit int.
+
+  rank(i)     set bits in positions [0, i)
+  select(k)   position of the k-th set bit, k from 0
+  take(seq, offset, size)   the page of seq the mask selects
+
+The bits are held as little-endian bytes with two rank directories:
+
+  superblocks   absolute count before every 4096 bits, array('I')
+  blocks        count before every 512 bits, relative to its
+                superblock, array('H')
+
+so rank is two lookups and one popcount of at most 64 bytes.  Select
+keeps the superblock of every 8192nd set bit, narrows to a few
+superblocks with that sample, bisects the directories, then bisects
+bit positions inside one 512-bit block.  Directory overhead is about
+3.9% of the bit count, plus the select samples.
+
+Runs on Python 3.9 and micropython.
+
+module:
+  bitrank
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+from array import array
+
+from bitlogic import BitLogicError, BitInt, bit_indexes, popcount, _bit_length
+
+nl = print
+
+BLOCK_BITS = 512
+BLOCK_BYTES = BLOCK_BITS // 8
+BLOCKS_PER_SUPER = 8
+SUPER_BITS = BLOCK_BITS * BLOCKS_PER_SUPER     # 4096
+SAMPLE_SHIFT = 13                               # every 8192nd set bit
+
+
+def _bisect_right( a, x:int, lo:int, hi:int ):
+    """ Portable bisect_right with bounds, micropython has no bisect."""
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if x < a[mid]:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+class RankSelect(object):
+    """Static rank / select directory over the int x, length bits
+       ( default its bit_length ).  Rebuild after x changes."""
+
+    def __init__(self, x, length=None ):
+
+        if isinstance(x, BitInt):
+            x = x.value
+        x = int(x)
+        if x < 0:
+            raise BitLogicError('Negative values are not BitInt numbers.')
+        if length is None:
+            length = _bit_length(x)
+        elif _bit_length(x) > length:
+            raise BitLogicError('RankSelect int wider than length ' + str(length))
+
+        self.length = length
+        self._data = x.to_bytes((length + 7) >> 3, 'little')
+
+        nblocks = (length + BLOCK_BITS - 1) // BLOCK_BITS
+        self._super = array('I')
+        self._block = array('H')
+        self._samples = array('I')
+
+        total = 0
+        rel = 0
+        data = self._data
+        for b in range(nblocks):
+            if b % BLOCKS_PER_SUPER == 0:
+                self._super.append(total)
+                rel = 0
+            self._block.append(rel)
+            start = b * BLOCK_BYTES
+            n = popcount(int.from_bytes(data[start:start + BLOCK_BYTES], 'little'))
+            rel += n
+            total += n
+        self.ones = total
+
+        sample = 0
+        nsuper = len(self._super)
+        for sb in range(nsuper):
+            end = self._super[sb + 1] if sb + 1 < nsuper else total
+            while sample << SAMPLE_SHIFT < end:
+                self._samples.append(sb)
+                sample += 1
+
+    @classmethod
+    def from_bitlist(cls, blist, i:int ):
+        """ Directory over element i of a BitList, max_length wide."""
+        return cls(blist[i], blist.max_length)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i:int ):
+        if i < 0:
+            i += self.length
+        if i < 0 or i >= self.length:
+            raise IndexError('rank/select index out of range')
+        return (self._data[i >> 3] >> (i & 7)) & 1
+
+    @property
+    def value(self):
+        return int.from_bytes(self._data, 'little')
+
+    @property
+    def nbytes(self):
+        """ Bits plus directories, in bytes."""
+        return (len(self._data) + len(self._super) * self._super.itemsize +
+                len(self._block) * self._block.itemsize +
+                len(self._samples) * self._samples.itemsize)
+
+    @property
+    def overhead(self):
+        """ Directory bytes over bit bytes."""
+        return (self.nbytes - len(self._data)) / max(len(self._data), 1)
+
+    def rank(self, i:int ):
+        """ Set bits in positions [0, i), i from 0 to length."""
+        if i <= 0 or i >= self.length:
+            if i == 0:
+                return 0
+            if i == self.length:
+                return self.ones
+            raise IndexError('rank position out of range')
+        b = i // BLOCK_BITS
+        r = self._super[b // BLOCKS_PER_SUPER] + self._block[b]
+        start = b * BLOCK_BYTES
+        end = (i + 7) >> 3
+        if end > start:
+            v = int.from_bytes(self._data[start:end], 'little')
+            r += popcount(v & ((1 << (i - (start << 3))) - 1))
+        return r
+
+    def rank0(self, i:int ):
+        """ Clear bits in positions [0, i)."""
+        return i - self.rank(i)
+
+    def select(self, k:int ):
+        """ Position of the k-th set bit, k from 0 to ones - 1."""
+        if k < 0 or k >= self.ones:
+            raise IndexError('select rank out of range')
+        s = k >> SAMPLE_SHIFT
+        lo = self._samples[s]
+        hi = self._samples[s + 1] + 1 if s + 1 < len(self._samples) else len(self._super)
+        sb = _bisect_right(self._super, k, lo, hi) - 1
+        k -= self._super[sb]
+
+        b0 = sb * BLOCKS_PER_SUPER
+        b = _bisect_right(self._block, k, b0, min(b0 + BLOCKS_PER_SUPER, len(self._block))) - 1
+        k -= self._block[b]
+
+        start = b * BLOCK_BYTES
+        v = int.from_bytes(self._data[start:start + BLOCK_BYTES], 'little')
+        lo = 0
+        hi = BLOCK_BITS - 1
+        while lo < hi:          # first p with k + 1 bits set in [0, p]
+            mid = (lo + hi) // 2
+            if popcount(v & ((2 << mid) - 1)) > k:
+                hi = mid
+            else:
+                lo = mid + 1
+        return (start << 3) + lo
+
+    def positions(self, offset=0, size=None ):
+        """ Positions of set bits offset to offset + size, in order.
+            One select, then a forward scan a block at a time."""
+        stop = self.ones if size is None else min(self.ones, offset + size)
+        if offset < 0:
+            raise IndexError('positions offset out of range')
+        need = stop - offset
+        out = []
+        if need <= 0:
+            return out
+        p = self.select(offset)
+        start = p >> 3
+        first = True
+        while len(out) < need:
+            chunk = self._data[start:start + BLOCK_BYTES]
+            v = int.from_bytes(chunk, 'little')
+            if first:
+                v >>= p & 7
+                v <<= p & 7
+                first = False
+            base = start << 3
+            for j in bit_indexes(v):
+                out.append(base + j)
+                if len(out) == need:
+                    break
+            start += len(chunk)
+        return out
+
+    def take(self, seq, offset=0, size=None ):
+        """ Items of seq at the set positions offset to offset + size,
+            a page of the rows the mask selects."""
+        return [ seq[p] for p in self.positions(offset, size) ]
+
+    def __repr__(self):
+        return 'RankSelect(length=' + str(self.length) + ', ones=' + str(self.ones) + ')'
+
+rankselect = RankSelect
+
+
+if __name__=='__main__':
+
+    import random
+    import time
+
+    nl()
+    print('=================================')
+    print("=== Test Script for 'BitRank' ===")
+    print('=================================')
+    nl()
+
+    ilist = [ 0, 1, 2, 3, 4, 5, 6, 7 ]
+    o = int(0b01010101)
+
+    rs = rankselect(o, 8)
+    print('odd_index ', bin(o), '  ', rs)
+    print('rank(i)   ', [ rs.rank(i) for i in range(9) ])
+    print('select(k) ', [ rs.select(k) for k in range(rs.ones) ])
+    print('take      ', rs.take(ilist), '  page 1..2 ', rs.take(ilist, 1, 2))
+    nl()
+
+    n = 1 << 20
+    x = random.getrandbits(n) & random.getrandbits(n) | 1 << (n - 1)
+    start = time.time()
+    rs = rankselect(BitInt(x))
+    print('bits ', rs.length, '  ones ', rs.ones, '  build seconds ', round(time.time() - start, 3))
+    print('overhead ', round(rs.overhead * 100, 2), '%')
+
+    ks = [ random.randrange(rs.ones) for _ in range(10000) ]
+    start = time.time()
+    ps = [ rs.select(k) for k in ks ]
+    t_select = time.time() - start
+    start = time.time()
+    rs_ = [ rs.rank(p) for p in ps ]
+    t_rank = time.time() - start
+    print('select us ', round(t_select * 100, 2), '  rank us ', round(t_rank * 100, 2))
+    print('rank(select(k)) == k ', rs_ == ks)
+    nl()
+
+    rows = list(range(n))
+    print('5 rows from the 10th selected ', rs.take(rows, 10, 5), '  positions ', rs.positions(10, 5))
+    nl()
+
+    print('The End.')
+    nl()
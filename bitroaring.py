@@ -0,0 +1,446 @@
+
+"""
+
+Bit Roaring
+
+Compressed 'binary' int in the style of Roaring bitmaps.  The bit space
+is split into chunks of 2^16 bits and each non-empty chunk is kept in
+whichever container is smallest:
+
+  array   sorted 16-bit offsets, for a few bits set
+  bitset  a plain 2^16-bit int, for many bits set
+  run     ( start, end ) pairs, for long stretches of ones
+
+Empty chunks are not stored at all, so a mask with bit 0 and bit
+50,000,000 costs two tiny array containers, not a 6 MB int.
+
+module:
+  bitroaring
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+from array import array
+
+try:
+    from bisect import bisect_left, bisect_right
+except ImportError: # upython
+    def bisect_left(a, x):
+        lo, hi = 0, len(a)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if a[mid] < x:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def bisect_right(a, x):
+        lo, hi = 0, len(a)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if x < a[mid]:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+from bitlogic import (BitLogicError, BitInt, bit_indexes, from_indexes,
+                      popcount, bit_length, _bit_length)
+
+nl = print
+
+CHUNK_BITS = 16
+CHUNK = 1 << CHUNK_BITS
+CHUNK_BYTES = CHUNK // 8
+ARRAY_MAX = 4096        # array container at most, 2 bytes each = bitset size
+
+ARRAY = 0
+BITSET = 1
+RUN = 2
+
+KINDS = ('array', 'bitset', 'run')
+
+
+""" Containers are ( kind, data, cardinality ) tuples, data an
+    array('H') of offsets, an int or an array('H') of flattened
+    start, end pairs.  Every container is built by _from_bits or
+    _from_values, which pick the smallest kind."""
+
+def _runs_of_values( vals ):
+    runs = array('H')
+    start = prev = vals[0]
+    for v in vals:
+        if v != prev + 1 and v != start:
+            runs.append(start)
+            runs.append(prev)
+            start = v
+        prev = v
+    runs.append(start)
+    runs.append(prev)
+    return runs
+
+def _from_bits( bits:int ):
+    """ Smallest container for a chunk int, None when empty."""
+    if not bits:
+        return None
+    card = popcount(bits)
+    starts = bits & ~(bits << 1)
+    nruns = popcount(starts)
+    if 4 * nruns < min(2 * card, CHUNK_BYTES):
+        ends = bits & ~(bits >> 1)
+        runs = array('H')
+        for s, e in zip(bit_indexes(starts), bit_indexes(ends)):
+            runs.append(s)
+            runs.append(e)
+        return (RUN, runs, card)
+    if card <= ARRAY_MAX:
+        return (ARRAY, array('H', bit_indexes(bits)), card)
+    return (BITSET, bits, card)
+
+def _from_values( vals ):
+    """ Smallest container for sorted chunk offsets, None when empty."""
+    card = len(vals)
+    if not card:
+        return None
+    nruns = 1
+    for i in range(1, card):
+        if vals[i] != vals[i - 1] + 1:
+            nruns += 1
+    if 4 * nruns < min(2 * card, CHUNK_BYTES):
+        return (RUN, _runs_of_values(vals), card)
+    if card <= ARRAY_MAX:
+        return (ARRAY, array('H', vals), card)
+    return (BITSET, from_indexes(vals), card)
+
+def _bits( c ):
+    kind, data, card = c
+    if kind == BITSET:
+        return data
+    if kind == ARRAY:
+        return from_indexes(data)
+    bits = 0
+    for i in range(0, len(data), 2):
+        bits |= ((1 << (data[i + 1] - data[i] + 1)) - 1) << data[i]
+    return bits
+
+def _values( c ):
+    kind, data, card = c
+    if kind == ARRAY:
+        return data
+    if kind == BITSET:
+        return array('H', bit_indexes(data))
+    vals = array('H')
+    for i in range(0, len(data), 2):
+        vals.extend(range(data[i], data[i + 1] + 1))
+    return vals
+
+def _contains( c, v:int ):
+    kind, data, card = c
+    if kind == BITSET:
+        return (data >> v) & 1 == 1
+    if kind == ARRAY:
+        i = bisect_left(data, v)
+        return i < len(data) and data[i] == v
+    i = bisect_right(data, v)
+    return i & 1 == 1 or (i > 0 and data[i - 1] == v)
+
+def _and( a, b ):
+    if b[0] == ARRAY and a[0] != ARRAY:
+        a, b = b, a
+    if a[0] == ARRAY:
+        return _from_values([ v for v in a[1] if _contains(b, v) ])
+    return _from_bits(_bits(a) & _bits(b))
+
+def _or( a, b ):
+    if a[0] == ARRAY and b[0] == ARRAY and a[2] + b[2] <= ARRAY_MAX:
+        return _from_values(sorted(set(a[1]) | set(b[1])))
+    return _from_bits(_bits(a) | _bits(b))
+
+def _xor( a, b ):
+    if a[0] == ARRAY and b[0] == ARRAY and a[2] + b[2] <= ARRAY_MAX:
+        return _from_values(sorted(set(a[1]) ^ set(b[1])))
+    return _from_bits(_bits(a) ^ _bits(b))
+
+def _nbytes( c ):
+    kind, data, card = c
+    if kind == BITSET:
+        return CHUNK_BYTES
+    return 2 * len(data)
+
+
+class RoaringBitmap(object):
+    """Compressed 'binary' int.  Build from an int, a BitInt or with
+       from_indexes, combine with & | ^ and invert within a width,
+       convert back with to_int.
+    """
+
+    def __init__(self, x=0 ):
+
+        self._chunks = {}
+
+        if isinstance(x, BitInt):
+            x = x.value
+        if x < 0:
+            raise BitLogicError('Negative values and `0 ( minus zero ) are not BitInt numbers.')
+        if x:
+            nchunks = (_bit_length(x) + CHUNK - 1) >> CHUNK_BITS
+            b = x.to_bytes(nchunks * CHUNK_BYTES, 'little')
+            for key in range(nchunks):
+                part = b[key * CHUNK_BYTES:(key + 1) * CHUNK_BYTES]
+                c = _from_bits(int.from_bytes(part, 'little'))
+                if c is not None:
+                    self._chunks[key] = c
+
+    @classmethod
+    def from_indexes(cls, indexes ):
+        """ RoaringBitmap with the bits at indexes set."""
+        per_key = {}
+        for i in indexes:
+            if i < 0:
+                raise BitLogicError('Negative bit index.')
+            vals = per_key.get(i >> CHUNK_BITS)
+            if vals is None:
+                per_key[i >> CHUNK_BITS] = vals = []
+            vals.append(i & (CHUNK - 1))
+        rb = cls()
+        for key, vals in per_key.items():
+            rb._chunks[key] = _from_values(sorted(set(vals)))
+        return rb
+
+    @classmethod
+    def _from_chunks(cls, chunks ):
+        rb = cls()
+        rb._chunks = chunks
+        return rb
+
+    def to_int(self):
+        if not self._chunks:
+            return 0
+        top = max(self._chunks)
+        b = bytearray((top + 1) * CHUNK_BYTES)
+        for key, c in self._chunks.items():
+            start = key * CHUNK_BYTES
+            b[start:start + CHUNK_BYTES] = _bits(c).to_bytes(CHUNK_BYTES, 'little')
+        return int.from_bytes(b, 'little')
+
+    def __int__(self):
+        return self.to_int()
+
+    def __len__(self):
+        """Number of bits set."""
+        return sum([ c[2] for c in self._chunks.values() ])
+
+    num_bits_set = property(__len__)
+
+    def __bool__(self):
+        return len(self._chunks) > 0
+
+    def __iter__(self):
+        """Indexes of bits set, lowest first."""
+        for key in sorted(self._chunks):
+            base = key << CHUNK_BITS
+            for v in _values(self._chunks[key]):
+                yield base + v
+
+    def __contains__(self, i:int ):
+        c = self._chunks.get(i >> CHUNK_BITS)
+        return c is not None and _contains(c, i & (CHUNK - 1))
+
+    def add(self, i:int ):
+        key, v = i >> CHUNK_BITS, i & (CHUNK - 1)
+        c = self._chunks.get(key)
+        if c is None:
+            self._chunks[key] = _from_values([v])
+        elif not _contains(c, v):
+            self._chunks[key] = _or(c, _from_values([v]))
+
+    def discard(self, i:int ):
+        key, v = i >> CHUNK_BITS, i & (CHUNK - 1)
+        c = self._chunks.get(key)
+        if c is not None and _contains(c, v):
+            c = _xor(c, _from_values([v]))
+            if c is None:
+                del self._chunks[key]
+            else:
+                self._chunks[key] = c
+
+    @property
+    def bit_length(self):
+        if not self._chunks:
+            return 1   # as bitlogic.bit_length, zero has length 1
+        key = max(self._chunks)
+        return (key << CHUNK_BITS) + bit_length(_bits(self._chunks[key]))
+
+    @property
+    def nbytes(self):
+        """Approximate payload bytes, not counting Python object overhead."""
+        return sum([ _nbytes(c) + 4 for c in self._chunks.values() ])
+
+    def kinds(self):
+        """Container kind per chunk key, for debugging."""
+        return dict([ (k, KINDS[c[0]]) for k, c in self._chunks.items() ])
+
+    def _merge(self, other, op, keep_left:bool, keep_right:bool ):
+        other = _roaring(other)
+        a, b = self._chunks, other._chunks
+        out = {}
+        for key in a:
+            if key in b:
+                c = op(a[key], b[key])
+                if c is not None:
+                    out[key] = c
+            elif keep_left:
+                out[key] = a[key]
+        if keep_right:
+            for key in b:
+                if key not in a:
+                    out[key] = b[key]
+        return self._from_chunks(out)
+
+    def __and__(self, other ):
+        return self._merge(other, _and, False, False)
+
+    def __or__(self, other ):
+        return self._merge(other, _or, True, True)
+
+    def __xor__(self, other ):
+        return self._merge(other, _xor, True, True)
+
+    def invert(self, width=None ):
+        """Ones-complement within width bits, default the bit_length,
+           as bitlogic.invert.  Chunks with no bits set invert to a
+           single full run."""
+        if width is None:
+            width = self.bit_length
+        elif self._chunks and self.bit_length > width:
+            raise BitLogicError('Invert of int wider than width ' + str(width))
+        out = {}
+        nchunks = (width + CHUNK - 1) >> CHUNK_BITS
+        for key in range(nchunks):
+            nbits = min(CHUNK, width - (key << CHUNK_BITS))
+            c = self._chunks.get(key)
+            if c is None:
+                out[key] = (RUN, array('H', [0, nbits - 1]), nbits)
+            else:
+                c = _from_bits(_bits(c) ^ ((1 << nbits) - 1))
+                if c is not None:
+                    out[key] = c
+        return self._from_chunks(out)
+
+roaringbitmap = RoaringBitmap
+
+
+def _roaring( x ):
+    if isinstance(x, RoaringBitmap):
+        return x
+    return RoaringBitmap(x)
+
+def _and_count( x, y, limit=None ):
+    """ Bits set in x & y, stopping once past limit."""
+    x, y = _roaring(x), _roaring(y)
+    a, b = x._chunks, y._chunks
+    if len(b) < len(a):
+        a, b = b, a
+    n = 0
+    for key in a:
+        if key in b:
+            c = _and(a[key], b[key])
+            if c is not None:
+                n += c[2]
+                if limit is not None and n > limit:
+                    break
+    return n
+
+
+""" bitlogic predicates and operations for RoaringBitmap, ints accepted """
+
+def one_of( x, y ):
+    """Only one of x in y. """
+    return _and_count(x, y, 1) == 1
+
+def morethanone_of( x, y ):
+    """More than one of x in y. """
+    return _and_count(x, y, 1) > 1
+
+def all_of( x, y ):
+    """All of x in y"""
+    x = _roaring(x)
+    n = len(x)
+    if n == 0: return False
+    return _and_count(x, y) == n
+
+def any_of( x, y ):
+    """Any of x in y. """
+    return _and_count(x, y, 0) > 0
+
+def none_of( x, y ):
+    """None of x in y."""
+    return _and_count(x, y, 0) == 0
+
+def diff( x, y ):
+    """( 1, 0 ) or ( 0, 1 ), but not both nor neither ( XOR )"""
+    return _roaring(x) ^ y
+
+def match( x, y ):
+    """Like all_of, but returns value rather than bool"""
+    return _roaring(x) & y
+
+def invert( x, width=None ):
+    """Logical ones-complement within width."""
+    return _roaring(x).invert(width)
+
+
+if __name__=='__main__':
+
+    nl()
+    print('=======================================')
+    print("=== Test Script for 'RoaringBitmap' ===")
+    print('=======================================')
+    nl()
+
+    sparse = (1 << 50000000) | 1
+    rb = roaringbitmap(sparse)
+
+    print('sparse = 1 << 50000000 | 1')
+    print('int bytes      ', (_bit_length(sparse) + 7) // 8)
+    print('roaring nbytes ', rb.nbytes, '  kinds ', rb.kinds())
+    print('bits set       ', list(rb))
+    print('bit_length     ', rb.bit_length)
+    nl()
+
+    other = roaringbitmap.from_indexes([1, 2, 3, 50000000])
+    print('other bits     ', list(other))
+    print('match          ', list(match(rb, other)))
+    print('diff           ', list(diff(rb, other)))
+    print('all_of(rb, other)         ', all_of(rb, other))
+    print('any_of(rb, other)         ', any_of(rb, other))
+    print('one_of(1 << 50000000, other) ', one_of(1 << 50000000, other))
+    print('morethanone_of(rb, other) ', morethanone_of(rb, other))
+    nl()
+
+    inv = rb.invert()
+    print('invert within bit_length, bits set ', len(inv))
+    print('nbytes ', inv.nbytes, '  first kinds ', list(inv.kinds().values())[:3])
+    nl()
+
+    small = roaringbitmap(0b1011)
+    print('to_int round trip ', bin(small.to_int()), bin(small.invert(8).to_int()))
+    nl()
+
+    print('The End.')
+    nl()
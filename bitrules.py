@@ -0,0 +1,299 @@
+
+"""
+
+Bit Rules
+
+Index of many rules over 'binary' ints, for routing an event mask to
+the rules it satisfies without testing every rule.
+
+    ri = RuleIndex()
+    r1 = ri.add((required, forbidden))      all_of(required, y) and
+                                            none_of(forbidden, y)
+    r2 = ri.add(AllOf(a) & NoneOf(z) & ~MoreThanOneOf(w))
+    ri.match(event)                         [ r1, r2 ] when they pass
+    ri.remove(r1)
+
+A rule is a ( required, forbidden ) pair or a bitquery Query / Term.
+Queries are compiled, the AllOf and NoneOf masks folded into one
+required and one forbidden mask, and any other terms kept as a check
+run only on rules that pass the fold.  A rule needs a required mask,
+all_of(0, y) is False, so ( 0, F ) never passes, and a Query with no
+AllOf term is refused.
+
+The rules sit in a trie over their required bits, lowest bit first,
+each rule at the node whose path is its required mask.  An event
+walks only the paths made of its own set bits, children taken either
+by the event's remaining bits or by the node's children, whichever
+are fewer, so every node visited is a required mask the event holds.
+Rules at a visited node are tested with one AND and compare,
+y & (R | F) == R, which fails only on a forbidden bit.  The work is
+the rules whose required bits the event holds, close to the matches,
+not the number of rules.
+
+add and remove walk one path, creating or pruning nodes, so the trie
+is always exactly the current rules.
+
+Runs on Python 3.9 and micropython.
+
+module:
+  bitrules
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+from bitlogic import BitLogicError, BitInt, bit_indexes, from_indexes
+from bitquery import Term, Query, CompiledQuery, _Fused
+
+nl = print
+
+
+def _int( x ):
+    if isinstance(x, BitInt):
+        x = x.value
+    x = int(x)
+    if x < 0:
+        raise BitLogicError('Negative values are not BitInt numbers.')
+    return x
+
+def _fold( rule ):
+    """ ( required, forbidden, check ) for a rule, check the compiled
+        terms left over after the fold or None, ( 0, 0, None ) for a
+        rule that can never pass."""
+    if isinstance(rule, Term):
+        rule = Query(rule)
+    if isinstance(rule, Query):
+        rule = rule.compile()
+    if isinstance(rule, CompiledQuery):
+        if not rule.satisfiable:
+            return 0, 0, None
+        rest = [ t for t in rule.order if not isinstance(t, _Fused) ]
+        if not rule.required:
+            raise BitLogicError('Rule needs an AllOf mask, to index it on.')
+        return rule.required, rule.forbidden, rule if rest else None
+    try:
+        required, forbidden = rule
+    except (TypeError, ValueError):
+        raise BitLogicError('Rule is a ( required, forbidden ) pair or a Query.')
+    required = _int(required)
+    forbidden = _int(forbidden)
+    if required == 0 or required & forbidden:     # all_of(0, y) is False
+        return 0, 0, None
+    return required, forbidden, None
+
+
+class _Node(object):
+    """Trie node, children by bit index, rules rid -> ( mask, required,
+       check ) of the rules whose required mask is the path here."""
+
+    __slots__ = ('children', 'rules')
+
+    def __init__(self):
+        self.children = {}
+        self.rules = {}
+
+
+class RuleIndex(object):
+    """Rules by id, matched against event masks through the tree.
+       Ids are ints from 0, in order of add, never reused."""
+
+    def __init__(self, rules=None ):
+        self._rules = {}        # rid -> ( rule, required, forbidden, check )
+        self._next = 0
+        self._root = _Node()
+        if rules:
+            for rule in rules:
+                self.add(rule)
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __contains__(self, rid:int ):
+        return rid in self._rules
+
+    def rule(self, rid:int ):
+        """ The rule as added."""
+        return self._rules[rid][0]
+
+    def folded(self, rid:int ):
+        """ ( required, forbidden ) of a rule, ( 0, 0 ) when it can
+            never pass."""
+        r = self._rules[rid]
+        return r[1], r[2]
+
+    """ Trie """
+
+    def add(self, rule ):
+        """ Index rule, returns its id."""
+        required, forbidden, check = _fold(rule)
+        rid = self._next
+        self._next += 1
+        self._rules[rid] = (rule, required, forbidden, check)
+        if required == 0:       # never passes, kept by id only
+            return rid
+        node = self._root
+        for b in bit_indexes(required):
+            child = node.children.get(b)
+            if child is None:
+                child = node.children[b] = _Node()
+            node = child
+        node.rules[rid] = (required | forbidden, required, check)
+        return rid
+
+    def remove(self, rid:int ):
+        """ Drop a rule by id, KeyError when not indexed.  Nodes left
+            with no rules and no children are pruned."""
+        rule, required, forbidden, check = self._rules.pop(rid)
+        if required == 0:
+            return
+        path = [self._root]
+        for b in bit_indexes(required):
+            path.append(path[-1].children[b])
+        del path[-1].rules[rid]
+        bits = list(bit_indexes(required))
+        while len(path) > 1 and not path[-1].rules and not path[-1].children:
+            path.pop()
+            del path[-1].children[bits[len(path) - 1]]
+
+    """ Matching """
+
+    def match(self, event ):
+        """ Ids of the rules event passes, in no fixed order."""
+        y = _int(event)
+        ebits = list(bit_indexes(y))
+        pos = {}
+        for j, b in enumerate(ebits):
+            pos[b] = j
+        n = len(ebits)
+        out = []
+        stack = [(self._root, 0)]
+        while stack:
+            node, i = stack.pop()
+            for rid, (m, r, c) in node.rules.items():
+                if y & m == r and (c is None or c(y)):
+                    out.append(rid)
+            children = node.children
+            if not children:
+                continue
+            if len(children) < n - i:
+                for b, child in children.items():
+                    j = pos.get(b)
+                    if j is not None:   # children all above the path, so j >= i
+                        stack.append((child, j + 1))
+            else:
+                for j in range(i, n):
+                    child = children.get(ebits[j])
+                    if child is not None:
+                        stack.append((child, j + 1))
+        return out
+
+    def mask(self, event ):
+        """ int with bit rid set for each rule event passes."""
+        return from_indexes(self.match(event))
+
+    def stats(self):
+        """ { 'rules', 'nodes', 'depth' } of the trie."""
+        nodes = depth = 0
+        stack = [(self._root, 0)]
+        while stack:
+            node, d = stack.pop()
+            nodes += 1
+            depth = max(depth, d)
+            for child in node.children.values():
+                stack.append((child, d + 1))
+        return { 'rules': len(self._rules), 'nodes': nodes, 'depth': depth }
+
+    def __repr__(self):
+        return 'RuleIndex(rules=' + str(len(self._rules)) + ')'
+
+ruleindex = RuleIndex
+
+
+if __name__=='__main__':
+
+    import random
+    import time
+
+    from bitquery import AllOf, NoneOf, MoreThanOneOf
+
+    nl()
+    print('==================================')
+    print("=== Test Script for 'BitRules' ===")
+    print('==================================')
+    nl()
+
+    a = int(0b11101100000111)
+    b = int(0b10000000000000)
+    c = int(0b10100000000100)
+    d = int(0b00001111000000)
+
+    ri = ruleindex()
+    r0 = ri.add((b, d))
+    r1 = ri.add(AllOf(c) & NoneOf(0b1))
+    r2 = ri.add(AllOf(b) & ~MoreThanOneOf(0b111))
+    r3 = ri.add(AllOf(d) & NoneOf(d))
+    for y in (a, b, c, d):
+        print(bin(y), '  matches ', sorted(ri.match(y)))
+    ri.remove(r0)
+    print('remove', r0, '  ', bin(b), '  matches ', sorted(ri.match(b)))
+    nl()
+
+    n = 50000
+    width = 64
+
+    def rand_rule():
+        bits = random.sample(range(width), random.randrange(3, 7))
+        k = random.randrange(1, len(bits) - 1)
+        return (from_indexes(bits[:k]), from_indexes(bits[k:]))
+
+    rules = [ rand_rule() for _ in range(n) ]
+    events = [ random.getrandbits(width) & random.getrandbits(width) & random.getrandbits(width)
+               for _ in range(200) ]
+
+    start = time.time()
+    ri = ruleindex(rules)
+    t_build = time.time() - start
+
+    start = time.time()
+    got = [ sorted(ri.match(y)) for y in events ]
+    t_index = time.time() - start
+
+    start = time.time()
+    want = [ [ i for i, (r, f) in enumerate(rules) if y & r == r and y & f == 0 ] for y in events ]
+    t_loop = time.time() - start
+
+    print('rules ', n, '  events ', len(events), '  mean matches ',
+          sum([ len(m) for m in got ]) // len(events), '  ', ri.stats())
+    print('build seconds       ', round(t_build, 3))
+    print('loop us per event   ', round(t_loop * 1000000 / len(events)))
+    print('index us per event  ', round(t_index * 1000000 / len(events)), '  same ', got == want)
+
+    for rid in range(0, n, 2):
+        ri.remove(rid)
+    for _ in range(n // 2):
+        rules.append(rand_rule())
+        ri.add(rules[-1])
+    live = [ i for i in range(len(rules)) if i in ri ]
+    start = time.time()
+    got = [ sorted(ri.match(y)) for y in events ]
+    t_index = time.time() - start
+    want = [ [ i for i in live if events[j] & rules[i][0] == rules[i][0] and events[j] & rules[i][1] == 0 ]
+             for j in range(len(events)) ]
+    print('after remove / add  ', round(t_index * 1000000 / len(events)), '  same ', got == want)
+    nl()
+
+    print('The End.')
+    nl()
@@ -0,0 +1,662 @@
+
+"""
+
+Bit Server
+
+Asyncio service for bitlogic checks against named in-memory datasets,
+and a pooled async client.  Requests are small binary frames, many may
+be in flight on one connection ( pipelined ), and every request that
+arrives in the same event loop turn is evaluated in one vectorized
+BitMatrix call per ( dataset, predicate ).  Consecutive frames of one
+shape ( length, op, dataset ), as check_many sends them, are parsed
+and answered as NumPy arrays, no per-request Python.
+
+Frames, little-endian:
+
+  request   u32 length ( of the rest ), u32 id, u8 op, u8 name length,
+            u32 row, name bytes, mask bytes ( little-endian int )
+  response  u32 length ( of the rest ), u32 id, u8 status, payload
+
+  op        1 all_of  2 any_of  3 none_of  4 one_of  5 morethanone_of,
+            pred(mask, dataset[row])
+  row       ROW_ALL for a scan of every row
+  status    0 ok, payload one byte 0/1 for a check, or the row mask
+            bytes for a scan ( bit i set when row i passes )
+            1 error, payload a utf-8 message
+
+Backpressure: a connection stops being read once max_inflight of its
+requests are waiting, and responses wait on the transport's drain.
+
+CPython only, asyncio and NumPy ( falls back to BitList loops ).
+
+module:
+  bitserver
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+import asyncio
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import bitlogic
+from bitlogic import BitLogicError, BitInt, BitList
+from bitmatrix import BitMatrix
+
+nl = print
+
+REQUEST = struct.Struct('<IIBBI')     # length, id, op, name length, row
+BODY = struct.Struct('<IBBI')         # the same, after the length
+RESPONSE = struct.Struct('<IIB')      # length, id, status
+CHECK = struct.Struct('<IIBB')        # length, id, status, result
+if np is not None:
+    CHECK_DTYPE = np.dtype([('length', '<u4'), ('id', '<u4'), ('status', 'u1'), ('result', 'u1')])
+LENGTH = struct.Struct('<I')
+
+OPS = { 1: 'all_of', 2: 'any_of', 3: 'none_of', 4: 'one_of', 5: 'morethanone_of' }
+OP_CODES = dict([ (name, code) for code, name in OPS.items() ])
+
+ROW_ALL = 0xFFFFFFFF
+OK = 0
+ERROR = 1
+
+READ_SIZE = 1 << 18
+RUN_MIN = 32            # frames of one shape parsed as an array
+
+
+def _run_length( buf:bytes, at:int, frame:int, cols ):
+    """ Count of frames from at with the same bytes at cols as the
+        first, and the uint8 ( frames, frame ) view they sit in."""
+    k = (len(buf) - at) // frame
+    a = np.frombuffer(buf, dtype=np.uint8, count=k * frame, offset=at).reshape(k, frame)
+    same = (a[:, cols] == a[0, cols]).all(axis=1)
+    return (k if same.all() else int(same.argmin())), a
+
+def _requests( buf:bytes ):
+    """ Complete request frames of buf, returns ( frames, runs, rest ).
+        frames  [ ( id, op, name, row, mask ) ]
+        runs    [ ( name, op, ids, rows, masks ) ] for RUN_MIN or more
+                frames in a row of one length, op and name, as arrays
+                ( NumPy only )."""
+    frames = []
+    runs = []
+    at = 0
+    end = len(buf)
+    size = REQUEST.size
+    skip = 0
+    while end - at >= size:
+        n, rid, op, nlen, row = REQUEST.unpack_from(buf, at)
+        stop = at + 4 + n
+        if stop > end:
+            break
+        if n < BODY.size + nlen:
+            raise BitLogicError('Malformed bitserver request frame.')
+        if np is not None and skip <= 0 and end - at >= RUN_MIN * (4 + n):
+            cols = [0, 1, 2, 3, 8, 9] + list(range(size, size + nlen))
+            k, a = _run_length(buf, at, 4 + n, cols)
+            if k >= RUN_MIN:
+                a = a[:k]
+                runs.append((buf[at + size:at + size + nlen], op,
+                             a[:, 4:8].copy().view('<u4').ravel(),
+                             a[:, 10:14].copy().view('<u4').ravel(),
+                             a[:, size + nlen:]))
+                at += k * (4 + n)
+                continue
+            skip = RUN_MIN
+        skip -= 1
+        frames.append((rid, op, buf[at + size:at + size + nlen], row, buf[at + size + nlen:stop]))
+        at = stop
+    return frames, runs, buf[at:]
+
+def _responses( buf:bytes ):
+    """ Complete response frames of buf, returns ( frames, runs, rest ).
+        frames  [ ( id, status, payload ) ]
+        runs    [ ( ids, results ) ] for RUN_MIN or more ok check
+                responses in a row, as arrays ( NumPy only )."""
+    frames = []
+    runs = []
+    at = 0
+    end = len(buf)
+    size = RESPONSE.size
+    skip = 0
+    while end - at >= size:
+        n, rid, status = RESPONSE.unpack_from(buf, at)
+        stop = at + 4 + n
+        if stop > end:
+            break
+        if np is not None and skip <= 0 and n == 6 and status == OK and \
+           end - at >= RUN_MIN * CHECK.size:
+            k, a = _run_length(buf, at, CHECK.size, [0, 1, 2, 3, 8])
+            if k >= RUN_MIN:
+                a = a[:k]
+                runs.append((a[:, 4:8].copy().view('<u4').ravel().tolist(), (a[:, 9] == 1).tolist()))
+                at += k * CHECK.size
+                continue
+            skip = RUN_MIN
+        skip -= 1
+        frames.append((rid, status, buf[at + size:stop]))
+        at = stop
+    return frames, runs, buf[at:]
+
+def _response( rid:int, status:int, payload:bytes ):
+    return RESPONSE.pack(5 + len(payload), rid, status) + payload
+
+def _expand( run ):
+    """ A run back to single frames."""
+    name, op, ids, rows, masks = run
+    return [ (rid, op, name, row, m.tobytes())
+             for rid, row, m in zip(ids.tolist(), rows.tolist(), masks) ]
+
+
+class _Conn(object):
+
+    __slots__ = ('writer', 'out', 'inflight', 'ready')
+
+    def __init__(self, writer ):
+        self.writer = writer
+        self.out = []
+        self.inflight = 0
+        self.ready = asyncio.Event()
+        self.ready.set()
+
+
+class MaskServer(object):
+    """Named datasets of masks, served over TCP or a Unix socket.
+
+       max_batch     requests evaluated together at most
+       max_inflight  requests waiting per connection before reads stop
+    """
+
+    def __init__(self, max_batch=1 << 16, max_inflight=1 << 16 ):
+
+        self.datasets = {}
+        self.max_batch = max_batch
+        self.max_inflight = max_inflight
+        self.batches = 0
+        self.requests = 0
+        self._named = {}        # name bytes -> BitMatrix
+        self._pending = []      # ( conn, frames, runs, count ) per read
+        self._npending = 0
+        self._scheduled = False
+        self._servers = []
+
+    def add_dataset(self, name:str, masks, width=None ):
+        """ Hold masks ( a BitList, ints or a BitMatrix ) under name."""
+        if not isinstance(masks, BitMatrix):
+            masks = BitMatrix(masks, width)
+        self.datasets[name] = masks
+        self._named[name.encode()] = masks
+        return masks
+
+    def remove_dataset(self, name:str ):
+        del self.datasets[name]
+        del self._named[name.encode()]
+
+    """ Serving """
+
+    async def start_tcp(self, host='127.0.0.1', port=0 ):
+        server = await asyncio.start_server(self._handle, host, port)
+        self._servers.append(server)
+        return server
+
+    async def start_unix(self, path:str ):
+        server = await asyncio.start_unix_server(self._handle, path)
+        self._servers.append(server)
+        return server
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+
+    async def _handle(self, reader, writer ):
+        conn = _Conn(writer)
+        rest = b''
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                frames, runs, rest = _requests(rest + data if rest else data)
+                if frames or runs:
+                    self._submit(conn, frames, runs)
+                if conn.inflight >= self.max_inflight:
+                    conn.ready.clear()
+                    await conn.ready.wait()
+                await writer.drain()
+        except (ConnectionError, BitLogicError):
+            pass
+        finally:
+            writer.close()
+
+    def _submit(self, conn, frames, runs ):
+        n = len(frames)
+        for run in runs:
+            n += len(run[2])
+        conn.inflight += n
+        self._pending.append((conn, frames, runs, n))
+        self._npending += n
+        if self._npending >= self.max_batch:
+            self._flush()
+        elif not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    """ Batch evaluation """
+
+    def _flush(self):
+        self._scheduled = False
+        batch, self._pending = self._pending, []
+        self._npending = 0
+        if not batch:
+            return
+        self.batches += 1
+
+        named = self._named
+        groups = {}
+        rungroups = {}
+        for conn, frames, runs, n in batch:
+            self.requests += n
+            for run in runs:
+                name, op, ids, rows, masks = run
+                bm = named.get(name)
+                if bm is None or bm.words is None or op not in OPS or \
+                   masks.shape[1] > bm.nwords * 8 or (rows >= len(bm)).any():
+                    frames = frames + _expand(run)      # errors and scans
+                    continue
+                group = rungroups.get((name, op))
+                if group is None:
+                    rungroups[(name, op)] = group = []
+                group.append((conn, ids, rows, masks))
+            for rid, op, name, row, mask in frames:
+                bm = named.get(name)
+                if bm is None or op not in OPS or len(mask) > bm.nwords * 8 or \
+                   (row >= len(bm) and row != ROW_ALL):
+                    conn.out.append(_response(rid, ERROR, self._error(bm, op, name, row).encode()))
+                    continue
+                key = (name, op, row == ROW_ALL)
+                group = groups.get(key)
+                if group is None:
+                    groups[key] = group = []
+                group.append((conn, rid, row, mask))
+
+        for (name, op), group in rungroups.items():
+            try:
+                self._check_runs(named[name], OPS[op], group)
+            except Exception as e:
+                for conn, ids, rows, masks in group:
+                    for rid in ids.tolist():
+                        conn.out.append(_response(rid, ERROR, str(e).encode()))
+
+        for (name, op, scan), group in groups.items():
+            bm = named[name]
+            try:
+                if scan:
+                    self._scan(bm, OPS[op], group)
+                else:
+                    self._check(bm, OPS[op], group)
+            except Exception as e:
+                for conn, rid, row, mask in group:
+                    conn.out.append(_response(rid, ERROR, str(e).encode()))
+
+        for conn, frames, runs, n in batch:
+            conn.inflight -= n
+            if conn.out:
+                conn.writer.write(b''.join(conn.out))
+                conn.out = []
+            if not conn.ready.is_set() and conn.inflight < self.max_inflight:
+                conn.ready.set()
+
+    @staticmethod
+    def _error( bm, op:int, name:bytes, row:int ):
+        if bm is None:
+            return 'No dataset ' + repr(name.decode(errors='replace'))
+        if op not in OPS:
+            return 'Unknown op ' + str(op)
+        if row != ROW_ALL and row >= len(bm):
+            return 'Row out of range ' + str(row)
+        return 'Mask wider than dataset ' + repr(name.decode())
+
+    def _check(self, bm, opname:str, group ):
+        """ One vectorized pred(mask, row) over every check in group."""
+        pack = CHECK.pack
+        if bm.words is None:
+            f = getattr(bitlogic, opname)
+            for conn, rid, row, mask in group:
+                conn.out.append(pack(6, rid, OK, f(int.from_bytes(mask, 'little'), bm[row])))
+            return
+        stride = bm.nwords * 8
+        rows = np.array([ g[2] for g in group ], dtype=np.int64)
+        q = np.frombuffer(b''.join([ g[3].ljust(stride, b'\0') for g in group ]), dtype='<u8')
+        q = BitMatrix._from_words(q.reshape(len(group), bm.nwords), bm.width)
+        sub = BitMatrix._from_words(bm.words[rows], bm.width)
+        result = getattr(sub, opname)(q).tolist()
+        for (conn, rid, row, mask), r in zip(group, result):
+            conn.out.append(pack(6, rid, OK, r))
+
+    def _check_runs(self, bm, opname:str, group ):
+        """ Runs of checks, parsed as arrays, answered as arrays."""
+        total = sum([ len(g[1]) for g in group ])
+        q = np.zeros((total, bm.nwords * 8), dtype=np.uint8)
+        at = 0
+        for conn, ids, rows, masks in group:
+            q[at:at + len(ids), :masks.shape[1]] = masks
+            at += len(ids)
+        q = BitMatrix._from_words(q.view('<u8'), bm.width)
+        rows = np.concatenate([ g[2] for g in group ])
+        result = getattr(BitMatrix._from_words(bm.words[rows], bm.width), opname)(q)
+        at = 0
+        for conn, ids, rows, masks in group:
+            out = np.empty(len(ids), dtype=CHECK_DTYPE)
+            out['length'] = 6
+            out['id'] = ids
+            out['status'] = OK
+            out['result'] = result[at:at + len(ids)]
+            at += len(ids)
+            conn.out.append(out.tobytes())
+
+    def _scan(self, bm, opname:str, group ):
+        for conn, rid, row, mask in group:
+            flags = getattr(bm, opname)(int.from_bytes(mask, 'little'))
+            if bm.words is None:
+                payload = bitlogic.from_indexes([ i for i, f in enumerate(flags) if f ])
+                payload = payload.to_bytes((len(bm) + 7) >> 3, 'little')
+            else:
+                payload = np.packbits(flags, bitorder='little').tobytes()
+            conn.out.append(_response(rid, OK, payload))
+
+maskserver = MaskServer
+
+
+class _Many(object):
+    """Collects the check responses of one request_many, ids first on."""
+
+    __slots__ = ('fut', 'first', 'results', 'left')
+
+    def __init__(self, fut, first:int, n:int ):
+        self.fut = fut
+        self.first = first
+        self.results = [None] * n
+        self.left = n
+
+    def set(self, rid:int, status:int, result ):
+        if self.fut.done():
+            return
+        if status != OK:
+            self.fut.set_exception(BitLogicError(result.decode()))
+            return
+        self.results[(rid - self.first) & 0xFFFFFFFF] = result
+        self.left -= 1
+        if self.left == 0:
+            self.fut.set_result(self.results)
+
+
+class _ClientConn(object):
+
+    def __init__(self, reader, writer ):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}       # id -> future, or _Many
+        self.next_id = 0
+        self.out = []
+        self.scheduled = False
+        self.task = asyncio.get_running_loop().create_task(self._read())
+
+    def _schedule(self):
+        if not self.scheduled:
+            self.scheduled = True
+            asyncio.get_running_loop().call_soon(self._send)
+
+    def request(self, op:int, name:bytes, row:int, mask:bytes ):
+        rid = self.next_id
+        self.next_id = (rid + 1) & 0xFFFFFFFF
+        fut = asyncio.get_running_loop().create_future()
+        self.pending[rid] = fut
+        self.out.append(REQUEST.pack(BODY.size + len(name) + len(mask), rid, op, len(name), row))
+        self.out.append(name)
+        self.out.append(mask)
+        self._schedule()
+        return fut
+
+    def request_many(self, op:int, name:bytes, rows, masks ):
+        """ Future of a bool list, masks all one length in bytes."""
+        k = len(masks)
+        first = self.next_id
+        self.next_id = (first + k) & 0xFFFFFFFF
+        fut = asyncio.get_running_loop().create_future()
+        if k == 0:
+            fut.set_result([])
+            return fut
+        ids = [ (first + i) & 0xFFFFFFFF for i in range(k) ]
+        self.pending.update(dict.fromkeys(ids, _Many(fut, first, k)))
+        mlen = len(masks[0])
+        n = BODY.size + len(name) + mlen
+        if np is None:
+            for rid, row, mask in zip(ids, rows, masks):
+                self.out.append(REQUEST.pack(n, rid, op, len(name), row) + name + mask)
+        else:
+            size = REQUEST.size
+            a = np.empty((k, 4 + n), dtype=np.uint8)
+            a[:, :size] = np.frombuffer(REQUEST.pack(n, 0, op, len(name), 0), dtype=np.uint8)
+            a[:, 4:8] = np.array(ids, dtype='<u4').view(np.uint8).reshape(k, 4)
+            a[:, 10:14] = np.array(rows, dtype='<u4').view(np.uint8).reshape(k, 4)
+            a[:, size:size + len(name)] = np.frombuffer(name, dtype=np.uint8)
+            a[:, size + len(name):] = np.frombuffer(b''.join(masks), dtype=np.uint8).reshape(k, mlen)
+            self.out.append(a.tobytes())
+        self._schedule()
+        return fut
+
+    def _send(self):
+        self.scheduled = False
+        if self.out:
+            self.writer.write(b''.join(self.out))
+            self.out = []
+
+    async def _read(self):
+        rest = b''
+        try:
+            while True:
+                data = await self.reader.read(READ_SIZE)
+                if not data:
+                    break
+                frames, runs, rest = _responses(rest + data if rest else data)
+                pending = self.pending
+                for ids, results in runs:
+                    for rid, r in zip(ids, results):
+                        entry = pending.pop(rid, None)
+                        if type(entry) is _Many:
+                            entry.set(rid, OK, r)
+                        elif entry is not None and not entry.done():
+                            entry.set_result(b'\x01' if r else b'\x00')
+                for rid, status, payload in frames:
+                    entry = pending.pop(rid, None)
+                    if type(entry) is _Many:
+                        entry.set(rid, status, payload == b'\x01' if status == OK else payload)
+                    elif entry is None or entry.done():
+                        continue
+                    elif status == OK:
+                        entry.set_result(payload)
+                    else:
+                        entry.set_exception(BitLogicError(payload.decode()))
+        finally:
+            err = ConnectionError('bitserver connection closed')
+            for entry in self.pending.values():
+                fut = entry.fut if type(entry) is _Many else entry
+                if not fut.done():
+                    fut.set_exception(err)
+            self.pending = {}
+
+    async def close(self):
+        self._send()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        self.task.cancel()
+
+
+def _mask_bytes( mask ):
+    if isinstance(mask, BitInt):
+        mask = mask.value
+    if mask < 0:
+        raise BitLogicError('Negative values are not BitInt numbers.')
+    return mask.to_bytes((mask.bit_length() + 7) >> 3, 'little')
+
+
+class MaskClient(object):
+    """Async client, a small pool of pipelined connections used round
+       robin.  Create with await MaskClient.connect(...)."""
+
+    def __init__(self):
+        self._conns = []
+        self._next = 0
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=None, path=None, size=4 ):
+        client = cls()
+        for _ in range(size):
+            if path is not None:
+                reader, writer = await asyncio.open_unix_connection(path)
+            else:
+                reader, writer = await asyncio.open_connection(host, port)
+            client._conns.append(_ClientConn(reader, writer))
+        return client
+
+    def _conn(self):
+        self._next = (self._next + 1) % len(self._conns)
+        return self._conns[self._next]
+
+    async def check(self, name:str, op:str, row:int, mask ):
+        """ pred(mask, dataset[row]) on the server, op a predicate name."""
+        payload = await self._conn().request(OP_CODES[op], name.encode(), row, _mask_bytes(mask))
+        return payload == b'\x01'
+
+    async def check_many(self, name:str, op:str, rows, masks ):
+        """ pred(masks[i], dataset[rows[i]]) for every i, list of bools.
+            Frames are split over the pool and sent pipelined."""
+        code = OP_CODES[op]
+        name = name.encode()
+        rows = list(rows)
+        masks = [ _mask_bytes(m) for m in masks ]
+        if len(rows) != len(masks):
+            raise BitLogicError('check_many needs one row per mask.')
+        if not masks:
+            return []
+        mlen = max([ len(m) for m in masks ]) or 1
+        masks = [ m.ljust(mlen, b'\0') for m in masks ]     # one frame shape
+        size = -(-len(masks) // len(self._conns))
+        parts = await asyncio.gather(*[ self._conn().request_many(code, name,
+                                            rows[i:i + size], masks[i:i + size])
+                                        for i in range(0, len(masks), size) ])
+        return [ r for part in parts for r in part ]
+
+    async def scan(self, name:str, op:str, mask ):
+        """ Row mask of every row where pred(mask, row)."""
+        payload = await self._conn().request(OP_CODES[op], name.encode(), ROW_ALL, _mask_bytes(mask))
+        return int.from_bytes(payload, 'little')
+
+    async def close(self):
+        for conn in self._conns:
+            await conn.close()
+        self._conns = []
+
+maskclient = MaskClient
+
+
+if __name__=='__main__':
+
+    import random
+    import time
+
+    nl()
+    print('===================================')
+    print("=== Test Script for 'BitServer' ===")
+    print('===================================')
+    nl()
+
+    async def demo():
+
+        a = int(0b11101100000111)
+        b = int(0b10000000000000)
+        c = int(0b10100000000100)
+        d = int(0b00001111000000)
+        o = int(0b00000000000001)
+        z = int(0b00000000000000)
+
+        server = maskserver()
+        server.add_dataset('demo', BitList([a, b, c, d, o, z]))
+        nrows = 100000
+        server.add_dataset('big', BitList([ random.getrandbits(64) for _ in range(nrows) ]), 64)
+        srv = await server.start_tcp('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+
+        client = await maskclient.connect('127.0.0.1', port, size=4)
+
+        print('check all_of(b, demo[i]) ', [ await client.check('demo', 'all_of', i, b) for i in range(6) ])
+        print('scan any_of(d, row)      ', bin(await client.scan('demo', 'any_of', d)))
+        try:
+            await client.check('nope', 'all_of', 0, b)
+        except BitLogicError as e:
+            print('error                    ', e)
+        nl()
+
+        print('check_many one_of(o, ..) ', await client.check_many('demo', 'one_of', range(6), [o] * 6))
+        nl()
+
+        total = 1000000
+        window = 50000
+        rows = [ random.randrange(nrows) for _ in range(window) ]
+        masks = [ random.getrandbits(64) for _ in range(window) ]
+        start = time.perf_counter()
+        for _ in range(total // window):
+            await client.check_many('big', 'any_of', rows, masks)
+        elapsed = time.perf_counter() - start
+        print('pipelined checks ', total, '  window ', window)
+        print('checks/second    ', int(total / elapsed))
+        print('batches          ', server.batches, '  mean batch ', server.requests // max(server.batches, 1))
+        nl()
+
+        latencies = []
+
+        async def timed(row, mask):
+            start = time.perf_counter()
+            await client.check('big', 'all_of', row, mask)
+            latencies.append(time.perf_counter() - start)
+
+        for _ in range(200):
+            await asyncio.gather(*[ timed(random.randrange(nrows), random.getrandbits(8))
+                                    for _ in range(64) ])
+        latencies.sort()
+        print('single checks    ', len(latencies), '  64 concurrent')
+        print('p50, p99 ms      ', round(latencies[len(latencies) // 2] * 1000, 3),
+              round(latencies[int(len(latencies) * 0.99)] * 1000, 3))
+        print('( client and server share one process here )')
+
+        await client.close()
+        await server.close()
+
+    asyncio.run(demo())
+    nl()
+
+    print('The End.')
+    nl()
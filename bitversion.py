@@ -0,0 +1,416 @@
+
+"""
+
+Bit Version
+
+BitList with history, roll back to any of the last N committed states
+without a copy of the whole list per state.
+
+    vl = VersionedBitList(rows)
+    vl[i] = x ...
+    v = vl.commit()             new version number
+    vl.checkout(v)              BitList as it was at v
+    vl.changed(a, b)            rows that differ between a and b
+    vl.rollback(v)              back to v, later versions dropped
+
+Each commit stores a delta, row -> diff(old, new) ( XOR ), for the rows
+written since the last commit, so a version costs what changed, and
+XOR being its own inverse the same delta steps forward or back.
+
+Rows are held in pages of PAGE rows.  A checkpoint is a tuple of the
+current pages, shared, not copied, and a page is copied only on its
+first write after a checkpoint ( copy-on-write ).  A checkpoint is
+taken once every `every` changed rows have been committed since the
+last ( default an eighth of the rows ), so a checkout replays at most
+`every` delta rows, forward from the checkpoint below or back from the
+head, whichever is less work.  Between checkpoints each page is
+copied at most once, len pointers at most for every / 8 of changed
+rows by default, so memory is the deltas plus some 8 pointers per
+changed row, it grows with changes, not versions x rows.
+
+Only the last max_versions versions are kept, the oldest checkpoint
+moves forward as the history is trimmed.  Rows can be appended and
+popped from the end, the length is part of each version.
+
+Runs on Python 3.9 and micropython.
+
+module:
+  bitversion
+
+version:
+  v0.1.0
+
+sourcecode:
+  https://github/billbreit/hello-world
+
+copyleft:
+  2023 by Bill Breitmayer
+
+licence:
+  GNU GPL v3 or above
+
+author:
+  Bill Breitmayer
+
+"""
+
+from bitlogic import BitLogicError, BitInt, BitList, diff
+
+nl = print
+
+PAGE = 1024             # rows per copy-on-write page
+CHECKPOINT_SHARE = 8    # every, by default len // CHECKPOINT_SHARE rows
+MAX_VERSIONS = 10000
+
+
+def _int( x ):
+    if isinstance(x, BitInt):
+        x = x.value
+    if x < 0:
+        raise BitLogicError('Negative values are not BitInt numbers.')
+    return x
+
+
+class VersionedBitList(object):
+    """Rows of 'binary' ints with committed versions.  Version 0 is the
+       rows given, commit() makes 1, 2, ... ."""
+
+    def __init__(self, rows=(), every=None, max_versions=MAX_VERSIONS ):
+
+        if (every is not None and every < 1) or max_versions < 1:
+            raise BitLogicError('every and max_versions must be at least 1.')
+        self.every = every
+        self.max_versions = max_versions
+
+        rows = [ _int(x) for x in rows ]
+        self._len = len(rows)
+        self._pages = [ rows[i:i + PAGE] for i in range(0, len(rows), PAGE) ]
+        if self._pages and len(self._pages[-1]) < PAGE:
+            self._pages[-1].extend([0] * (PAGE - len(self._pages[-1])))
+        self._owned = [ False ] * len(self._pages)
+        self._dirty = {}            # row -> value at the last commit
+
+        self._base = 0              # oldest version kept
+        self._head = 0              # latest version
+        self._deltas = {}           # version -> { row: old ^ new } from version - 1
+        self._lengths = { 0: self._len }
+        self._cum = { 0: 0 }        # version -> delta rows committed up to it
+        self._last = 0              # version of the latest checkpoint
+        self._checkpoints = { 0: tuple(self._pages) }
+        self.copied = 0             # pages copied on write
+
+    """ Rows """
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i:int ):
+        if i < 0:
+            i += self._len
+        if i < 0 or i >= self._len:
+            raise IndexError('VersionedBitList index out of range')
+        return self._pages[i // PAGE][i % PAGE]
+
+    def __iter__(self):
+        n = self._len
+        for page in self._pages:
+            for x in page[:n]:
+                yield x
+            n -= PAGE
+            if n <= 0:
+                break
+
+    def _write(self, i:int, x:int ):
+        """ Set row i, copying its page first if a checkpoint holds it."""
+        p = i // PAGE
+        if not self._owned[p]:
+            self._pages[p] = list(self._pages[p])
+            self._owned[p] = True
+            self.copied += 1
+        page = self._pages[p]
+        if i not in self._dirty:
+            self._dirty[i] = page[i % PAGE]
+        page[i % PAGE] = x
+
+    def __setitem__(self, i:int, x ):
+        if i < 0:
+            i += self._len
+        if i < 0 or i >= self._len:
+            raise IndexError('VersionedBitList index out of range')
+        self._write(i, _int(x))
+
+    def append(self, x ):
+        if self._len == len(self._pages) * PAGE:
+            self._pages.append([0] * PAGE)
+            self._owned.append(True)
+        self._len += 1
+        self._write(self._len - 1, _int(x))
+
+    def extend(self, rows ):
+        for x in rows:
+            self.append(x)
+
+    def pop(self):
+        """ Remove and return the last row."""
+        if not self._len:
+            raise IndexError('pop from empty VersionedBitList')
+        x = self[self._len - 1]
+        self._write(self._len - 1, 0)
+        self._len -= 1
+        return x
+
+    def to_bitlist(self):
+        return BitList(self)
+
+    """ Versions """
+
+    @property
+    def version(self):
+        """ Latest committed version."""
+        return self._head
+
+    @property
+    def versions(self):
+        """ range of the versions kept."""
+        return range(self._base, self._head + 1)
+
+    def _check(self, v:int ):
+        if v < self._base or v > self._head:
+            raise BitLogicError('Version ' + str(v) + ' not kept, ' + str(self._base) +
+                                ' to ' + str(self._head))
+
+    def pending(self):
+        """ Rows written since the last commit, with a changed value."""
+        return sorted([ i for i, old in self._dirty.items() if self._value(i) != old ])
+
+    def _value(self, i:int ):
+        return self._pages[i // PAGE][i % PAGE]
+
+    def commit(self):
+        """ Record the rows written since the last commit as a new
+            version, returns its number."""
+        delta = {}
+        for i, old in self._dirty.items():
+            d = diff(old, self._value(i))
+            if d:
+                delta[i] = d
+        self._dirty = {}
+        self._head += 1
+        self._deltas[self._head] = delta
+        self._lengths[self._head] = self._len
+        self._cum[self._head] = self._cum[self._head - 1] + len(delta)
+
+        every = self.every or max(PAGE, self._len // CHECKPOINT_SHARE)
+        if self._cum[self._head] - self._cum[self._last] >= every:
+            self.checkpoint()
+        while self._head - self._base >= self.max_versions:
+            self._trim()
+        return self._head
+
+    def checkpoint(self):
+        """ Share the current pages as a checkpoint of the head, writes
+            after this copy their page.  Uncommitted rows are committed
+            first."""
+        if self._dirty:
+            self.commit()
+        self._checkpoints[self._head] = tuple(self._pages)
+        self._last = self._head
+        for p in range(len(self._owned)):
+            self._owned[p] = False
+
+    def _trim(self):
+        """ Drop the oldest version, moving its checkpoint forward one
+            delta, pages copied only where the delta writes."""
+        b = self._base
+        nxt = b + 1
+        if nxt not in self._checkpoints:
+            pages = list(self._checkpoints[b])
+            copied = set()
+            for i, d in self._deltas[nxt].items():
+                p = i // PAGE
+                while p >= len(pages):
+                    pages.append([0] * PAGE)
+                    copied.add(len(pages) - 1)
+                if p not in copied:
+                    pages[p] = list(pages[p])
+                    copied.add(p)
+                pages[p][i % PAGE] ^= d
+            self._checkpoints[nxt] = tuple(pages)
+        del self._checkpoints[b]
+        del self._deltas[nxt]
+        del self._lengths[b]
+        del self._cum[b]
+        if self._last == b:
+            self._last = nxt
+        self._base = nxt
+
+    def _apply(self, rows, v:int ):
+        """ XOR delta v into a flat list of rows, forward or back."""
+        for i, d in self._deltas[v].items():
+            rows[i] ^= d
+
+    def checkout(self, v:int ):
+        """ BitList of version v, from the nearest checkpoint below or
+            back from the head."""
+        self._check(v)
+        below = max([ c for c in self._checkpoints if c <= v ])
+        cum = self._cum
+        if cum[v] - cum[below] <= cum[self._head] - cum[v] + len(self._dirty):
+            rows = []
+            for page in self._checkpoints[below]:
+                rows.extend(page)
+            need = max([ self._lengths[u] for u in range(below, v + 1) ])
+            if len(rows) < need:            # rows appended since the checkpoint
+                rows.extend([0] * (need - len(rows)))
+            for u in range(below + 1, v + 1):
+                self._apply(rows, u)
+        else:
+            rows = []
+            for page in self._pages:
+                rows.extend(page)
+            for i, old in self._dirty.items():
+                rows[i] = old
+            for u in range(self._head, v, -1):
+                self._apply(rows, u)
+        del rows[self._lengths[v]:]
+        return BitList(rows)
+
+    def row(self, i:int, v:int ):
+        """ Row i at version v, without a checkout."""
+        self._check(v)
+        if i < 0 or i >= self._lengths[v]:
+            raise IndexError('VersionedBitList index out of range at version ' + str(v))
+        below = max([ c for c in self._checkpoints if c <= v ])
+        pages = self._checkpoints[below]
+        x = pages[i // PAGE][i % PAGE] if i // PAGE < len(pages) else 0
+        for u in range(below + 1, v + 1):
+            x ^= self._deltas[u].get(i, 0)
+        return x
+
+    def delta(self, a:int, b:int ):
+        """ { row: diff } taking version a to version b, either order,
+            rows that changed and changed back left out."""
+        self._check(a)
+        self._check(b)
+        if a > b:
+            a, b = b, a
+        acc = {}
+        for u in range(a + 1, b + 1):
+            for i, d in self._deltas[u].items():
+                acc[i] = acc.get(i, 0) ^ d
+        return dict([ (i, d) for i, d in acc.items() if d ])
+
+    def changed(self, a:int, b:int ):
+        """ Rows that differ between versions a and b, in order."""
+        return sorted(self.delta(a, b))
+
+    def revert(self):
+        """ Drop uncommitted writes."""
+        for i, old in self._dirty.items():
+            p = i // PAGE
+            if not self._owned[p]:
+                self._pages[p] = list(self._pages[p])
+                self._owned[p] = True
+                self.copied += 1
+            self._pages[p][i % PAGE] = old
+        self._dirty = {}
+        self._len = self._lengths[self._head]
+
+    def rollback(self, v:int ):
+        """ Make version v the head again, later versions are dropped
+            and uncommitted writes lost."""
+        self._check(v)
+        self.revert()
+        for u in range(self._head, v, -1):
+            for i, d in self._deltas[u].items():
+                p = i // PAGE
+                if not self._owned[p]:
+                    self._pages[p] = list(self._pages[p])
+                    self._owned[p] = True
+                    self.copied += 1
+                self._pages[p][i % PAGE] ^= d
+            del self._deltas[u]
+            del self._lengths[u]
+            del self._cum[u]
+            if u in self._checkpoints:
+                del self._checkpoints[u]
+        self._head = v
+        self._last = max(self._checkpoints)
+        self._len = self._lengths[v]
+
+    def stats(self):
+        """ { 'versions', 'checkpoints', 'delta_rows', 'pages_copied' }"""
+        return { 'versions': self._head - self._base + 1,
+                 'checkpoints': len(self._checkpoints),
+                 'delta_rows': sum([ len(d) for d in self._deltas.values() ]),
+                 'pages_copied': self.copied }
+
+    def __repr__(self):
+        return ('VersionedBitList(rows=' + str(self._len) + ', versions=' + str(self._base) +
+                '..' + str(self._head) + ')')
+
+versionedbitlist = VersionedBitList
+
+
+if __name__=='__main__':
+
+    import random
+    import time
+
+    nl()
+    print('====================================')
+    print("=== Test Script for 'BitVersion' ===")
+    print('====================================')
+    nl()
+
+    a = int(0b11101100000111)
+    b = int(0b10000000000000)
+    c = int(0b10100000000100)
+    d = int(0b00001111000000)
+
+    vl = versionedbitlist([a, b, c])
+    vl[1] = d
+    v1 = vl.commit()
+    vl.append(a)
+    vl[0] = 0
+    v2 = vl.commit()
+    print('v0 ', [ bin(x) for x in vl.checkout(0) ])
+    print('v2 ', [ bin(x) for x in vl.checkout(v2) ])
+    print('changed v0..v2 ', vl.changed(0, v2), '  row 1 at v0 ', bin(vl.row(1, 0)))
+    vl.rollback(v1)
+    print('rollback to v1 ', [ bin(x) for x in vl ])
+    nl()
+
+    n = 100000
+    versions = 10000
+    width = 64
+    vl = versionedbitlist([ random.getrandbits(width) for _ in range(n) ], max_versions=versions)
+    start = time.time()
+    for v in range(versions):
+        for _ in range(10):
+            i = random.randrange(n)
+            vl[i] = vl[i] ^ (1 << random.randrange(width))
+        vl.commit()
+    t_commit = time.time() - start
+    print('rows ', n, '  versions ', versions, '  10 rows per version')
+    print('commit us per version ', round(t_commit * 1000000 / versions), '  ', vl.stats())
+
+    vs = [ random.choice(vl.versions) for _ in range(20) ]
+    start = time.time()
+    for v in vs:
+        vl.checkout(v)
+    t_checkout = time.time() - start
+    print('checkout ms ', round(t_checkout * 1000 / len(vs), 2), '  copy of the list ms ',
+          round(min([ (lambda s: (list(vl), time.time() - s)[1])(time.time()) for _ in range(3) ]) * 1000, 2))
+
+    lo, hi = vl.versions[0], vl.version
+    start = time.time()
+    ch = vl.changed(hi - 100, hi)
+    print('changed over last 100 versions ', len(ch), ' rows   ms ', round((time.time() - start) * 1000, 2))
+    old = vl.checkout(hi - 100)
+    new = vl.checkout(hi)
+    print('matches checkouts ', ch == [ i for i in range(n) if old[i] != new[i] ])
+    nl()
+
+    print('The End.')
+    nl()